@@ -0,0 +1,91 @@
+from rumour_milled.ml.batching import TensorBatchLoader
+from rumour_milled.ml.distributed import init_distributed, cleanup_distributed
+from rumour_milled.ml.models.simple import SimpleHeadlineClassifier
+from rumour_milled.ml.train import Trainer, HistoryCallback
+import torch
+import torch.nn as nn
+import torch.optim as optim
+import torch.multiprocessing as mp
+import argparse
+import os
+
+
+def worker(rank, world_size, args, port, results):
+    os.environ.update(
+        RANK=str(rank),
+        WORLD_SIZE=str(world_size),
+        MASTER_ADDR="127.0.0.1",
+        MASTER_PORT=str(port),
+    )
+    torch.set_num_threads(args.threads_per_process)
+    init_distributed()
+    distributed = world_size > 1
+
+    # Same data on every rank, each trains on its own shard
+    generator = torch.Generator().manual_seed(0)
+    X = torch.randn(args.n, args.dim, generator=generator)
+    y = (X[:, :8].sum(dim=1, keepdim=True) > 0).float()
+    split = int(args.n * 0.8)
+    train_loader = TensorBatchLoader(
+        X[:split],
+        y[:split],
+        batch_size=args.batch_size,
+        shuffle=True,
+        num_replicas=world_size,
+        rank=rank,
+    )
+    val_loader = TensorBatchLoader(
+        X[split:], y[split:], batch_size=1024, num_replicas=world_size, rank=rank
+    )
+
+    torch.manual_seed(0)
+    model = SimpleHeadlineClassifier(args.dim, args.hidden_dim, 1)
+    history = HistoryCallback()
+    trainer = Trainer(
+        model=model,
+        loss_fn=nn.BCEWithLogitsLoss(),
+        optimiser=optim.Adam(model.parameters(), lr=args.lr),
+        callbacks=[history],
+        distributed=distributed,
+    )
+    trainer.train(
+        train_loader=train_loader, validation_loader=val_loader, epochs=args.epochs
+    )
+    if rank == 0:
+        # The first epoch includes DDP and allocator warm up
+        timed = history.history[1:] or history.history
+        samples = sum(metrics["samples"] for metrics in timed)
+        seconds = sum(metrics["seconds"] for metrics in timed)
+        results.put((samples / seconds, history.history[-1]["val_loss"]))
+    cleanup_distributed()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-processes", type=int, default=os.cpu_count())
+    ap.add_argument("--threads-per-process", type=int, default=1)
+    ap.add_argument("--n", type=int, default=65536)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--hidden-dim", type=int, default=256)
+    ap.add_argument("--batch-size", type=int, default=128)
+    ap.add_argument("--lr", type=float, default=0.001)
+    ap.add_argument("--epochs", type=int, default=4)
+    ap.add_argument("--port", type=int, default=29511)
+    args = ap.parse_args()
+
+    context = mp.get_context("spawn")
+    baseline = None
+    print("processes  samples/sec  speedup  efficiency  final val_loss")
+    for world_size in range(1, args.max_processes + 1):
+        results = context.SimpleQueue()
+        mp.spawn(
+            worker,
+            args=(world_size, args, args.port + world_size, results),
+            nprocs=world_size,
+        )
+        samples_per_second, val_loss = results.get()
+        baseline = baseline or samples_per_second
+        speedup = samples_per_second / baseline
+        print(
+            f"{world_size:>9}  {samples_per_second:>11.0f}  {speedup:>7.2f}  {speedup / world_size:>10.0%}  {val_loss:>14.4f}"
+        )
@@ -0,0 +1,86 @@
+from rumour_milled.ml.backends import BACKENDS, check_parity, get_embedder
+from rumour_milled.ml.preprocess import stream_vectorise
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from time import perf_counter
+import pandas as pd
+import argparse
+import random
+
+
+def synthetic_headlines(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(5_000)]
+    return [" ".join(rng.choices(vocabulary, k=rng.randint(4, 20))) for _ in range(n)]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", type=str, default="bert-base-uncased")
+    ap.add_argument("--backends", type=str, nargs="+", default=list(BACKENDS))
+    ap.add_argument("--n", type=int, default=2_000)
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--threads", type=int, default=None)
+    ap.add_argument("--min-cosine", type=float, default=0.99)
+    ap.add_argument("--max-accuracy-drop", type=float, default=0.01)
+    ap.add_argument(
+        "--data",
+        type=str,
+        default=None,
+        help="CSV with headline and label columns for the accuracy check",
+    )
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    if args.data:
+        df = pd.read_csv(args.data).head(args.n)
+        headlines, labels = df["headline"].tolist(), df["label"].to_numpy()
+    else:
+        headlines, labels = synthetic_headlines(args.n, args.seed), None
+
+    results = {}
+    for backend in args.backends:
+        # Load, quantise or export outside the timed run
+        get_embedder(args.model, backend, threads=args.threads)
+        start_time = perf_counter()
+        results[backend] = stream_vectorise(
+            headlines,
+            args.model,
+            args.batch_size,
+            backend=backend,
+            threads=args.threads,
+        )
+        seconds = perf_counter() - start_time
+        print(f"{backend}: {len(headlines) / seconds:.0f} headlines/sec")
+
+    reference = results.get("eager")
+    if reference is None:
+        raise SystemExit("Parity checks need the eager backend as a reference")
+    failed = False
+    for backend, vectors in results.items():
+        if backend == "eager":
+            continue
+        parity = check_parity(reference, vectors, args.min_cosine)
+        failed |= not parity["within_tolerance"]
+        print(
+            f"{backend} vs eager: max abs diff {parity['max_abs_diff']:.4f}, "
+            f"cosine mean {parity['mean_cosine']:.5f} min {parity['min_cosine']:.5f}"
+        )
+
+    if labels is not None:
+        train, test = train_test_split(
+            range(len(headlines)),
+            test_size=0.2,
+            random_state=args.seed,
+            stratify=labels,
+        )
+        classifier = LogisticRegression(max_iter=1_000)
+        classifier.fit(reference[train].numpy(), labels[train])
+        baseline = classifier.score(reference[test].numpy(), labels[test])
+        for backend, vectors in results.items():
+            accuracy = classifier.score(vectors[test].numpy(), labels[test])
+            failed |= baseline - accuracy > args.max_accuracy_drop
+            print(f"{backend}: classifier accuracy {accuracy:.4f}")
+
+    if failed:
+        raise SystemExit("Backend outside parity tolerance")
@@ -0,0 +1,54 @@
+from rumour_milled.ml.batching import TensorBatchLoader
+from rumour_milled.ml.models.simple import SimpleHeadlineClassifier
+from rumour_milled.ml.train import Trainer
+from torch.utils.data import TensorDataset, DataLoader
+import torch
+import torch.nn as nn
+import torch.optim as optim
+import argparse
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50_000)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--batch-size", type=int, default=128)
+    ap.add_argument("--epochs", type=int, default=5)
+    args = ap.parse_args()
+
+    X = torch.randn(args.n, args.dim)
+    y = torch.randint(0, 2, (args.n, 1)).float()
+    loaders = {
+        "DataLoader": DataLoader(
+            TensorDataset(X, y), batch_size=args.batch_size, shuffle=True
+        ),
+        "TensorBatchLoader": TensorBatchLoader(
+            X, y, batch_size=args.batch_size, shuffle=True
+        ),
+    }
+
+    results = {}
+    for name, loader in loaders.items():
+        torch.manual_seed(42)
+        model = SimpleHeadlineClassifier(args.dim, 256, 1)
+        trainer = Trainer(
+            model=model,
+            loss_fn=nn.BCEWithLogitsLoss(),
+            optimiser=optim.Adam(model.parameters(), lr=0.001),
+            callbacks=[],
+        )
+        history = trainer.train(
+            train_loader=loader, validation_loader=None, epochs=args.epochs
+        )
+        # Skip the first epoch as warm-up
+        epochs = history[1:] or history
+        samples_per_second = sum(m["samples"] for m in epochs) / sum(
+            m["seconds"] for m in epochs
+        )
+        wait = sum(m["data_wait_fraction"] for m in epochs) / len(epochs)
+        results[name] = samples_per_second
+        print(
+            f"{name}: {samples_per_second:.0f} samples/sec, "
+            f"p50 step {epochs[-1]['step_time_p50_ms']:.2f}ms, data wait {wait:.1%}"
+        )
+    print(f"speedup: {results['TensorBatchLoader'] / results['DataLoader']:.1f}x")
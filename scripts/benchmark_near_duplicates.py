@@ -0,0 +1,46 @@
+from rumour_milled.utils.minhash import NearDuplicateIndex
+from time import perf_counter
+import argparse
+import random
+
+
+def synthetic_headlines(n: int, duplicate_rate: float, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(20_000)]
+    headlines = []
+    for _ in range(n):
+        if headlines and rng.random() < duplicate_rate:
+            words = rng.choice(headlines).split(" ")
+            words[rng.randrange(len(words))] += rng.choice([".", ",", "!", "'s"])
+        else:
+            words = rng.choices(vocabulary, k=rng.randint(6, 14))
+        headlines.append(" ".join(words))
+    return headlines
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--duplicate-rate", type=float, default=0.2)
+    ap.add_argument("--threshold", type=float, default=0.8)
+    ap.add_argument("--num-perm", type=int, default=64)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    headlines = synthetic_headlines(args.n, args.duplicate_rate, args.seed)
+    index = NearDuplicateIndex(threshold=args.threshold, num_perm=args.num_perm)
+
+    start_time = perf_counter()
+    kept = index.filter(headlines)
+    seconds = perf_counter() - start_time
+    print(
+        f"Indexed {args.n} headlines in {seconds:.2f} seconds "
+        f"({args.n / seconds:.0f} headlines/sec), kept {len(kept)}"
+    )
+
+    start_time = perf_counter()
+    index.save("near_duplicates_benchmark.npz")
+    print(f"Saved index in {perf_counter() - start_time:.2f} seconds")
+    start_time = perf_counter()
+    NearDuplicateIndex.load("near_duplicates_benchmark.npz")
+    print(f"Loaded index in {perf_counter() - start_time:.2f} seconds")
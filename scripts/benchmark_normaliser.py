@@ -0,0 +1,52 @@
+from rumour_milled.utils.utils import HeadlineNormaliser
+from time import perf_counter
+import argparse
+import random
+
+
+def legacy_clean_headlines(headlines: list[str]) -> list[str]:
+    cleaned_headlines = [
+        headline.replace("\n", " ").replace("  ", " ").strip()
+        for headline in headlines
+        if len(headline.split(" ")) > 3 and headline not in ["", " "]
+    ]
+    return list(set(cleaned_headlines))
+
+
+def synthetic_headlines(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(5_000)]
+    separators = [" ", " ", " ", "  ", "\n", "  "]
+    headlines = []
+    for _ in range(n):
+        words = rng.choices(vocabulary, k=rng.randint(1, 14))
+        headline = words[0]
+        for word in words[1:]:
+            headline += rng.choice(separators) + word
+        headlines.append(headline)
+    return headlines
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    headlines = synthetic_headlines(args.n, args.seed)
+
+    start_time = perf_counter()
+    legacy = legacy_clean_headlines(headlines)
+    seconds = perf_counter() - start_time
+    print(
+        f"legacy clean_headlines: {args.n / seconds:.0f} headlines/sec, kept {len(legacy)}"
+    )
+
+    for name, normaliser in [
+        ("normaliser", HeadlineNormaliser()),
+        ("normaliser (latin filter)", HeadlineNormaliser(min_latin_ratio=0.9)),
+    ]:
+        start_time = perf_counter()
+        kept = sum(1 for _ in normaliser(iter(headlines)))
+        seconds = perf_counter() - start_time
+        print(f"{name}: {args.n / seconds:.0f} headlines/sec, kept {kept}")
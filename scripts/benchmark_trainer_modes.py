@@ -0,0 +1,106 @@
+from rumour_milled.ml.models.simple import SimpleHeadlineClassifier
+from rumour_milled.ml.models.gan import HeadlinesGenerator, HeadlinesDiscriminator
+from rumour_milled.ml.batching import TensorBatchLoader
+from rumour_milled.ml.train import Trainer, HistoryCallback
+import torch
+import torch.nn as nn
+import torch.optim as optim
+import argparse
+
+
+MODES = {
+    "eager": dict(compile=False, precision="fp32"),
+    "compile": dict(compile=True, precision="fp32"),
+    "bf16": dict(compile=False, precision="bf16"),
+    "compile+bf16": dict(compile=True, precision="bf16"),
+}
+
+
+def classifier_task(n, dim):
+    X = torch.randn(n, dim)
+    w = torch.randn(dim)
+    y = (X @ w > 0).float()[:, None]
+    return (
+        lambda: SimpleHeadlineClassifier(dim, 256, 1),
+        nn.BCEWithLogitsLoss(),
+        X,
+        y,
+    )
+
+
+def discriminator_task(n, dim, noise_dim):
+    # Real embeddings against fakes from an untrained generator
+    generator = HeadlinesGenerator(noise_dim, 256, dim).eval()
+    with torch.no_grad():
+        fake = generator(torch.randn(n // 2, noise_dim))
+    real = torch.tanh(torch.randn(n - n // 2, dim) + 0.5)
+    X = torch.cat([real, fake])
+    y = torch.cat([torch.ones(len(real), 1), torch.zeros(len(fake), 1)])
+    return lambda: HeadlinesDiscriminator(dim, 256), nn.BCELoss(), X, y
+
+
+def generator_task(n, dim, noise_dim):
+    # Regress generator outputs onto fixed targets to time its forward and backward
+    X = torch.randn(n, noise_dim)
+    y = torch.tanh(X @ torch.randn(noise_dim, dim))
+    return lambda: HeadlinesGenerator(noise_dim, 256, dim), nn.MSELoss(), X, y
+
+
+def run(build, loss_fn, X, y, mode, epochs, batch_size, lr):
+    torch.manual_seed(0)
+    split = int(len(X) * 0.8)
+    train_loader = TensorBatchLoader(
+        X[:split], y[:split], batch_size=batch_size, shuffle=True
+    )
+    val_loader = TensorBatchLoader(X[split:], y[split:], batch_size=batch_size)
+    model = build()
+    history = HistoryCallback()
+    trainer = Trainer(
+        model=model,
+        loss_fn=loss_fn,
+        optimiser=optim.Adam(model.parameters(), lr=lr),
+        callbacks=[history],
+        **MODES[mode],
+    )
+    # One untimed epoch absorbs compilation
+    trainer.train_epoch(train_loader)
+    trainer.train(
+        train_loader=train_loader, validation_loader=val_loader, epochs=epochs
+    )
+    steps = sum(len(train_loader) for _ in history.history)
+    seconds = sum(metrics["seconds"] for metrics in history.history)
+    return steps / seconds, history.history[-1]["val_loss"], trainer.precision
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=8192)
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--noise-dim", type=int, default=100)
+    ap.add_argument("--epochs", type=int, default=5)
+    ap.add_argument("--batch-size", type=int, default=128)
+    ap.add_argument("--lr", type=float, default=0.001)
+    ap.add_argument("--threads", type=int, default=None)
+    ap.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    args = ap.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    tasks = {
+        "SimpleHeadlineClassifier": classifier_task(args.n, args.dim),
+        "HeadlinesDiscriminator": discriminator_task(args.n, args.dim, args.noise_dim),
+        "HeadlinesGenerator": generator_task(args.n, args.dim, args.noise_dim),
+    }
+    for name, (build, loss_fn, X, y) in tasks.items():
+        print(name)
+        for mode in args.modes:
+            steps_per_second, val_loss, precision = run(
+                build, loss_fn, X, y, mode, args.epochs, args.batch_size, args.lr
+            )
+            fallback = (
+                " (fell back to fp32)" if precision != MODES[mode]["precision"] else ""
+            )
+            print(
+                f"  {mode:>12}: {steps_per_second:8.1f} steps/sec, final val_loss {val_loss:.4f}{fallback}"
+            )
@@ -0,0 +1,93 @@
+from time import perf_counter
+import numpy as np
+import aiohttp
+import argparse
+import asyncio
+import random
+
+
+WORDS = (
+    "shares markets bank rates inflation oil profits investors court minister "
+    "election tech merger crypto housing jobs report warns rally slump record"
+).split()
+
+
+def make_headlines(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize()
+        for _ in range(n)
+    ]
+
+
+async def worker(session, headlines, hot, args, rng, latencies, counts):
+    while counts["sent"] < args.requests:
+        counts["sent"] += 1
+        batch = [
+            rng.choice(hot) if rng.random() < args.repeat_fraction else headlines.pop()
+            for _ in range(args.headlines_per_request)
+        ]
+        start_time = perf_counter()
+        async with session.post("/classify", json={"headlines": batch}) as r:
+            if r.status != 200:
+                counts["errors"] += 1
+            await r.read()
+        latencies.append(perf_counter() - start_time)
+
+
+async def main(args):
+    unique = args.requests * args.headlines_per_request
+    headlines = make_headlines(unique, args.seed)
+    hot = make_headlines(args.hot_set, args.seed + 1)
+    latencies = []
+    counts = {"sent": 0, "errors": 0}
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(args.url, connector=connector) as session:
+        start_time = perf_counter()
+        await asyncio.gather(
+            *[
+                worker(
+                    session,
+                    headlines,
+                    hot,
+                    args,
+                    random.Random(args.seed + i),
+                    latencies,
+                    counts,
+                )
+                for i in range(args.concurrency)
+            ]
+        )
+        seconds = perf_counter() - start_time
+        async with session.get("/metrics") as r:
+            metrics = await r.json()
+
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    total = len(latencies) * args.headlines_per_request
+    print(
+        f"{len(latencies)} requests ({counts['errors']} errors) with concurrency {args.concurrency} in {seconds:.1f}s"
+    )
+    print(
+        f"client: {len(latencies) / seconds:.1f} requests/sec, {total / seconds:.1f} headlines/sec"
+    )
+    print(f"client latency: p50 {p50:.1f}ms, p90 {p90:.1f}ms, p99 {p99:.1f}ms")
+    print(
+        "server: "
+        + ", ".join(
+            f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}"
+            for k, v in metrics.items()
+        )
+    )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", type=str, default="http://localhost:8080")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--headlines-per-request", type=int, default=1)
+    ap.add_argument("--repeat-fraction", type=float, default=0.3)
+    ap.add_argument("--hot-set", type=int, default=100)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    asyncio.run(main(args))
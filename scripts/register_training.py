@@ -6,30 +6,62 @@ import uuid
 import os
 
 
-def get_estimator():
+# Parsed from the key=value lines written by LoggingCallback
+METRIC_DEFINITIONS = [
+    {"Name": f"train:{name}", "Regex": f"{name}=([-+0-9.eE]+|nan|inf)"}
+    for name in (
+        "train_loss",
+        "val_loss",
+        "samples_per_second",
+        "step_time_p50_ms",
+        "step_time_p99_ms",
+        "data_wait_fraction",
+    )
+]
+
+
+def get_estimator(
+    use_spot_instances: bool = False,
+    instance_count: int = 1,
+    processes_per_host: int = 1,
+):
     load_dotenv()
     session = sagemaker.Session()
     role = os.environ.get("SM_EXEC_ROLE")
 
     run_id = f"{datetime.now(timezone.utc).strftime('%Y-%m-%dT%H-%M-%SZ')}-{uuid.uuid4().hex[:6]}"
+    hyperparameters = {
+        "run-id": run_id,
+        "epochs": 100,
+        "lr": 0.001,
+        "batch-size": 128,
+        "real-size": 128,
+        "fake-size": 128,
+        "embedding-cache": "s3://rumour-milled/cache/embeddings",
+        "patience": 10,
+    }
+    # Data-parallel jobs start every process through torchrun via launch.py
+    distributed = instance_count * processes_per_host > 1
+    if distributed:
+        hyperparameters["nproc-per-node"] = processes_per_host
 
     estimator = PyTorch(
         job_name=f"rumour-milled-train-{run_id}",
-        entry_point="job.py",
+        entry_point="launch.py" if distributed else "job.py",
         source_dir="services/trainer/",
         role=role,
         framework_version="2.7",
         py_version="py312",
         instance_type="ml.m5.xlarge",
-        instance_count=1,
-        hyperparameters={
-            "run-id": run_id,
-            "epochs": 100,
-            "lr": 0.001,
-            "batch-size": 128,
-            "real-size": 128,
-            "fake-size": 128,
-        },
+        instance_count=instance_count,
+        hyperparameters=hyperparameters,
+        environment={"SM_CHECKPOINT_DIR": "/opt/ml/checkpoints"},
+        checkpoint_local_path="/opt/ml/checkpoints",
+        checkpoint_s3_uri=f"s3://rumour-milled/runs/{run_id}/checkpoints/",
+        use_spot_instances=use_spot_instances,
+        max_run=24 * 60 * 60,
+        max_wait=48 * 60 * 60 if use_spot_instances else None,
+        metric_definitions=METRIC_DEFINITIONS,
         dependencies=["dist/rumour_milled-0.1.0-py3-none-any.whl"],
         output_path=f"s3://rumour-milled/runs/{run_id}/output/",
         sagemaker_session=session,
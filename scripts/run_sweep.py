@@ -0,0 +1,38 @@
+from rumour_milled.ml.features import FeatureSet
+from rumour_milled.ml.sweep import DEFAULT_GRID, run_sweep
+import argparse
+import json
+import logging
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--feature-set", type=str, required=True)
+    ap.add_argument("--grid", type=str, default=json.dumps(DEFAULT_GRID))
+    ap.add_argument("--epochs", type=int, default=100)
+    ap.add_argument("--patience", type=int, default=10)
+    ap.add_argument("--n-jobs", type=int, default=None)
+    ap.add_argument("--threads-per-job", type=int, default=1)
+    ap.add_argument("--random-state", type=int, default=42)
+    ap.add_argument("--output", type=str, default=None)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    features = FeatureSet(args.feature_set)
+    X_train, y_train = features.tensors("train")
+    X_val, y_val = features.tensors("test")
+    results = run_sweep(
+        X_train,
+        y_train,
+        X_val,
+        y_val,
+        grid=json.loads(args.grid),
+        epochs=args.epochs,
+        patience=args.patience or None,
+        n_jobs=args.n_jobs,
+        threads_per_job=args.threads_per_job,
+        random_state=args.random_state,
+    )
+    print(results.to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
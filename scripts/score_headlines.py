@@ -0,0 +1,52 @@
+from rumour_milled.ml.bulk import FORMATS, score_file
+import argparse
+import logging
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(
+        description="Score every headline of a JSONL, CSV or Parquet file with a saved model."
+    )
+    ap.add_argument("input", type=str)
+    ap.add_argument("output_dir", type=str)
+    ap.add_argument("--model-path", type=str, required=True)
+    ap.add_argument("--column", type=str, default="title")
+    ap.add_argument("--chunk-size", type=int, default=10_000)
+    ap.add_argument("--input-format", type=str, choices=FORMATS, default=None)
+    ap.add_argument("--output-format", type=str, choices=FORMATS, default="jsonl")
+    ap.add_argument("--keep-columns", type=str, nargs="*", default=None)
+    ap.add_argument("--threshold", type=float, default=0.5)
+    ap.add_argument("--embedding-model", type=str, default="bert-base-uncased")
+    ap.add_argument(
+        "--embedding-backend",
+        type=str,
+        choices=["eager", "int8", "onnx"],
+        default="eager",
+    )
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--n-jobs", type=int, default=1)
+    ap.add_argument("--threads", type=int, default=None)
+    ap.add_argument("--no-resume", action="store_true")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    manifest = score_file(
+        args.input,
+        args.output_dir,
+        args.model_path,
+        column=args.column,
+        chunk_size=args.chunk_size,
+        input_format=args.input_format,
+        output_format=args.output_format,
+        keep_columns=args.keep_columns,
+        threshold=args.threshold,
+        model=args.embedding_model,
+        backend=args.embedding_backend,
+        batch_size=args.batch_size,
+        n_jobs=args.n_jobs,
+        threads=args.threads,
+        resume=not args.no_resume,
+    )
+    print(
+        f"Scored {manifest['rows']} rows into {manifest['chunks']} parts in {args.output_dir}, {manifest['resumed_chunks']} resumed"
+    )
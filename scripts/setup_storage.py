@@ -0,0 +1,10 @@
+from rumour_milled.storage.dynamodb import HeadlineStorage
+from dotenv import load_dotenv
+
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    hs = HeadlineStorage()
+    table = hs.create_table()
+    print(f"Table {table.name} is {table.table_status}")
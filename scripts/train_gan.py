@@ -0,0 +1,60 @@
+from rumour_milled.ml.features import FeatureSet
+from rumour_milled.ml.models.gan import HeadlinesGenerator, HeadlinesDiscriminator
+from rumour_milled.ml.synthetic import EmbeddingNormaliser, EmbeddingSampler, GANTrainer
+from rumour_milled.ml.batching import TensorBatchLoader
+from rumour_milled.ml.train import Checkpoint, LoggingCallback
+from time import perf_counter
+import torch
+import torch.nn.functional as F
+import argparse
+import logging
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--feature-set", type=str, required=True)
+    ap.add_argument("--output", type=str, default="generator.pt")
+    ap.add_argument("--epochs", type=int, default=200)
+    ap.add_argument("--batch-size", type=int, default=128)
+    ap.add_argument("--noise-dim", type=int, default=100)
+    ap.add_argument("--hidden-dim", type=int, default=512)
+    ap.add_argument("--d-steps", type=int, default=1)
+    ap.add_argument("--checkpoint-dir", type=str, default=None)
+    ap.add_argument("--sample-size", type=int, default=1_000_000)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    features = FeatureSet(args.feature_set)
+    X, y = features.tensors("train")
+    # Only the fake class is modelled
+    real = X[y.squeeze(1) == 1]
+    dim = real.shape[1]
+    print(f"Training on {len(real)} fake headline embeddings of dimension {dim}")
+
+    normaliser = EmbeddingNormaliser(dim).fit(real)
+    callbacks = [LoggingCallback()]
+    if args.checkpoint_dir:
+        callbacks.append(Checkpoint(args.checkpoint_dir))
+    trainer = GANTrainer(
+        HeadlinesGenerator(args.noise_dim, args.hidden_dim, dim),
+        HeadlinesDiscriminator(dim, args.hidden_dim),
+        normaliser,
+        d_steps=args.d_steps,
+        callbacks=callbacks,
+    )
+    trainer.train(
+        TensorBatchLoader(real, batch_size=args.batch_size, shuffle=True),
+        args.epochs,
+    )
+    trainer.save_generator(args.output, model=features.model)
+
+    sampler = EmbeddingSampler.load(args.output)
+    start_time = perf_counter()
+    synthetic = sampler.sample(args.sample_size)
+    seconds = perf_counter() - start_time
+    print(f"Sampled {args.sample_size / seconds * 60:,.0f} embeddings/minute")
+
+    # Rough fidelity: how close the synthetic moments are to the real ones
+    mean_cosine = F.cosine_similarity(synthetic.mean(0), real.mean(0), dim=0)
+    std_ratio = (synthetic.std(0) / real.std(0).clamp_min(1e-6)).median()
+    print(f"Mean cosine similarity {mean_cosine:.4f}, median std ratio {std_ratio:.3f}")
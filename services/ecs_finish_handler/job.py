@@ -33,7 +33,11 @@ def handler(event, context):
             "batch-size": 128,
             "real-size": 128,
             "fake-size": 128,
+            "embedding-cache": "s3://rumour-milled/cache/embeddings",
         },
+        environment={"SM_CHECKPOINT_DIR": "/opt/ml/checkpoints"},
+        checkpoint_local_path="/opt/ml/checkpoints",
+        checkpoint_s3_uri=f"s3://rumour-milled/runs/{run_id}/checkpoints/",
         dependencies=["dist/rumour_milled-0.1.0-py3-none-any.whl"],
         output_path=f"s3://rumour-milled/runs/{run_id}/output/",
         sagemaker_session=session,
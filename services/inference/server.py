@@ -0,0 +1,49 @@
+from rumour_milled.ml.backends import BACKENDS, check_backend
+from rumour_milled.ml.registry import registry
+from rumour_milled.ml.scoring import ClassifierScorer, load_scorer
+from rumour_milled.ml.serving import MicroBatcher, create_app
+from aiohttp import web
+import argparse
+import logging
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model-path", type=str, default="models/model.pt")
+    ap.add_argument("--embedding-model", type=str, default="bert-base-uncased")
+    ap.add_argument(
+        "--embedding-backend",
+        type=str,
+        choices=BACKENDS,
+        default="eager",
+    )
+    ap.add_argument("--inference-threads", type=int, default=None)
+    ap.add_argument("--max-batch-size", type=int, default=64)
+    ap.add_argument("--max-wait-ms", type=float, default=5.0)
+    ap.add_argument("--cache-size", type=int, default=100_000)
+    ap.add_argument("--threshold", type=float, default=0.5)
+    ap.add_argument("--host", type=str, default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8080)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    check_backend(args.embedding_backend)
+
+    scorer = load_scorer(
+        args.model_path,
+        model=args.embedding_model,
+        batch_size=args.max_batch_size,
+        backend=args.embedding_backend,
+        threads=args.inference_threads,
+    )
+    if isinstance(scorer, ClassifierScorer):
+        # Load the embedding model before accepting requests
+        registry.warm_up(args.embedding_model)
+    scorer(["warm up"])
+
+    batcher = MicroBatcher(
+        scorer,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        cache_size=args.cache_size,
+    )
+    web.run_app(create_app(batcher, args.threshold), host=args.host, port=args.port)
@@ -1,15 +1,33 @@
 from rumour_milled.ml.models.simple import SimpleHeadlineClassifier
-from rumour_milled.ml.train import Trainer
+from rumour_milled.ml.train import Trainer, LoggingCallback, EarlyStopping, Checkpoint
 from rumour_milled.ml.load import load_headlines
 from rumour_milled.ml.preprocess import tokenise_and_vectorise
+from rumour_milled.ml.cache import open_embedding_cache
+from rumour_milled.ml.features import FeatureSet, FeatureSetWriter
 from sklearn.model_selection import train_test_split
-from torch.utils.data import TensorDataset, DataLoader
+from rumour_milled.ml.batching import TensorBatchLoader
+from rumour_milled.ml.backends import BACKENDS, check_backend
+from rumour_milled.ml.profiling import Profiler
+from rumour_milled.ml.synthetic import EmbeddingSampler
+from rumour_milled.ml.distributed import (
+    init_distributed,
+    get_rank,
+    get_world_size,
+    is_main_process,
+    barrier,
+    cleanup_distributed,
+)
+from torch.utils.data import (
+    ConcatDataset,
+    DataLoader,
+    DistributedSampler,
+    TensorDataset,
+)
 import torch
 import torch.nn as nn
 import torch.optim as optim
 import os
-import io
-import boto3
+import logging
 from boto3.dynamodb.conditions import Attr
 
 
@@ -17,56 +35,234 @@ from boto3.dynamodb.conditions import Attr
 # - Change hardcoded model/loss/optimiser
 
 
-def main(run_id, epochs, lr, batch_size, real_size, fake_size, test_size, random_state):
+def build_features(
+    location,
+    run_id,
+    real_size,
+    fake_size,
+    test_size,
+    random_state,
+    embedding_cache,
+    embedding_backend,
+    inference_threads,
+    profiler=None,
+):
     real_headlines, _ = load_headlines(
-        filter_expression=Attr("label").eq(0), max_items=real_size
+        filter_expression=Attr("label").eq(0),
+        max_items=real_size,
+        storage_tag=f"trainer:{run_id}",
     )
     fake_headlines, _ = load_headlines(
-        filter_expression=Attr("label").eq(1), max_items=fake_size
+        filter_expression=Attr("label").eq(1),
+        max_items=fake_size,
+        storage_tag=f"trainer:{run_id}",
     )
     headlines = real_headlines + fake_headlines
-    X = tokenise_and_vectorise(headlines, batch_size=128)
-    real_y = torch.zeros((real_size, 1))
-    fake_y = torch.ones((fake_size, 1))
+    cache = open_embedding_cache(embedding_cache, backend=embedding_backend)
+    X = tokenise_and_vectorise(
+        headlines,
+        batch_size=128,
+        cache=cache,
+        backend=embedding_backend,
+        threads=inference_threads,
+        profiler=profiler,
+    )
+    if cache is not None:
+        cache.save()
+    real_y = torch.zeros((len(real_headlines), 1))
+    fake_y = torch.ones((len(fake_headlines), 1))
     y = torch.cat([real_y, fake_y])
-    X_train, X_test, y_train, y_test = train_test_split(
+    X_train, X_test, y_train, y_test, h_train, h_test = train_test_split(
         X,
         y,
+        headlines,
         test_size=test_size,
         random_state=random_state,
         stratify=y.squeeze().numpy(),
     )
+    with FeatureSetWriter(location, model="bert-base-uncased") as writer:
+        writer.add("train", X_train, y_train, h_train)
+        writer.add("test", X_test, y_test, h_test)
+    return FeatureSet(location)
 
-    buffer = io.BytesIO()
-    torch.save(
-        {"X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test},
-        buffer,
-    )
-    buffer.seek(0)
-    s3 = boto3.client("s3")
-    s3.put_object(
-        Bucket="rumour-milled",
-        Key=f"runs/{run_id}/input/data.pt",
-        Body=buffer.getvalue(),
-    )
 
-    train_dataset = TensorDataset(X_train, y_train)
-    val_dataset = TensorDataset(X_test, y_test)
+def main(
+    run_id,
+    epochs,
+    lr,
+    batch_size,
+    real_size,
+    fake_size,
+    test_size,
+    random_state,
+    embedding_cache,
+    embedding_backend,
+    inference_threads,
+    feature_set,
+    log_every,
+    loader,
+    patience,
+    checkpoint_dir,
+    checkpoint_every,
+    num_threads,
+    num_interop_threads,
+    compile,
+    precision,
+    profile,
+    profile_dir,
+    profile_wait,
+    profile_warmup,
+    profile_active,
+    profile_repeat,
+    synthetic_generator,
+    synthetic_size,
+):
+    # Fail before the DynamoDB scan rather than at embedding time
+    check_backend(embedding_backend)
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if num_interop_threads:
+        torch.set_num_interop_threads(num_interop_threads)
+
+    profiler = None
+    if profile:
+        # SageMaker uploads the output data directory with the job output
+        profile_dir = profile_dir or os.path.join(
+            os.environ.get("SM_OUTPUT_DATA_DIR", "output"), "profiles"
+        )
+        profiler = Profiler(
+            profile_dir,
+            wait=profile_wait,
+            warmup=profile_warmup,
+            active=profile_active,
+            repeat=profile_repeat,
+        )
+
+    # A no-op unless launched by torchrun with more than one process
+    distributed = init_distributed()
+    rank, world_size = get_rank(), get_world_size()
 
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=batch_size)
+    location = feature_set or f"s3://rumour-milled/runs/{run_id}/input/features"
+    features = FeatureSet(location)
+    if features.exists:
+        logging.info(f"Reusing feature set {location}")
+    elif is_main_process():
+        features = build_features(
+            location,
+            run_id,
+            real_size,
+            fake_size,
+            test_size,
+            random_state,
+            embedding_cache,
+            embedding_backend,
+            inference_threads,
+            profiler,
+        )
+    # Other ranks wait for rank 0 to write the feature set, then read it
+    barrier()
+    if not features.exists:
+        features = FeatureSet(location)
 
-    model = SimpleHeadlineClassifier(768, 256, 1)
+    sampler = None
+    if synthetic_generator and synthetic_size:
+        sampler = EmbeddingSampler.load(synthetic_generator)
+        if sampler.model and sampler.model != features.model:
+            raise ValueError(
+                f"Generator is for {sampler.model} embeddings, not {features.model}"
+            )
+        logging.info(f"Adding {synthetic_size} synthetic fake headlines")
+    # Same seed on every rank, so the ranks shard identical training sets
+    synthetic_seed = torch.Generator().manual_seed(random_state)
+
+    if loader == "stream":
+        # Memory-mapped shards, for feature sets that do not fit in memory
+        train_dataset, val_dataset = features.dataset("train"), features.dataset("test")
+        if sampler is not None:
+            synthetic = sampler.sample(synthetic_size, generator=synthetic_seed)
+            train_dataset = ConcatDataset(
+                [
+                    train_dataset,
+                    TensorDataset(synthetic, torch.ones((synthetic_size, 1))),
+                ]
+            )
+        if distributed:
+            train_loader = DataLoader(
+                train_dataset,
+                batch_size=batch_size,
+                sampler=DistributedSampler(train_dataset, shuffle=True),
+            )
+            val_loader = DataLoader(
+                val_dataset,
+                batch_size=batch_size,
+                # Unpadded, unlike DistributedSampler, so no row is evaluated twice
+                sampler=range(rank, len(val_dataset), world_size),
+            )
+        else:
+            train_loader = DataLoader(
+                train_dataset, batch_size=batch_size, shuffle=True
+            )
+            val_loader = DataLoader(val_dataset, batch_size=batch_size)
+    else:
+        X_train, y_train = features.tensors("train")
+        if sampler is not None:
+            X_train, y_train = sampler.augment(
+                X_train, y_train, synthetic_size, generator=synthetic_seed
+            )
+        # Every rank loads the split and iterates over its own shard
+        train_loader = TensorBatchLoader(
+            X_train,
+            y_train,
+            batch_size=batch_size,
+            shuffle=True,
+            num_replicas=world_size,
+            rank=rank,
+            seed=random_state,
+        )
+        val_loader = TensorBatchLoader(
+            *features.tensors("test"),
+            batch_size=batch_size,
+            num_replicas=world_size,
+            rank=rank,
+            pad=False,
+        )
+
+    model = SimpleHeadlineClassifier(features.manifest["dim"], 256, 1)
     loss_fn = nn.BCEWithLogitsLoss()
     optimiser = optim.Adam(model.parameters(), lr=lr)
-    trainer = Trainer(model=model, loss_fn=loss_fn, optimiser=optimiser)
+    callbacks = [LoggingCallback()]
+    if patience:
+        callbacks.append(EarlyStopping(monitor="val_loss", patience=patience))
+    # Only resume from a directory meant for this run, not whatever an earlier local run left behind
+    checkpoint_dir = checkpoint_dir or os.environ.get("SM_CHECKPOINT_DIR")
+    # Last, so the early stopping state of each epoch is checkpointed with it
+    callbacks.append(
+        Checkpoint(
+            checkpoint_dir or os.path.join("checkpoints", run_id or "local"),
+            every=checkpoint_every,
+            resume=checkpoint_dir is not None,
+        )
+    )
+    trainer = Trainer(
+        model=model,
+        loss_fn=loss_fn,
+        optimiser=optimiser,
+        callbacks=callbacks,
+        sync_every=log_every,
+        compile=compile,
+        precision=precision,
+        distributed=distributed,
+        profiler=profiler,
+    )
     trainer.train(
         train_loader=train_loader, validation_loader=val_loader, epochs=epochs
     )
 
-    output_dir = os.environ.get("SM_MODEL_DIR")
-    os.makedirs(output_dir, exist_ok=True)
-    torch.save(trainer.model.state_dict(), os.path.join(output_dir, "model.pt"))
+    if is_main_process():
+        output_dir = os.environ.get("SM_MODEL_DIR")
+        os.makedirs(output_dir, exist_ok=True)
+        torch.save(trainer.model.state_dict(), os.path.join(output_dir, "model.pt"))
+    cleanup_distributed()
 
 
 if __name__ == "__main__":
@@ -81,7 +277,34 @@ if __name__ == "__main__":
     ap.add_argument("--fake-size", type=int, default=128)
     ap.add_argument("--test-size", type=float, default=0.2)
     ap.add_argument("--random-state", type=int, default=42)
+    ap.add_argument("--embedding-cache", type=str, default=None)
+    ap.add_argument("--embedding-backend", type=str, choices=BACKENDS, default="eager")
+    ap.add_argument("--inference-threads", type=int, default=None)
+    ap.add_argument("--feature-set", type=str, default=None)
+    ap.add_argument("--log-every", type=int, default=None)
+    ap.add_argument(
+        "--loader", type=str, choices=["tensor", "stream"], default="tensor"
+    )
+    ap.add_argument("--patience", type=int, default=None)
+    ap.add_argument("--checkpoint-dir", type=str, default=None)
+    ap.add_argument("--checkpoint-every", type=int, default=1)
+    ap.add_argument("--num-threads", type=int, default=None)
+    ap.add_argument("--num-interop-threads", type=int, default=None)
+    # SageMaker passes hyperparameters as strings, so flags are 0 or 1
+    ap.add_argument("--compile", type=int, choices=[0, 1], default=0)
+    ap.add_argument("--precision", type=str, choices=["fp32", "bf16"], default="fp32")
+    ap.add_argument("--profile", type=int, choices=[0, 1], default=0)
+    ap.add_argument("--profile-dir", type=str, default=None)
+    ap.add_argument("--profile-wait", type=int, default=1)
+    ap.add_argument("--profile-warmup", type=int, default=1)
+    ap.add_argument("--profile-active", type=int, default=3)
+    ap.add_argument("--profile-repeat", type=int, default=1)
+    ap.add_argument("--synthetic-generator", type=str, default=None)
+    ap.add_argument("--synthetic-size", type=int, default=0)
     args = ap.parse_args()
+    # Only rank 0 logs progress when launched with torchrun
+    rank = int(os.environ.get("RANK", 0))
+    logging.basicConfig(level=logging.INFO if rank == 0 else logging.WARNING)
     main(
         args.run_id,
         args.epochs,
@@ -91,4 +314,25 @@ if __name__ == "__main__":
         args.fake_size,
         args.test_size,
         args.random_state,
+        args.embedding_cache,
+        args.embedding_backend,
+        args.inference_threads,
+        args.feature_set,
+        args.log_every,
+        args.loader,
+        args.patience,
+        args.checkpoint_dir,
+        args.checkpoint_every,
+        args.num_threads,
+        args.num_interop_threads,
+        bool(args.compile),
+        args.precision,
+        bool(args.profile),
+        args.profile_dir,
+        args.profile_wait,
+        args.profile_warmup,
+        args.profile_active,
+        args.profile_repeat,
+        args.synthetic_generator,
+        args.synthetic_size,
     )
@@ -0,0 +1,57 @@
+"""Launch job.py with torchrun, locally or across the instances of a SageMaker job.
+
+On SageMaker, SM_HOSTS lists the instances and SM_CURRENT_HOST names this one; the first host is the rendezvous master. Elsewhere, every process runs on this machine. Any arguments besides --nproc-per-node and --master-port are passed through to job.py.
+
+    python services/trainer/launch.py --nproc-per-node 4 --run-id local --epochs 10
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+import subprocess
+
+
+def torchrun_command(nproc_per_node: int, master_port: int, job_args: list[str]):
+    """Build the torchrun command line for this machine.
+
+    Args:
+        nproc_per_node (int): Training processes per machine.
+        master_port (int): Rendezvous port on the master.
+        job_args (list[str]): Arguments for job.py.
+
+    Returns:
+        list[str]: The command.
+    """
+    command = [
+        sys.executable,
+        "-m",
+        "torch.distributed.run",
+        f"--nproc-per-node={nproc_per_node}",
+    ]
+    hosts = json.loads(os.environ.get("SM_HOSTS", "[]"))
+    if len(hosts) > 1:
+        current_host = os.environ["SM_CURRENT_HOST"]
+        command += [
+            f"--nnodes={len(hosts)}",
+            f"--node-rank={hosts.index(current_host)}",
+            f"--master-addr={hosts[0]}",
+            f"--master-port={master_port}",
+        ]
+    else:
+        command += ["--standalone", "--nnodes=1"]
+    job = os.path.join(os.path.dirname(os.path.abspath(__file__)), "job.py")
+    return command + [job, *job_args]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--nproc-per-node", type=int, default=1)
+    ap.add_argument("--master-port", type=int, default=29500)
+    args, job_args = ap.parse_known_args()
+    logging.basicConfig(level=logging.INFO)
+
+    command = torchrun_command(args.nproc_per_node, args.master_port, job_args)
+    logging.info(" ".join(command))
+    sys.exit(subprocess.run(command).returncode)
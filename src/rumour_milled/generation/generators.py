@@ -2,8 +2,9 @@ import json
 import os
 import asyncio
 import logging
-from rumour_milled.utils.utils import clean_headlines
-from rumour_milled.storage.dynamodb import HeadlineStorage
+from rumour_milled.utils.utils import HeadlineNormaliser
+from rumour_milled.storage.base import get_headline_storage
+from rumour_milled.storage.writer import HeadlineWriter
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 from typing import Optional
@@ -26,12 +27,16 @@ class HeadlinesGenerator:
         max_workers: int = 20,
         log_path: os.PathLike = "generator.log",
         api_key: Optional[str] = None,
+        storage_backend: Optional[str] = None,
+        dedup: bool = False,
     ):
         """Initialize the HeadlinesGenerator, OpenAI client, and supporting locks and storage.
 
         Args:
             max_workers (int): Maximum number of concurrent workers for headline generation. Defaults to 20.
             api_key (Optional[str]): OpenAI API key. If None, loads from environment variable "OPENAI_API_KEY".
+            storage_backend (Optional[str]): Headline storage backend, "dynamodb" or "sqlite". If None, loads from environment variable "RUMOUR_MILLED_STORAGE" or defaults to "dynamodb".
+            dedup (bool): Skip writing headlines that are already stored. Defaults to False.
         """
         load_dotenv()
         if api_key is None:
@@ -54,7 +59,11 @@ class HeadlinesGenerator:
         self._headlines = set()
         self._remaining = None
         self.logger = self.setup_logger()
-        self.headline_storage = HeadlineStorage()
+        self.headline_storage = get_headline_storage(
+            storage_backend, dedup=dedup, tag=self.__class__.__name__
+        )
+        self.headline_writer = HeadlineWriter(self.headline_storage)
+        self.normaliser = HeadlineNormaliser()
         self._headlines_lock = asyncio.Lock()
         self._remaining_lock = asyncio.Lock()
 
@@ -135,22 +144,32 @@ class HeadlinesGenerator:
                     if len(self._headlines) >= n:
                         return
                 await asyncio.sleep(0.5)
-                self.save(headlines)
+                await self.headline_writer.submit_async(self._to_items(headlines))
 
         async with asyncio.TaskGroup() as tg:
             for _ in range(workers):
                 tg.create_task(worker())
 
-    def save(self, headlines: Optional[list[str]] = None):
-        """Save the generated headlines to DynamoDB using HeadlineStorage."""
-        if headlines is None:
-            headlines = self._headlines
-        items = [
+    def _to_items(self, headlines) -> list[dict]:
+        """Normalise headlines and convert them to storage items labelled as fake."""
+        return [
             {"headline": headline, "label": 1}
-            for headline in clean_headlines(headlines)
+            for headline in self.normaliser(headlines)
         ]
+
+    def save(self, headlines: Optional[list[str]] = None, wait: bool = True):
+        """Save the generated headlines to the configured headline storage.
+
+        Args:
+            headlines (Optional[list[str]]): Headlines to save. If None, saves all generated headlines.
+            wait (bool): Block until the headlines have been written. Defaults to True.
+        """
+        if headlines is None:
+            headlines = self._headlines
         self.logger.info("Saving generated headlines")
-        self.headline_storage.put_items(items)
+        self.headline_writer.submit(self._to_items(headlines))
+        if wait:
+            self.headline_writer.flush()
 
     def generate_headlines(self, n: int) -> None:
         """Synchronous entry point to generate n headlines and save them to storage.
@@ -160,6 +179,7 @@ class HeadlinesGenerator:
         """
         start_time = perf_counter()
         asyncio.run(self.__generate_headlines(n))
+        self.headline_writer.flush()
         self.logger.info(
             f"Generated {len(self._headlines)} headlines in {perf_counter() - start_time:.2f} seconds."
         )
@@ -0,0 +1,272 @@
+import importlib.util
+import torch
+import torch.nn as nn
+from pathlib import Path
+from os import PathLike
+from typing import Literal, Optional
+from transformers import AutoModel
+from rumour_milled.ml.registry import registry
+
+
+BACKENDS = ("eager", "int8", "onnx")
+Backend = Literal["eager", "int8", "onnx"]
+_ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+
+
+class CLSEmbedding(nn.Module):
+    """Wrap a Hugging Face encoder so that its forward returns only the CLS vectors.
+
+    Args:
+        model (nn.Module): Encoder returning last_hidden_state.
+    """
+
+    def __init__(self, model: nn.Module):
+        """Initialize the CLSEmbedding.
+
+        Args:
+            model (nn.Module): Encoder returning last_hidden_state.
+        """
+        super().__init__()
+        self.model = model
+        self.hidden_size = model.config.hidden_size
+
+    def forward(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor,
+        token_type_ids: Optional[torch.Tensor] = None,
+    ) -> torch.Tensor:
+        kwargs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if token_type_ids is not None:
+            kwargs["token_type_ids"] = token_type_ids
+        return self.model(**kwargs).last_hidden_state[:, 0]
+
+
+class TorchEmbedder:
+    """Embed tokenised headlines with a PyTorch module under inference mode.
+
+    Args:
+        module (CLSEmbedding): Module returning CLS vectors.
+        device (torch.device): Device the module is on.
+    """
+
+    def __init__(self, module: CLSEmbedding, device: torch.device):
+        """Initialize the TorchEmbedder.
+
+        Args:
+            module (CLSEmbedding): Module returning CLS vectors.
+            device (torch.device): Device the module is on.
+        """
+        self.module = module
+        self.device = device
+        self.hidden_size = module.hidden_size
+
+    def __call__(self, tokens: dict) -> torch.Tensor:
+        """Embed a batch of tokens.
+
+        Args:
+            tokens (dict): Padded token tensors.
+
+        Returns:
+            torch.Tensor: batch size x hidden size CLS vectors on the CPU.
+        """
+        with torch.inference_mode():
+            tokens = {k: v.to(self.device) for k, v in tokens.items()}
+            return self.module(**tokens).cpu()
+
+
+class ONNXEmbedder:
+    """Embed tokenised headlines with an ONNX Runtime session.
+
+    Args:
+        session (onnxruntime.InferenceSession): Session for a model exported with export_onnx.
+        hidden_size (int): Size of the CLS vectors.
+    """
+
+    def __init__(self, session, hidden_size: int):
+        """Initialize the ONNXEmbedder.
+
+        Args:
+            session (onnxruntime.InferenceSession): Session for a model exported with export_onnx.
+            hidden_size (int): Size of the CLS vectors.
+        """
+        self.session = session
+        self.hidden_size = hidden_size
+        self.input_names = [i.name for i in session.get_inputs()]
+
+    def __call__(self, tokens: dict) -> torch.Tensor:
+        """Embed a batch of tokens.
+
+        Args:
+            tokens (dict): Padded token tensors.
+
+        Returns:
+            torch.Tensor: batch size x hidden size CLS vectors.
+        """
+        inputs = {name: tokens[name].numpy() for name in self.input_names}
+        (vectors,) = self.session.run(None, inputs)
+        return torch.from_numpy(vectors)
+
+
+def set_inference_threads(threads: Optional[int]) -> None:
+    """Set the number of intra-op threads PyTorch uses, e.g. to the number of physical cores.
+
+    Args:
+        threads (Optional[int]): Number of threads, or None to leave the default.
+    """
+    if threads:
+        torch.set_num_threads(threads)
+
+
+def quantise(model: str) -> CLSEmbedding:
+    """Load a model with its linear layers dynamically quantised to int8 for CPU inference.
+
+    Args:
+        model (str): Hugging Face model name or path.
+
+    Returns:
+        CLSEmbedding: The quantised model.
+    """
+    module = CLSEmbedding(AutoModel.from_pretrained(model)).eval()
+    return torch.ao.quantization.quantize_dynamic(
+        module, {nn.Linear}, dtype=torch.qint8
+    )
+
+
+def export_onnx(model: str, path: PathLike) -> Path:
+    """Export a model to ONNX with dynamic batch and sequence axes.
+
+    Args:
+        model (str): Hugging Face model name or path.
+        path (PathLike): Path to write the .onnx file to.
+
+    Returns:
+        Path: Path of the exported model.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    module = CLSEmbedding(AutoModel.from_pretrained(model)).eval()
+    tokens = registry.tokenise(
+        model, ["export headline", "a longer export headline"], padding=True
+    )
+    names = [name for name in _ONNX_INPUTS if name in tokens]
+    args = tuple(torch.tensor(tokens[name]) for name in names)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic_axes["cls"] = {0: "batch"}
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            args,
+            str(path),
+            input_names=names,
+            output_names=["cls"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+    return path
+
+
+def _onnx_embedder(model: str, threads: Optional[int], onnx_dir: PathLike):
+    """Export a model to ONNX if needed and open an ONNX Runtime session for it."""
+    import onnxruntime as ort
+
+    path = Path(onnx_dir) / f"{model.replace('/', '__')}.onnx"
+    if not path.exists():
+        export_onnx(model, path)
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads or torch.get_num_threads()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(
+        str(path), options, providers=["CPUExecutionProvider"]
+    )
+    hidden_size = session.get_outputs()[0].shape[-1]
+    return ONNXEmbedder(session, hidden_size)
+
+
+def check_backend(backend: str) -> None:
+    """Check that an inference backend exists and that its optional dependencies are installed, so a job can fail before doing any work.
+
+    Args:
+        backend (str): Inference backend, one of "eager", "int8" or "onnx".
+
+    Raises:
+        ValueError: If the backend is unknown.
+        ImportError: If the "onnx" backend is asked for without onnx and onnxruntime installed.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown inference backend {backend}, expected one of {BACKENDS}"
+        )
+    if backend == "onnx":
+        missing = [
+            module
+            for module in ("onnx", "onnxruntime")
+            if importlib.util.find_spec(module) is None
+        ]
+        if missing:
+            raise ImportError(
+                f"The onnx backend needs {', '.join(missing)}, install the rumour-milled[onnx] extra"
+            )
+
+
+def get_embedder(
+    model: str = "bert-base-uncased",
+    backend: Backend = "eager",
+    device: Optional[torch.device] = None,
+    threads: Optional[int] = None,
+    onnx_dir: PathLike = "/tmp/rumour_milled/onnx",
+):
+    """Get a cached embedder returning CLS vectors for a model and inference backend.
+
+    "eager" runs the fp32 model under torch.inference_mode on any device. "int8" dynamically quantises the linear layers to int8 and "onnx" runs an exported model with ONNX Runtime; both are CPU only.
+
+    Args:
+        model (str, optional): Hugging Face model name or path. Defaults to "bert-base-uncased".
+        backend (Backend, optional): Inference backend, one of "eager", "int8" or "onnx". Defaults to "eager".
+        device (Optional[torch.device], optional): Device for the "eager" backend. Defaults to CUDA if available, otherwise CPU.
+        threads (Optional[int], optional): Number of intra-op threads. Defaults to None, leaving the PyTorch default.
+        onnx_dir (PathLike, optional): Directory for exported ONNX models. Defaults to "/tmp/rumour_milled/onnx".
+
+    Returns:
+        Union[TorchEmbedder, ONNXEmbedder]: Callable mapping padded token tensors to CLS vectors.
+    """
+    set_inference_threads(threads)
+    if backend == "eager":
+        if device is None:
+            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        device = torch.device(device)
+        module = CLSEmbedding(registry.get_model(model, device))
+        return TorchEmbedder(module, device)
+    if device is not None and torch.device(device).type != "cpu":
+        raise ValueError(f"The {backend} backend only runs on the CPU")
+    if backend == "int8":
+        module = registry.get(("int8", model), lambda: quantise(model))
+        return TorchEmbedder(module, torch.device("cpu"))
+    if backend == "onnx":
+        return registry.get(
+            ("onnx", model, threads), lambda: _onnx_embedder(model, threads, onnx_dir)
+        )
+    raise ValueError(f"Unknown inference backend {backend}, expected one of {BACKENDS}")
+
+
+def check_parity(
+    reference: torch.Tensor, candidate: torch.Tensor, min_cosine: float = 0.99
+) -> dict:
+    """Compare embeddings from an inference backend against reference embeddings.
+
+    Args:
+        reference (torch.Tensor): Reference embeddings, e.g. from the "eager" backend.
+        candidate (torch.Tensor): Embeddings of the same headlines from another backend.
+        min_cosine (float, optional): Lowest per-headline cosine similarity within tolerance. Defaults to 0.99.
+
+    Returns:
+        dict: "max_abs_diff", "mean_cosine", "min_cosine" and "within_tolerance".
+    """
+    cosine = nn.functional.cosine_similarity(reference, candidate, dim=1)
+    return {
+        "max_abs_diff": (reference - candidate).abs().max().item(),
+        "mean_cosine": cosine.mean().item(),
+        "min_cosine": cosine.min().item(),
+        "within_tolerance": bool(cosine.min().item() >= min_cosine),
+    }
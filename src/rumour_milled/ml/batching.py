@@ -0,0 +1,147 @@
+import math
+import torch
+from typing import Iterator, Optional
+
+
+class TensorBatchLoader:
+    """Batch iterator over in-memory tensors, a drop-in replacement for DataLoader over a TensorDataset.
+
+    DataLoader fetches and collates every sample in Python. This loader instead shuffles with a single randperm per epoch, gathers each tensor once into that order and yields contiguous slices, so a batch costs a view rather than batch_size Python calls. Tensors can be moved to the training device up front, or pinned so that copies to a GPU are asynchronous.
+
+    For distributed training, num_replicas and rank give each process a disjoint shard of the rows, like DistributedSampler. Every rank shuffles with the same seeded permutation, reseeded by set_epoch, and the rows are padded by repetition so every rank runs the same number of batches. Evaluation loaders should pass pad=False, so that no row is counted twice; shards then differ in length by at most one row.
+
+    Args:
+        *tensors (torch.Tensor): Tensors with the same first dimension, e.g. X and y.
+        batch_size (int, optional): Batch size. Defaults to 32.
+        shuffle (bool, optional): Reshuffle rows every epoch. Defaults to False.
+        drop_last (bool, optional): Drop the last incomplete batch. Defaults to False.
+        device (Optional[torch.device], optional): Device to move the tensors to once, up front. Defaults to None, leaving them where they are.
+        pin_memory (bool, optional): Gather CPU batches into pinned memory. Defaults to False.
+        generator (Optional[torch.Generator], optional): Random generator for shuffling. Ignored when sharding, which uses seed. Defaults to None.
+        num_replicas (Optional[int], optional): Number of processes to shard the rows across. Defaults to None, not sharding.
+        rank (Optional[int], optional): Shard of this process, from 0 to num_replicas - 1. Defaults to None.
+        seed (int, optional): Base seed of the shared shuffle when sharding. Defaults to 0.
+        pad (bool, optional): Pad the shards by repetition to the same length. Defaults to True.
+    """
+
+    def __init__(
+        self,
+        *tensors: torch.Tensor,
+        batch_size: int = 32,
+        shuffle: bool = False,
+        drop_last: bool = False,
+        device: Optional[torch.device] = None,
+        pin_memory: bool = False,
+        generator: Optional[torch.Generator] = None,
+        num_replicas: Optional[int] = None,
+        rank: Optional[int] = None,
+        seed: int = 0,
+        pad: bool = True,
+    ):
+        """Initialize the TensorBatchLoader.
+
+        Args:
+            *tensors (torch.Tensor): Tensors with the same first dimension, e.g. X and y.
+            batch_size (int, optional): Batch size. Defaults to 32.
+            shuffle (bool, optional): Reshuffle rows every epoch. Defaults to False.
+            drop_last (bool, optional): Drop the last incomplete batch. Defaults to False.
+            device (Optional[torch.device], optional): Device to move the tensors to once, up front. Defaults to None, leaving them where they are.
+            pin_memory (bool, optional): Gather CPU batches into pinned memory. Defaults to False.
+            generator (Optional[torch.Generator], optional): Random generator for shuffling. Ignored when sharding, which uses seed. Defaults to None.
+            num_replicas (Optional[int], optional): Number of processes to shard the rows across. Defaults to None, not sharding.
+            rank (Optional[int], optional): Shard of this process, from 0 to num_replicas - 1. Defaults to None.
+            seed (int, optional): Base seed of the shared shuffle when sharding. Defaults to 0.
+            pad (bool, optional): Pad the shards by repetition to the same length. Defaults to True.
+        """
+        if not tensors:
+            raise ValueError("TensorBatchLoader needs at least one tensor")
+        if any(len(t) != len(tensors[0]) for t in tensors):
+            raise ValueError("All tensors must have the same first dimension")
+        if device is not None:
+            tensors = tuple(t.to(device) for t in tensors)
+        self.tensors = tensors
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        # Pinning only helps, and is only possible, when copying to a GPU
+        self.pin_memory = (
+            pin_memory and tensors[0].device.type == "cpu" and torch.cuda.is_available()
+        )
+        self.generator = generator
+        self.num_replicas = num_replicas or 1
+        self.rank = rank or 0
+        if not 0 <= self.rank < self.num_replicas:
+            raise ValueError(f"rank {rank} is out of range for {num_replicas} replicas")
+        self.seed = seed
+        self.pad = pad
+        self.epoch = 0
+        self._buffers = None
+
+    def set_epoch(self, epoch: int) -> None:
+        """Set the epoch that seeds the shared shuffle when sharding.
+
+        Args:
+            epoch (int): Epoch number.
+        """
+        self.epoch = epoch
+
+    def _rows(self) -> int:
+        """Number of rows this process iterates over per epoch."""
+        n = len(self.tensors[0])
+        if self.pad:
+            return math.ceil(n / self.num_replicas)
+        return len(range(self.rank, n, self.num_replicas))
+
+    def __len__(self) -> int:
+        """Number of batches per epoch."""
+        n = self._rows()
+        if self.drop_last:
+            return n // self.batch_size
+        return math.ceil(n / self.batch_size)
+
+    def _indices(self) -> Optional[torch.Tensor]:
+        """Rows of this epoch in order, or None to use the tensors as they are."""
+        n = len(self.tensors[0])
+        if self.num_replicas == 1:
+            if not self.shuffle:
+                return None
+            return torch.randperm(n, generator=self.generator)
+        if self.shuffle:
+            # Every rank draws the same permutation and takes its own shard
+            generator = torch.Generator().manual_seed(self.seed + self.epoch)
+            indices = torch.randperm(n, generator=generator)
+        else:
+            indices = torch.arange(n)
+        total = math.ceil(n / self.num_replicas) * self.num_replicas
+        if self.pad and total > n:
+            indices = indices.repeat(math.ceil(total / n))[:total]
+        return indices[self.rank :: self.num_replicas]
+
+    def _epoch_tensors(self) -> tuple[torch.Tensor, ...]:
+        """The tensors in this epoch's order, gathered with a single index per tensor."""
+        indices = self._indices()
+        if indices is None:
+            if self.pin_memory and self._buffers is None:
+                self._buffers = tuple(t.pin_memory() for t in self.tensors)
+            return self._buffers if self.pin_memory else self.tensors
+        indices = indices.to(self.tensors[0].device)
+        if not self.pin_memory:
+            return tuple(t[indices] for t in self.tensors)
+        if self._buffers is None:
+            self._buffers = tuple(
+                torch.empty((len(indices), *t.shape[1:]), dtype=t.dtype).pin_memory()
+                for t in self.tensors
+            )
+        elif torch.cuda.is_available():
+            # Copies from the previous epoch may still be reading the buffers
+            torch.cuda.current_stream().synchronize()
+        for t, buffer in zip(self.tensors, self._buffers):
+            torch.index_select(t, 0, indices, out=buffer)
+        return self._buffers
+
+    def __iter__(self) -> Iterator[tuple[torch.Tensor, ...]]:
+        tensors = self._epoch_tensors()
+        n = len(tensors[0])
+        stop = n - n % self.batch_size if self.drop_last else n
+        for start in range(0, stop, self.batch_size):
+            yield tuple(t[start : start + self.batch_size] for t in tensors)
@@ -0,0 +1,318 @@
+import os
+import json
+import queue
+import logging
+import threading
+import time
+import numpy as np
+import pandas as pd
+import torch
+import torch.multiprocessing as mp
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from os import PathLike
+from pathlib import Path
+from typing import Iterator, Literal, Optional
+from rumour_milled.ml.backends import Backend
+from rumour_milled.ml.scoring import load_scorer
+
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("jsonl", "csv", "parquet")
+Format = Literal["jsonl", "csv", "parquet"]
+PROGRESS = "scoring.json"
+
+
+def _infer_format(path: PathLike) -> str:
+    suffix = Path(path).suffix.lower().lstrip(".")
+    fmt = {"json": "jsonl", "ndjson": "jsonl", "pq": "parquet"}.get(suffix, suffix)
+    if fmt not in FORMATS:
+        raise ValueError(f"Cannot infer the format of {path}, pass one of {FORMATS}")
+    return fmt
+
+
+def read_chunks(
+    path: PathLike,
+    chunk_size: int = 10_000,
+    fmt: Optional[Format] = None,
+    columns: Optional[list[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Read a JSONL, CSV or Parquet file as a stream of DataFrames of at most chunk_size rows.
+
+    Args:
+        path (PathLike): Input file.
+        chunk_size (int, optional): Rows per chunk. Defaults to 10000.
+        fmt (Optional[Format], optional): "jsonl", "csv" or "parquet". Defaults to None, inferring it from the extension.
+        columns (Optional[list[str]], optional): Columns to read, for CSV and Parquet. Defaults to None, reading all columns.
+
+    Yields:
+        pd.DataFrame: The next chunk.
+    """
+    fmt = fmt or _infer_format(path)
+    if fmt == "jsonl":
+        with pd.read_json(path, lines=True, chunksize=chunk_size) as reader:
+            for chunk in reader:
+                yield chunk[columns] if columns else chunk
+    elif fmt == "csv":
+        with pd.read_csv(path, chunksize=chunk_size, usecols=columns) as reader:
+            yield from reader
+    else:
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(
+            batch_size=chunk_size, columns=columns
+        ):
+            yield batch.to_pandas()
+
+
+def _prefetch(chunks: Iterator, size: int) -> Iterator:
+    """Read chunks on a background thread, holding at most size of them ahead."""
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def read():
+        try:
+            for chunk in chunks:
+                while not stop.is_set():
+                    try:
+                        items.put(chunk, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            items.put(done)
+        except Exception as e:
+            items.put(e)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    try:
+        while (item := items.get()) is not done:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def _write_part(path: Path, frame: pd.DataFrame, fmt: Format) -> None:
+    """Write one part atomically, so an interrupted write is never taken as complete."""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    if fmt == "jsonl":
+        frame.to_json(tmp_path, orient="records", lines=True, force_ascii=False)
+    elif fmt == "csv":
+        frame.to_csv(tmp_path, index=False)
+    else:
+        frame.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+_scorer = None
+
+
+def _init_worker(scorer_args: dict, threads: Optional[int]) -> None:
+    global _scorer
+    if threads:
+        torch.set_num_threads(threads)
+    _scorer = load_scorer(**scorer_args)
+
+
+def _score(headlines: list[str]) -> np.ndarray:
+    return np.asarray(_scorer(headlines), dtype=np.float32)
+
+
+def score_file(
+    input_path: PathLike,
+    output_dir: PathLike,
+    model_path: PathLike,
+    column: str = "title",
+    chunk_size: int = 10_000,
+    input_format: Optional[Format] = None,
+    output_format: Format = "jsonl",
+    keep_columns: Optional[list[str]] = None,
+    threshold: float = 0.5,
+    model: str = "bert-base-uncased",
+    backend: Backend = "eager",
+    batch_size: int = 64,
+    n_jobs: int = 1,
+    threads: Optional[int] = None,
+    prefetch: int = 2,
+    resume: bool = True,
+) -> dict:
+    """Score every headline of a file with a saved model, in chunks with bounded memory.
+
+    Chunks are read on a background thread, scored in the main process or a pool of n_jobs worker processes, and each scored chunk is written on a writer thread as its own part file, part-00000.jsonl and so on, in output_dir. At most a few chunks are held in memory at once, whatever the size of the input. Parts are written atomically, so after an interruption the run resumes by skipping the chunks whose parts already exist. A manifest.json listing the parts is written when every chunk is done.
+
+    Args:
+        input_path (PathLike): JSONL, CSV or Parquet file of headlines.
+        output_dir (PathLike): Directory for the part files.
+        model_path (PathLike): Classifier state dict or pickled pipeline, see load_scorer.
+        column (str, optional): Column holding the headlines. Defaults to "title".
+        chunk_size (int, optional): Rows per chunk and part. Defaults to 10000.
+        input_format (Optional[Format], optional): Format of the input. Defaults to None, inferring it from the extension.
+        output_format (Format, optional): Format of the parts. Defaults to "jsonl".
+        keep_columns (Optional[list[str]], optional): Input columns to copy to the output. Defaults to None, copying every column.
+        threshold (float, optional): Fake probability from which a headline is labelled fake. Defaults to 0.5.
+        model (str, optional): Embedding model of a classifier. Defaults to "bert-base-uncased".
+        backend (Backend, optional): Inference backend of a classifier. Defaults to "eager".
+        batch_size (int, optional): Headlines per embedding batch. Defaults to 64.
+        n_jobs (int, optional): Worker processes, each loading its own copy of the model. Defaults to 1, scoring in this process.
+        threads (Optional[int], optional): Intra-op threads per process. Defaults to None.
+        prefetch (int, optional): Chunks read ahead of scoring. Defaults to 2.
+        resume (bool, optional): Skip chunks already written by an earlier run with the same settings. When False, the parts and manifest of an earlier run in output_dir are deleted first. Defaults to True.
+
+    Returns:
+        dict: The manifest, with the number of rows and the parts written.
+
+    Raises:
+        ValueError: If resuming into output_dir that holds parts of a run with different or unknown settings.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if keep_columns is not None:
+        keep_columns = list(keep_columns)
+    # Everything that changes the rows of a part, so that resumed parts match new ones
+    settings = {
+        "input": str(input_path),
+        "input_format": input_format or _infer_format(input_path),
+        "model_path": str(model_path),
+        "model": model,
+        "backend": backend,
+        "column": column,
+        "keep_columns": keep_columns,
+        "threshold": threshold,
+        "chunk_size": chunk_size,
+        "output_format": output_format,
+    }
+    progress_path = output_dir / PROGRESS
+    if resume and progress_path.exists():
+        previous = json.loads(progress_path.read_text())
+        if previous != settings:
+            raise ValueError(
+                f"{output_dir} holds a run with different settings {previous}, score into a new directory or pass resume=False"
+            )
+    elif resume and any(output_dir.glob("part-*")):
+        raise ValueError(
+            f"{output_dir} holds parts of a run with unknown settings, score into a new directory or pass resume=False"
+        )
+    else:
+        for part in output_dir.glob("part-*"):
+            part.unlink()
+        (output_dir / "manifest.json").unlink(missing_ok=True)
+    progress_path.write_text(json.dumps(settings, indent=2))
+
+    scorer_args = {
+        "path": model_path,
+        "model": model,
+        "batch_size": batch_size,
+        "backend": backend,
+        "threads": threads,
+    }
+    columns = None
+    if keep_columns is not None:
+        columns = list(dict.fromkeys([*keep_columns, column]))
+
+    def part_path(index: int) -> Path:
+        return output_dir / f"part-{index:05d}.{output_format}"
+
+    def finish(
+        index: int, chunk: pd.DataFrame, start: int, probabilities
+    ) -> tuple[int, int]:
+        frame = chunk if keep_columns is None else chunk[keep_columns]
+        frame = frame.assign(
+            row=np.arange(start, start + len(chunk)),
+            fake_probability=probabilities,
+            label=(probabilities >= threshold).astype(np.int8),
+        )
+        _write_part(part_path(index), frame, output_format)
+        return index, len(frame)
+
+    def headlines_of(chunk: pd.DataFrame) -> list[str]:
+        return chunk[column].fillna("").astype(str).tolist()
+
+    rows = 0
+    scored = 0
+    skipped = 0
+    start_time = time.perf_counter()
+    # Bounded so that neither scoring nor writing can run far ahead of the other
+    in_flight = max(n_jobs, 1) * 2
+    writes = set()
+    scoring = {}
+    chunks = _prefetch(
+        read_chunks(input_path, chunk_size, input_format, columns), prefetch
+    )
+    writer = ThreadPoolExecutor(max_workers=1)
+    pool = None
+    if n_jobs > 1:
+        # spawn, as forked workers would inherit the parent's torch thread pools
+        pool = ProcessPoolExecutor(
+            max_workers=n_jobs,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(scorer_args, threads),
+        )
+        scorer = None
+    else:
+        scorer = load_scorer(**scorer_args)
+
+    def drain(limit: int) -> None:
+        nonlocal scored
+        while len(scoring) + len(writes) > limit:
+            done, _ = wait([*scoring, *writes], return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in scoring:
+                    index, chunk, start = scoring.pop(future)
+                    writes.add(
+                        writer.submit(finish, index, chunk, start, future.result())
+                    )
+                else:
+                    writes.discard(future)
+                    # Progress is only reported once a chunk is scored and written
+                    index, written = future.result()
+                    scored += written
+                    seconds = time.perf_counter() - start_time
+                    logger.info(
+                        f"Wrote part {index}, {scored} rows scored, {scored / seconds:.0f} rows/sec"
+                    )
+
+    try:
+        for index, chunk in enumerate(chunks):
+            start = rows
+            rows += len(chunk)
+            if resume and part_path(index).exists():
+                logger.info(f"Skipping chunk {index}, already scored")
+                skipped += 1
+                continue
+            if pool is not None:
+                scoring[pool.submit(_score, headlines_of(chunk))] = (
+                    index,
+                    chunk,
+                    start,
+                )
+            else:
+                probabilities = np.asarray(scorer(headlines_of(chunk)), np.float32)
+                writes.add(writer.submit(finish, index, chunk, start, probabilities))
+            drain(in_flight)
+        drain(0)
+    finally:
+        writer.shutdown(wait=True)
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    parts = sorted(path.name for path in output_dir.glob(f"part-*.{output_format}"))
+    manifest = {
+        **settings,
+        "rows": rows,
+        "chunks": len(parts),
+        "resumed_chunks": skipped,
+        "parts": parts,
+    }
+    (output_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return manifest
@@ -0,0 +1,217 @@
+import os
+import json
+import boto3
+import hashlib
+import unicodedata
+import numpy as np
+import torch
+from botocore.exceptions import ClientError
+from os import PathLike
+from pathlib import Path
+from typing import Callable, Literal, Optional
+
+
+class EmbeddingCache:
+    """Persistent on-disk cache of headline embeddings.
+
+    Embeddings are keyed by a content hash of (model name, pooling, normalised headline) and stored per model in a memory-mapped matrix (vectors.bin) with a parallel index of 16-byte keys (keys.bin). New embeddings are appended, so only cache misses ever need computing. The cache can be mirrored to S3 by passing an s3:// URI, in which case it is downloaded to a local directory on open and uploaded on save.
+
+    Args:
+        location (str): Local directory or s3://bucket/prefix URI of the cache.
+        model (str, optional): Name of the embedding model. Defaults to "bert-base-uncased".
+        pooling (str, optional): Pooling used to produce the embedding. Defaults to "cls".
+        dtype (Literal["float16", "float32"], optional): Storage precision. Defaults to "float32".
+        local_dir (PathLike, optional): Local directory used when location is an S3 URI. Defaults to "/tmp/rumour_milled/embeddings".
+        backend (str, optional): Inference backend that produced the embeddings. Non-default backends get their own namespace and keys. Defaults to "eager".
+    """
+
+    def __init__(
+        self,
+        location: str,
+        model: str = "bert-base-uncased",
+        pooling: str = "cls",
+        dtype: Literal["float16", "float32"] = "float32",
+        local_dir: PathLike = "/tmp/rumour_milled/embeddings",
+        backend: str = "eager",
+    ):
+        """Initialize the EmbeddingCache and load its index.
+
+        Args:
+            location (str): Local directory or s3://bucket/prefix URI of the cache.
+            model (str, optional): Name of the embedding model. Defaults to "bert-base-uncased".
+            pooling (str, optional): Pooling used to produce the embedding. Defaults to "cls".
+            dtype (Literal["float16", "float32"], optional): Storage precision. Defaults to "float32".
+            local_dir (PathLike, optional): Local directory used when location is an S3 URI. Defaults to "/tmp/rumour_milled/embeddings".
+            backend (str, optional): Inference backend that produced the embeddings. Non-default backends get their own namespace and keys. Defaults to "eager".
+        """
+        self.model = model
+        self.pooling = pooling
+        self.backend = backend
+        self.dtype = np.dtype(dtype)
+        self.stats = {"hits": 0, "misses": 0}
+        namespace = f"{model.replace('/', '__')}-{pooling}-{dtype}"
+        # Keep existing eager caches valid by only tagging other backends
+        self._variant = pooling if backend == "eager" else f"{pooling}\x1f{backend}"
+        if backend != "eager":
+            namespace = f"{namespace}-{backend}"
+
+        self.s3_bucket, self.s3_prefix = None, None
+        if location.startswith("s3://"):
+            bucket, _, prefix = location[len("s3://") :].partition("/")
+            self.s3_bucket = bucket
+            self.s3_prefix = f"{prefix.rstrip('/')}/{namespace}".lstrip("/")
+            self.directory = Path(local_dir) / namespace
+        else:
+            self.directory = Path(location) / namespace
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.keys_path = self.directory / "keys.bin"
+        self.vectors_path = self.directory / "vectors.bin"
+        self.meta_path = self.directory / "meta.json"
+        if self.s3_bucket:
+            self._download()
+
+        self.dim = None
+        if self.meta_path.exists():
+            self.dim = json.loads(self.meta_path.read_text())["dim"]
+        self._index = {}
+        self._vectors = None
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def key(self, headline: str) -> bytes:
+        """Hash a headline together with the model name, pooling and backend.
+
+        Args:
+            headline (str): Raw headline.
+
+        Returns:
+            bytes: 16-byte cache key.
+        """
+        normalised = " ".join(unicodedata.normalize("NFKC", headline).split())
+        content = f"{self.model}\x1f{self._variant}\x1f{normalised}"
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+
+    def _load_index(self) -> None:
+        """Read the key index, trim rows left by an interrupted append and memory-map the stored vectors."""
+        if self.dim is None:
+            return
+        keys = self.keys_path.read_bytes() if self.keys_path.exists() else b""
+        vectors_size = (
+            self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        )
+        row_bytes = self.dim * self.dtype.itemsize
+        count = min(len(keys) // 16, vectors_size // row_bytes)
+        # Vectors are appended before keys, so a run that died in between leaves
+        # orphan rows. Later appends must start at row count to stay aligned with
+        # the index, so truncate both files rather than only ignoring the rows.
+        if len(keys) > count * 16:
+            os.truncate(self.keys_path, count * 16)
+            keys = keys[: count * 16]
+        if vectors_size > count * row_bytes:
+            os.truncate(self.vectors_path, count * row_bytes)
+        self._index = {keys[i * 16 : (i + 1) * 16]: i for i in range(count)}
+        self._map_vectors()
+
+    def _map_vectors(self) -> None:
+        """Memory-map the vectors file for the rows in the index."""
+        self._vectors = None
+        if self._index:
+            self._vectors = np.memmap(
+                self.vectors_path,
+                dtype=self.dtype,
+                mode="r",
+                shape=(len(self._index), self.dim),
+            )
+
+    def _append(self, keys: list[bytes], vectors: np.ndarray) -> None:
+        """Append new keys and vectors to the cache files."""
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self.meta_path.write_text(
+                json.dumps(
+                    {
+                        "model": self.model,
+                        "pooling": self.pooling,
+                        "backend": self.backend,
+                        "dtype": self.dtype.name,
+                        "dim": self.dim,
+                    }
+                )
+            )
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=self.dtype).tobytes())
+        with open(self.keys_path, "ab") as f:
+            f.write(b"".join(keys))
+        for key in keys:
+            self._index[key] = len(self._index)
+        self._map_vectors()
+
+    def get_or_compute(
+        self,
+        headlines: list[str],
+        compute: Callable[[list[str]], torch.Tensor],
+    ) -> torch.Tensor:
+        """Look up embeddings, computing and storing only the cache misses.
+
+        Args:
+            headlines (list[str]): Raw headlines.
+            compute (Callable[[list[str]], torch.Tensor]): Function embedding a list of headlines.
+
+        Returns:
+            torch.Tensor: len(headlines) x dim float32 tensor of embeddings, in input order.
+        """
+        keys = [self.key(headline) for headline in headlines]
+        missing = {}
+        for key, headline in zip(keys, headlines):
+            if key not in self._index and key not in missing:
+                missing[key] = headline
+        self.stats["misses"] += len(missing)
+        self.stats["hits"] += len(headlines) - len(missing)
+
+        if missing:
+            computed = compute(list(missing.values()))
+            self._append(list(missing), computed.detach().cpu().float().numpy())
+        if not headlines:
+            return torch.empty((0, self.dim or 0))
+        rows = np.fromiter((self._index[key] for key in keys), np.int64, len(keys))
+        return torch.from_numpy(np.asarray(self._vectors[rows], dtype=np.float32))
+
+    def _download(self) -> None:
+        """Download the cache files from S3 if they exist there."""
+        s3 = boto3.client("s3")
+        for path in (self.meta_path, self.keys_path, self.vectors_path):
+            try:
+                s3.download_file(
+                    self.s3_bucket, f"{self.s3_prefix}/{path.name}", str(path)
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                    raise
+
+    def save(self) -> None:
+        """Upload the cache files to S3. Local caches are written as they grow, so this is a no-op for them."""
+        if not self.s3_bucket or self.dim is None:
+            return
+        s3 = boto3.client("s3")
+        for path in (self.vectors_path, self.keys_path, self.meta_path):
+            s3.upload_file(str(path), self.s3_bucket, f"{self.s3_prefix}/{path.name}")
+
+
+def open_embedding_cache(
+    location: Optional[str], model: str = "bert-base-uncased", **kwargs
+) -> Optional[EmbeddingCache]:
+    """Open an EmbeddingCache if a location is given.
+
+    Args:
+        location (Optional[str]): Local directory or s3://bucket/prefix URI, or None to disable caching.
+        model (str, optional): Name of the embedding model. Defaults to "bert-base-uncased".
+        **kwargs: Additional keyword arguments for EmbeddingCache.
+
+    Returns:
+        Optional[EmbeddingCache]: The cache, or None if location is None.
+    """
+    if not location:
+        return None
+    return EmbeddingCache(location, model=model, **kwargs)
@@ -0,0 +1,66 @@
+import os
+import torch
+import torch.distributed as dist
+from datetime import timedelta
+
+
+def init_distributed(backend: str = "gloo", timeout_minutes: int = 120) -> bool:
+    """Join the process group described by the torchrun environment, if there is one.
+
+    torchrun, and launch.py on SageMaker, set RANK, WORLD_SIZE, MASTER_ADDR and MASTER_PORT for every process. Without them, or with a world size of 1, this does nothing and training runs in a single process.
+
+    Args:
+        backend (str, optional): torch.distributed backend. Defaults to "gloo", which runs on CPU.
+        timeout_minutes (int, optional): Collective timeout. Long enough for rank 0 to build the feature set while the other ranks wait. Defaults to 120.
+
+    Returns:
+        bool: Whether this process is part of a multi-process group.
+    """
+    if dist.is_initialized():
+        return True
+    if int(os.environ.get("WORLD_SIZE", 1)) <= 1:
+        return False
+    dist.init_process_group(backend, timeout=timedelta(minutes=timeout_minutes))
+    return True
+
+
+def is_distributed() -> bool:
+    return dist.is_available() and dist.is_initialized()
+
+
+def get_rank() -> int:
+    return dist.get_rank() if is_distributed() else 0
+
+
+def get_world_size() -> int:
+    return dist.get_world_size() if is_distributed() else 1
+
+
+def is_main_process() -> bool:
+    """Whether this is rank 0, the only process that logs and checkpoints."""
+    return get_rank() == 0
+
+
+def barrier() -> None:
+    """Wait for every process, a no-op outside a process group."""
+    if is_distributed():
+        dist.barrier()
+
+
+def all_reduce_sum(tensor: torch.Tensor) -> torch.Tensor:
+    """Sum a tensor over every process in place, a no-op outside a process group.
+
+    Args:
+        tensor (torch.Tensor): Tensor to sum.
+
+    Returns:
+        torch.Tensor: The summed tensor.
+    """
+    if is_distributed():
+        dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor
+
+
+def cleanup_distributed() -> None:
+    if is_distributed():
+        dist.destroy_process_group()
@@ -1,14 +1,90 @@
-from sentence_transformers import SentenceTransformer
+import numpy as np
+import torch
+from typing import Optional
 from sklearn.base import BaseEstimator, TransformerMixin
+from rumour_milled.ml.cache import EmbeddingCache
+from rumour_milled.ml.registry import registry
 
 
 class SentenceTransformerVectoriser(BaseEstimator, TransformerMixin):
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
+    """Scikit-learn transformer embedding texts with a SentenceTransformer model.
+
+    The model is loaded lazily from the process-wide model registry on first use and is never pickled, so saved pipelines only hold the settings below and share one loaded model per process.
+
+    Args:
+        model_name (str, optional): SentenceTransformer model name or path. Defaults to "all-MiniLM-L6-v2".
+        batch_size (int, optional): Encoding batch size. Defaults to 32.
+        normalise_embeddings (bool, optional): Scale embeddings to unit length. Defaults to False.
+        embedding_cache (Optional[str], optional): Local directory or s3://bucket/prefix URI of an EmbeddingCache, so only unseen texts are encoded. Defaults to None.
+        device (Optional[str], optional): Device to run the model on. Defaults to None, letting SentenceTransformer choose.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        batch_size: int = 32,
+        normalise_embeddings: bool = False,
+        embedding_cache: Optional[str] = None,
+        device: Optional[str] = None,
+    ):
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
+        self.batch_size = batch_size
+        self.normalise_embeddings = normalise_embeddings
+        self.embedding_cache = embedding_cache
+        self.device = device
+
+    def __getstate__(self) -> dict:
+        # A copy, as BaseEstimator returns the live __dict__ for estimators outside sklearn
+        state = dict(super().__getstate__())
+        # Weights and cache handles are reloaded on demand, never pickled
+        state.pop("model", None)
+        state.pop("_cache", None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        # Artifacts saved before lazy loading carry the full model, drop it
+        state.pop("model", None)
+        state.setdefault("batch_size", 32)
+        state.setdefault("normalise_embeddings", False)
+        state.setdefault("embedding_cache", None)
+        state.setdefault("device", None)
+        super().__setstate__(state)
+
+    @property
+    def model(self):
+        """The SentenceTransformer model, loaded from the registry on first use."""
+        return registry.get_sentence_transformer(self.model_name, self.device)
+
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        """The EmbeddingCache, opened on first use, or None if caching is disabled."""
+        if self.embedding_cache is None:
+            return None
+        if getattr(self, "_cache", None) is None:
+            pooling = "sentence-transformer"
+            if self.normalise_embeddings:
+                pooling = f"{pooling}-normalised"
+            self._cache = EmbeddingCache(
+                self.embedding_cache, model=self.model_name, pooling=pooling
+            )
+        return self._cache
 
     def fit(self, X, y=None):
         return self
 
-    def transform(self, X):
-        return self.model.encode(X, convert_to_numpy=True)
+    def _encode(self, X: list[str]) -> np.ndarray:
+        return self.model.encode(
+            X,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalise_embeddings,
+            convert_to_numpy=True,
+        )
+
+    def transform(self, X) -> np.ndarray:
+        X = list(X)
+        cache = self.cache
+        if cache is None:
+            return self._encode(X)
+        return cache.get_or_compute(
+            X, lambda X: torch.from_numpy(self._encode(X))
+        ).numpy()
@@ -0,0 +1,336 @@
+import json
+import bisect
+import boto3
+import hashlib
+import numpy as np
+import torch
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from os import PathLike
+from pathlib import Path
+from typing import Literal, Optional
+from torch.utils.data import Dataset
+
+
+MANIFEST = "manifest.json"
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024**2,
+    multipart_chunksize=16 * 1024**2,
+    max_concurrency=8,
+)
+
+
+def headline_id(headline: str) -> int:
+    """Stable 64-bit id of a headline, recorded alongside its features.
+
+    Args:
+        headline (str): Raw headline.
+
+    Returns:
+        int: Unsigned 64-bit id.
+    """
+    digest = hashlib.blake2b(headline.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _local_directory(location: str, local_dir: PathLike) -> tuple:
+    """Resolve a feature set location to (local directory, bucket, prefix)."""
+    if not location.startswith("s3://"):
+        return Path(location), None, None
+    bucket, _, prefix = location[len("s3://") :].partition("/")
+    prefix = prefix.strip("/")
+    digest = hashlib.blake2b(location.encode("utf-8"), digest_size=8).hexdigest()
+    return Path(local_dir) / digest, bucket, prefix
+
+
+class FeatureSetWriter:
+    """Write embeddings, labels and headline ids as a sharded feature set.
+
+    Rows are buffered into fixed-size shards, each written as a .npy file of vectors (float16 by default) with sidecar .npy files of labels and headline ids. A manifest.json records the model, dimension, dtype and the shards of every split. When location is an s3:// URI each shard is uploaded as soon as it is complete, streamed from disk with multipart uploads, and the manifest is uploaded last so readers never see a partial feature set.
+
+    Args:
+        location (str): Local directory or s3://bucket/prefix URI of the feature set.
+        model (str): Name of the model that produced the embeddings.
+        shard_size (int, optional): Rows per shard. Defaults to 65536.
+        dtype (Literal["float16", "float32"], optional): Storage precision of the vectors. Defaults to "float16".
+        local_dir (PathLike, optional): Local staging directory used when location is an S3 URI. Defaults to "/tmp/rumour_milled/features".
+    """
+
+    def __init__(
+        self,
+        location: str,
+        model: str,
+        shard_size: int = 65536,
+        dtype: Literal["float16", "float32"] = "float16",
+        local_dir: PathLike = "/tmp/rumour_milled/features",
+    ):
+        """Initialize the FeatureSetWriter.
+
+        Args:
+            location (str): Local directory or s3://bucket/prefix URI of the feature set.
+            model (str): Name of the model that produced the embeddings.
+            shard_size (int, optional): Rows per shard. Defaults to 65536.
+            dtype (Literal["float16", "float32"], optional): Storage precision of the vectors. Defaults to "float16".
+            local_dir (PathLike, optional): Local staging directory used when location is an S3 URI. Defaults to "/tmp/rumour_milled/features".
+        """
+        self.location = location
+        self.directory, self.s3_bucket, self.s3_prefix = _local_directory(
+            location, local_dir
+        )
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.manifest = {
+            "model": model,
+            "dtype": np.dtype(dtype).name,
+            "dim": None,
+            "splits": {},
+        }
+        self._buffers = {}
+
+    def __enter__(self) -> "FeatureSetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+
+    def add(
+        self,
+        split: str,
+        vectors: torch.Tensor,
+        labels: torch.Tensor,
+        headlines: list[str],
+    ) -> None:
+        """Append rows to a split, writing out every shard that fills up.
+
+        Args:
+            split (str): Split name, e.g. "train" or "test".
+            vectors (torch.Tensor): len(headlines) x dim embeddings.
+            labels (torch.Tensor): Labels of the headlines.
+            headlines (list[str]): Raw headlines, recorded by id.
+        """
+        vectors = np.asarray(torch.as_tensor(vectors).detach().cpu())
+        labels = np.asarray(torch.as_tensor(labels).cpu(), dtype=np.float32)
+        labels = labels.reshape(len(headlines))
+        ids = np.fromiter(map(headline_id, headlines), np.uint64, len(headlines))
+        if self.manifest["dim"] is None:
+            self.manifest["dim"] = vectors.shape[1]
+        buffer = self._buffers.setdefault(split, [])
+        buffer.append((vectors.astype(self.manifest["dtype"]), labels, ids))
+        if sum(len(part[0]) for part in buffer) >= self.shard_size:
+            self._flush(split, final=False)
+
+    def _flush(self, split: str, final: bool) -> None:
+        """Write the rows buffered for a split as full shards, keeping any remainder unless final."""
+        buffer = self._buffers.pop(split, [])
+        if not buffer:
+            return
+        vectors, labels, ids = (np.concatenate(part) for part in zip(*buffer))
+        start = 0
+        while len(vectors) - start >= self.shard_size or (
+            final and start < len(vectors)
+        ):
+            end = min(start + self.shard_size, len(vectors))
+            self._write_shard(
+                split, vectors[start:end], labels[start:end], ids[start:end]
+            )
+            start = end
+        if start < len(vectors):
+            self._buffers[split] = [(vectors[start:], labels[start:], ids[start:])]
+
+    def _write_shard(
+        self, split: str, vectors: np.ndarray, labels: np.ndarray, ids: np.ndarray
+    ) -> None:
+        """Write one shard of a split and record it in the manifest."""
+        shards = self.manifest["splits"].setdefault(split, {"rows": 0, "shards": []})
+        name = f"{split}-{len(shards['shards']):05d}"
+        shard = {
+            "rows": len(vectors),
+            "vectors": f"{name}.npy",
+            "labels": f"{name}.labels.npy",
+            "ids": f"{name}.ids.npy",
+        }
+        for key, array in zip(("vectors", "labels", "ids"), (vectors, labels, ids)):
+            np.save(self.directory / shard[key], array)
+            self._upload(shard[key])
+        shards["shards"].append(shard)
+        shards["rows"] += len(vectors)
+
+    def _upload(self, name: str) -> None:
+        """Stream a file to S3 with multipart uploads, if the feature set is on S3."""
+        if not self.s3_bucket:
+            return
+        boto3.client("s3").upload_file(
+            str(self.directory / name),
+            self.s3_bucket,
+            f"{self.s3_prefix}/{name}",
+            Config=_TRANSFER_CONFIG,
+        )
+
+    def close(self) -> dict:
+        """Write the remaining buffered rows and the manifest.
+
+        Returns:
+            dict: The manifest.
+        """
+        for split in list(self._buffers):
+            self._flush(split, final=True)
+        (self.directory / MANIFEST).write_text(json.dumps(self.manifest, indent=2))
+        self._upload(MANIFEST)
+        return self.manifest
+
+
+class ShardedFeatureDataset(Dataset):
+    """Map-style dataset over the memory-mapped shards of one split.
+
+    Rows are read from the shards on demand and converted to float32, so memory use does not grow with the size of the split.
+
+    Args:
+        vectors (list[np.ndarray]): Memory-mapped vector shards.
+        labels (list[np.ndarray]): Label shards.
+    """
+
+    def __init__(self, vectors: list[np.ndarray], labels: list[np.ndarray]):
+        """Initialize the ShardedFeatureDataset.
+
+        Args:
+            vectors (list[np.ndarray]): Memory-mapped vector shards.
+            labels (list[np.ndarray]): Label shards.
+        """
+        self.vectors = vectors
+        self.labels = labels
+        self.offsets = np.cumsum([0] + [len(shard) for shard in vectors]).tolist()
+
+    def __len__(self) -> int:
+        return self.offsets[-1]
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        shard = bisect.bisect_right(self.offsets, index) - 1
+        return shard, index - self.offsets[shard]
+
+    def __getitem__(self, index: int) -> tuple[torch.Tensor, torch.Tensor]:
+        shard, row = self._locate(index)
+        X = torch.from_numpy(self.vectors[shard][row].astype(np.float32))
+        y = torch.tensor([self.labels[shard][row]])
+        return X, y
+
+    def __getitems__(self, indices: list[int]) -> list[tuple]:
+        """Fetch a batch of rows, as DataLoader does with automatic batching."""
+        return [self[index] for index in indices]
+
+
+class FeatureSet:
+    """Read a feature set written by FeatureSetWriter, memory-mapping its shards.
+
+    Args:
+        location (str): Local directory or s3://bucket/prefix URI of the feature set.
+        local_dir (PathLike, optional): Local directory that S3 feature sets are downloaded to. Defaults to "/tmp/rumour_milled/features".
+    """
+
+    def __init__(
+        self, location: str, local_dir: PathLike = "/tmp/rumour_milled/features"
+    ):
+        """Initialize the FeatureSet and read its manifest.
+
+        Args:
+            location (str): Local directory or s3://bucket/prefix URI of the feature set.
+            local_dir (PathLike, optional): Local directory that S3 feature sets are downloaded to. Defaults to "/tmp/rumour_milled/features".
+        """
+        self.location = location
+        self.directory, self.s3_bucket, self.s3_prefix = _local_directory(
+            location, local_dir
+        )
+        self.manifest = self._read_manifest()
+
+    @property
+    def exists(self) -> bool:
+        """Whether a complete feature set has been written at the location."""
+        return self.manifest is not None
+
+    @property
+    def model(self) -> Optional[str]:
+        return self.manifest["model"] if self.exists else None
+
+    def _download(self, name: str) -> bool:
+        """Download a file from S3 unless it is already local."""
+        path = self.directory / name
+        if path.exists() or not self.s3_bucket:
+            return path.exists()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            boto3.client("s3").download_file(
+                self.s3_bucket,
+                f"{self.s3_prefix}/{name}",
+                str(path),
+                Config=_TRANSFER_CONFIG,
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                raise
+            return False
+        return True
+
+    def _read_manifest(self) -> Optional[dict]:
+        if not self.s3_bucket:
+            path = self.directory / MANIFEST
+            return json.loads(path.read_text()) if path.exists() else None
+        # Always read the latest manifest straight into memory, the shards it lists
+        # never change. Processes sharing the local directory, e.g. torchrun ranks,
+        # would otherwise race to replace the same local copy.
+        try:
+            response = boto3.client("s3").get_object(
+                Bucket=self.s3_bucket, Key=f"{self.s3_prefix}/{MANIFEST}"
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey"):
+                raise
+            return None
+        return json.loads(response["Body"].read())
+
+    def _shards(self, split: str, key: str, mmap: bool) -> list[np.ndarray]:
+        if not self.exists or split not in self.manifest["splits"]:
+            raise KeyError(f"No {split} split in feature set {self.location}")
+        arrays = []
+        for shard in self.manifest["splits"][split]["shards"]:
+            self._download(shard[key])
+            path = self.directory / shard[key]
+            arrays.append(np.load(path, mmap_mode="r" if mmap else None))
+        return arrays
+
+    def dataset(self, split: str) -> ShardedFeatureDataset:
+        """Memory-mapped dataset of (float32 vector, label) rows for a split.
+
+        Args:
+            split (str): Split name.
+
+        Returns:
+            ShardedFeatureDataset: The dataset.
+        """
+        return ShardedFeatureDataset(
+            self._shards(split, "vectors", mmap=True),
+            self._shards(split, "labels", mmap=False),
+        )
+
+    def ids(self, split: str) -> np.ndarray:
+        """Headline ids of a split, in row order.
+
+        Args:
+            split (str): Split name.
+
+        Returns:
+            np.ndarray: uint64 headline ids.
+        """
+        return np.concatenate(self._shards(split, "ids", mmap=False))
+
+    def tensors(self, split: str) -> tuple[torch.Tensor, torch.Tensor]:
+        """Load a whole split into memory as float32 tensors.
+
+        Args:
+            split (str): Split name.
+
+        Returns:
+            tuple[torch.Tensor, torch.Tensor]: rows x dim vectors and rows x 1 labels.
+        """
+        X = np.concatenate(self._shards(split, "vectors", mmap=True))
+        y = np.concatenate(self._shards(split, "labels", mmap=False))
+        return torch.from_numpy(X.astype(np.float32)), torch.from_numpy(y)[:, None]
@@ -2,7 +2,7 @@ import joblib
 import pandas as pd
 import boto3
 from typing import Literal, Optional
-from rumour_milled.storage.dynamodb import HeadlineStorage
+from rumour_milled.storage.base import get_headline_storage
 
 
 def load_external_data(
@@ -24,8 +24,10 @@ def load_headlines(
     filter_expression=None,
     max_items: Optional[int] = None,
     page_limit: Optional[int] = 512,
+    storage_backend: Optional[str] = None,
+    storage_tag: str = "load_headlines",
 ) -> tuple[list[str], list[int]]:
-    hs = HeadlineStorage()
+    hs = get_headline_storage(storage_backend, tag=storage_tag)
 
     if filter_expression is None or max_items is None:
         items = hs.get_all_items()
@@ -1,81 +1,283 @@
 import nltk
+import queue
+import threading
+import numpy as np
 import torch
-from transformers import AutoTokenizer, AutoModel
 import pandas as pd
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache, lru_cache
+from os import PathLike
+from sklearn.base import BaseEstimator, TransformerMixin
+from typing import Iterable, Optional, Sequence, Union
+from rumour_milled.ml.cache import EmbeddingCache
+from rumour_milled.ml.registry import registry
+from rumour_milled.ml.backends import Backend, get_embedder
+from rumour_milled.ml.profiling import Profiler, maybe_profile
 
 
-def tokenise_headlines(headlines: list[str], model: str = "bert-base-uncased") -> dict:
+LEMMA_CACHE_SIZE = 1 << 16
+
+
+def tokenise_headlines(
+    headlines: list[str], model: str = "bert-base-uncased", padding: bool = True
+) -> dict:
     """Tokenise raw text headlines.
 
     Args:
         headlines (list[str]): Raw headlines to be tokenised
         model (str, optional): Model to use for tokenisation. Defaults to "bert-base-uncased".
+        padding (bool, optional): Pad every headline to the longest one and return tensors. If False, returns unpadded lists of token ids so that vectorise_tokens can pad per length-sorted batch. Defaults to True.
 
     Returns:
-        dict: _description_
+        dict: Tokens with "input_ids", "attention_mask" and, for BERT, "token_type_ids".
     """
-    tokeniser = AutoTokenizer.from_pretrained(model)
-    tokens = tokeniser(headlines, padding=True, truncation=True, return_tensors="pt")
+    if not padding:
+        return registry.tokenise(model, headlines, padding=False, truncation=True)
+    tokens = registry.tokenise(
+        model, headlines, padding=True, truncation=True, return_tensors="pt"
+    )
     return tokens
 
 
+def _token_batches(tokens: dict, batch_size: int):
+    """Yield (rows, batch) pairs of output row indices and tensors to vectorise.
+
+    Padded tensors are sliced in order. Unpadded token lists are sorted by length and each batch is only padded to its own longest headline, so short headlines do not pay attention cost for the longest one in the corpus.
+    """
+    inputs_len = len(tokens["input_ids"])
+    if torch.is_tensor(tokens["input_ids"]):
+        for i in range(0, inputs_len, batch_size):
+            rows = slice(i, min(i + batch_size, inputs_len))
+            yield rows, {k: v[rows] for k, v in tokens.items()}
+        return
+
+    lengths = [len(ids) for ids in tokens["input_ids"]]
+    order = sorted(range(inputs_len), key=lengths.__getitem__)
+    for i in range(0, inputs_len, batch_size):
+        rows = order[i : i + batch_size]
+        max_len = lengths[rows[-1]]
+        # Padding positions are masked out, so the pad id does not affect outputs
+        yield torch.tensor(rows), {
+            k: torch.tensor([v[j] + [0] * (max_len - len(v[j])) for j in rows])
+            for k, v in tokens.items()
+        }
+
+
 def vectorise_tokens(
     tokens: dict,
     model: str = "bert-base-uncased",
     batch_size: Optional[int] = 16,
+    backend: Backend = "eager",
+    threads: Optional[int] = None,
+    profiler: Optional[Profiler] = None,
+    verbose: bool = True,
 ) -> torch.Tensor:
     """Vectorise tokenised headlines.
 
     Args:
-        tokens (dict): Tokenised headlines to be vectorised.
+        tokens (dict): Tokenised headlines to be vectorised, either padded tensors or unpadded lists from tokenise_headlines(padding=False).
         model (str, optional): Model to use for vectorisation. Defaults to "bert-base-uncased".
         batch_size (Optional[int], optional): Batch size for vectorisation to avoid GPU memory issues. Defaults to None.
+        backend (Backend, optional): Inference backend, one of "eager", "int8" or "onnx". Defaults to "eager".
+        threads (Optional[int], optional): Number of intra-op threads for inference. Defaults to None.
+        profiler (Optional[Profiler], optional): Profile the inference batches. Defaults to None.
+        verbose (bool, optional): Print progress after every batch. Defaults to True.
 
     Returns:
-        torch.Tensor: Processed headlines as a len(headlines) x 768 tensor.
+        torch.Tensor: Processed headlines as a len(headlines) x 768 tensor, in input order.
     """
     inputs_len = len(tokens["input_ids"])
     if batch_size is None:
-        batch_size = inputs_len
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    vectoriser = AutoModel.from_pretrained(model).to(device)
-    vectors = []
+        batch_size = max(inputs_len, 1)
+    embedder = get_embedder(model, backend, threads=threads)
+    vectors = torch.empty((inputs_len, embedder.hidden_size))
 
-    with torch.no_grad():
-        for i in range(0, inputs_len, batch_size):
-            if i + batch_size > inputs_len:
-                batch_size = inputs_len - i
-            print(f"Vectorising {i+batch_size}/{inputs_len}")
-            batch_tokens = {
-                k: v[i : i + batch_size].to(device) for k, v in tokens.items()
-            }
-            vector = vectoriser(**batch_tokens)
-            cls_vector = vector.last_hidden_state[:, 0, :].cpu()
-            vectors.append(cls_vector)
-    return torch.cat(vectors, dim=0)
+    done = 0
+    with maybe_profile(profiler, "vectorise_tokens") as profile:
+        for rows, batch_tokens in _token_batches(tokens, batch_size):
+            done += len(batch_tokens["input_ids"])
+            if verbose:
+                print(f"Vectorising {done}/{inputs_len}")
+            vectors[rows] = embedder(batch_tokens)
+            profile.step()
+    return vectors
+
+
+def _tokenise_worker(
+    headlines: Sequence[str],
+    model: str,
+    batch_size: int,
+    chunk_size: int,
+    batches: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    """Tokenise headlines chunk by chunk and put (rows, tokens) batches on a queue.
+
+    Each chunk is tokenised once without padding and its batches are built by _token_batches, sorted by token count so that batches are padded only to their own longest headline. A None sentinel marks the end of the stream and an exception is put on the queue if tokenisation fails.
+    """
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for start in range(0, len(headlines), chunk_size):
+            chunk = list(headlines[start : start + chunk_size])
+            tokens = registry.tokenise(model, chunk, padding=False, truncation=True)
+            for rows, batch_tokens in _token_batches(tokens, batch_size):
+                if not put((rows + start, batch_tokens)):
+                    return
+        put(None)
+    except Exception as e:
+        put(e)
+
+
+def _output_vectors(
+    out: Optional[Union[np.ndarray, PathLike]], shape: tuple[int, int]
+) -> tuple[Optional[np.ndarray], torch.Tensor]:
+    """Open the output of a vectorisation and a tensor sharing its memory.
+
+    out may be None, allocating a tensor in memory, a float32 array of the right shape, or the path of a .npy file to create as a memmap.
+    """
+    if out is None:
+        return None, torch.empty(shape)
+    if not isinstance(out, np.ndarray):
+        out = np.lib.format.open_memmap(out, mode="w+", dtype=np.float32, shape=shape)
+    if out.shape != shape or out.dtype != np.float32:
+        raise ValueError(f"Output must be a float32 array of shape {shape}")
+    return out, torch.from_numpy(out)
+
+
+def stream_vectorise(
+    headlines: Sequence[str],
+    model: str = "bert-base-uncased",
+    batch_size: int = 64,
+    out: Optional[Union[np.ndarray, PathLike]] = None,
+    prefetch: int = 4,
+    chunk_size: int = 4096,
+    backend: Backend = "eager",
+    threads: Optional[int] = None,
+    profiler: Optional[Profiler] = None,
+) -> torch.Tensor:
+    """Tokenise and vectorise headlines as a pipeline with bounded memory.
+
+    A background thread tokenises length-sorted batches and feeds them to the model through a bounded queue, so tokenisation overlaps with inference and only a few batches of tokens are held at once. Embeddings are written straight into a preallocated output, which can be a memory-mapped .npy file for corpora that do not fit in memory.
+
+    Args:
+        headlines (Sequence[str]): Raw headlines to be processed.
+        model (str, optional): Model to use for tokenisation and vectorisation. Defaults to "bert-base-uncased".
+        batch_size (int, optional): Number of headlines per inference batch. Defaults to 64.
+        out (Optional[Union[np.ndarray, PathLike]], optional): Preallocated len(headlines) x hidden size float32 array, or path of a .npy file to create as a memmap. Defaults to None, allocating a tensor in memory.
+        prefetch (int, optional): Maximum number of tokenised batches waiting for inference. Defaults to 4.
+        chunk_size (int, optional): Number of headlines sorted by length together. Defaults to 4096.
+        backend (Backend, optional): Inference backend, one of "eager", "int8" or "onnx". Defaults to "eager".
+        threads (Optional[int], optional): Number of intra-op threads for inference. Defaults to None.
+        profiler (Optional[Profiler], optional): Profile the inference batches, including time spent waiting for tokens. Defaults to None.
+
+    Returns:
+        torch.Tensor: Processed headlines as a len(headlines) x hidden size tensor, in input order, sharing memory with out if given.
+    """
+    inputs_len = len(headlines)
+    embedder = get_embedder(model, backend, threads=threads)
+    out, vectors = _output_vectors(out, (inputs_len, embedder.hidden_size))
+
+    batches = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    worker = threading.Thread(
+        target=_tokenise_worker,
+        args=(headlines, model, batch_size, chunk_size, batches, stop),
+        daemon=True,
+    )
+    worker.start()
+    done = 0
+    try:
+        with maybe_profile(profiler, "stream_vectorise") as profile:
+            while (item := batches.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                rows, batch_tokens = item
+                vectors[rows] = embedder(batch_tokens)
+                done += len(rows)
+                if done % chunk_size < len(rows) or done == inputs_len:
+                    print(f"Vectorising {done}/{inputs_len}")
+                profile.step()
+    finally:
+        stop.set()
+        worker.join()
+    if isinstance(out, np.memmap):
+        out.flush()
+    return vectors
 
 
 def tokenise_and_vectorise(
     headlines: list[str],
     model: str = "bert-base-uncased",
     batch_size: Optional[int] = None,
+    cache: Optional[EmbeddingCache] = None,
+    dynamic_padding: bool = True,
+    out: Optional[Union[np.ndarray, PathLike]] = None,
+    backend: Backend = "eager",
+    threads: Optional[int] = None,
+    profiler: Optional[Profiler] = None,
 ) -> torch.Tensor:
     """Tokenise and then vectorise headlines in order.
 
     Args:
         headlines (list[str]): Raw headlines to be processed.
         model (str, optional): Model to use for tokenisation and vectorisation. Defaults to "bert-base-uncased".
-        batch_size (Optional[int], optional): Batch size for vectorisation to avoid GPU memory issues. Defaults to None.
+        batch_size (Optional[int], optional): Batch size for vectorisation to avoid GPU memory issues. Defaults to None, which is 64 with dynamic padding and the whole corpus otherwise.
+        cache (Optional[EmbeddingCache], optional): Embedding cache for the model. Only headlines missing from the cache are vectorised. Defaults to None.
+        dynamic_padding (bool, optional): Stream length-sorted batches through stream_vectorise instead of padding everything to the longest headline. Defaults to True.
+        out (Optional[Union[np.ndarray, PathLike]], optional): Preallocated output array or .npy path, used when there is no cache. Without dynamic padding the embeddings are copied into it once computed. Defaults to None.
+        backend (Backend, optional): Inference backend, one of "eager", "int8" or "onnx". Defaults to "eager".
+        threads (Optional[int], optional): Number of intra-op threads for inference. Defaults to None.
+        profiler (Optional[Profiler], optional): Profile the inference batches. Defaults to None.
 
     Returns:
         torch.Tensor: Processed headlines as a len(headlines) x 768 tensor.
     """
-    tokens = tokenise_headlines(headlines, model)
-    X = vectorise_tokens(tokens, model, batch_size)
+
+    def compute(headlines: list[str], out=None) -> torch.Tensor:
+        if dynamic_padding:
+            return stream_vectorise(
+                headlines,
+                model,
+                batch_size or 64,
+                out=out,
+                backend=backend,
+                threads=threads,
+                profiler=profiler,
+            )
+        tokens = tokenise_headlines(headlines, model)
+        X = vectorise_tokens(tokens, model, batch_size, backend, threads, profiler)
+        if out is None:
+            return X
+        out, vectors = _output_vectors(out, tuple(X.shape))
+        vectors.copy_(X)
+        if isinstance(out, np.memmap):
+            out.flush()
+        return vectors
+
+    if cache is None:
+        return compute(headlines, out)
+    if cache.model != model:
+        raise ValueError(f"Embedding cache is for {cache.model}, not {model}")
+    if cache.backend != backend:
+        raise ValueError(
+            f"Embedding cache is for the {cache.backend} backend, not {backend}"
+        )
+    X = cache.get_or_compute(headlines, compute)
+    print(
+        f"Embedding cache: {cache.stats['hits']} hits, {cache.stats['misses']} misses so far"
+    )
     return X
 
 
@@ -86,6 +288,24 @@ def nltk_downloads() -> None:
     nltk.download("wordnet")
 
 
+@cache
+def _stop_words() -> frozenset[str]:
+    """Load the English stop words once per process."""
+    return frozenset(stopwords.words("english"))
+
+
+@cache
+def _lemmatizer() -> WordNetLemmatizer:
+    """Create the WordNet lemmatizer once per process."""
+    return WordNetLemmatizer()
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def _lemmatise(word: str) -> str:
+    """Lemmatise a token, memoised because headlines reuse a small vocabulary."""
+    return _lemmatizer().lemmatize(word)
+
+
 def preprocess(text: str) -> str:
     """Pre-process text for vectorisation and embedding.
 
@@ -97,15 +317,75 @@ def preprocess(text: str) -> str:
     """
     text = text.lower()
     tokens = word_tokenize(text)
-    stop_words = set(stopwords.words("english"))
-    lemmatizer = WordNetLemmatizer()
+    stop_words = _stop_words()
     cleaned = [
-        lemmatizer.lemmatize(word)
-        for word in tokens
-        if word.isalpha() and word not in stop_words
+        _lemmatise(word) for word in tokens if word.isalpha() and word not in stop_words
     ]
     return " ".join(cleaned)
 
 
-def apply_preprocess(x):
-    return x.apply(preprocess)
+def _preprocess_chunk(texts: list[str]) -> list[str]:
+    """Pre-process a chunk of texts in a worker process."""
+    return [preprocess(text) for text in texts]
+
+
+def preprocess_batch(
+    texts: Iterable[str], n_jobs: Optional[int] = 1, chunk_size: int = 2048
+) -> list[str]:
+    """Pre-process many texts, optionally in parallel across processes.
+
+    Texts are split into chunks that are pre-processed by a process pool, and results are returned in input order. Each worker loads the NLTK resources once and keeps its own lemma cache.
+
+    Args:
+        texts (Iterable[str]): Texts to be cleaned.
+        n_jobs (Optional[int], optional): Number of worker processes. 1 runs in this process and None or -1 uses every CPU. Defaults to 1.
+        chunk_size (int, optional): Number of texts sent to a worker at a time. Defaults to 2048.
+
+    Returns:
+        list[str]: Cleaned texts, in input order.
+    """
+    texts = list(texts)
+    if n_jobs == -1:
+        n_jobs = None
+    if n_jobs == 1 or len(texts) <= chunk_size:
+        return _preprocess_chunk(texts)
+    chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return [
+            text for chunk in executor.map(_preprocess_chunk, chunks) for text in chunk
+        ]
+
+
+def apply_preprocess(x, n_jobs: Optional[int] = 1):
+    """Pre-process a pandas Series or any iterable of texts.
+
+    Args:
+        x (Union[pd.Series, Iterable[str]]): Texts to be cleaned.
+        n_jobs (Optional[int], optional): Number of worker processes, see preprocess_batch. Defaults to 1.
+
+    Returns:
+        Union[pd.Series, list[str]]: Cleaned texts, as a Series with the same index and name if x is a Series.
+    """
+    cleaned = preprocess_batch(x, n_jobs=n_jobs)
+    if isinstance(x, pd.Series):
+        return pd.Series(cleaned, index=x.index, name=x.name)
+    return cleaned
+
+
+class TextPreprocessor(BaseEstimator, TransformerMixin):
+    """Scikit-learn transformer applying preprocess to every text, for use in front of TfidfVectorizer in a pipeline.
+
+    Args:
+        n_jobs (Optional[int], optional): Number of worker processes, see preprocess_batch. Defaults to 1.
+        chunk_size (int, optional): Number of texts sent to a worker at a time. Defaults to 2048.
+    """
+
+    def __init__(self, n_jobs: Optional[int] = 1, chunk_size: int = 2048):
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X) -> list[str]:
+        return preprocess_batch(X, n_jobs=self.n_jobs, chunk_size=self.chunk_size)
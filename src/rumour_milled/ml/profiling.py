@@ -0,0 +1,167 @@
+import json
+import logging
+import resource
+import torch
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from os import PathLike
+from pathlib import Path
+from typing import Iterator, Optional
+from torch.profiler import ProfilerActivity
+from rumour_milled.ml.distributed import get_rank, get_world_size
+
+
+logger = logging.getLogger(__name__)
+
+
+class _NoProfile:
+    """Stand-in for sections that are not profiled."""
+
+    def step(self) -> None:
+        pass
+
+
+class Profiler:
+    """Opt-in torch.profiler tracing of named sections such as training epochs.
+
+    Each section runs under torch.profiler with a wait/warmup/active schedule advanced by calling step() once per batch. Every completed active window is written to output_dir as a Chrome trace (open in chrome://tracing or Perfetto), a per-operator table and a JSON summary with the top operators and peak memory. Only the first sections runs of each named section are profiled, so long training runs produce a bounded number of traces.
+
+    Args:
+        output_dir (PathLike): Directory to write traces and summaries to.
+        wait (int, optional): Steps to skip at the start of each cycle. Defaults to 1.
+        warmup (int, optional): Steps traced but discarded, to skip one-off start up costs. Defaults to 1.
+        active (int, optional): Steps recorded per cycle. Defaults to 3.
+        repeat (int, optional): Cycles per section, 0 to cycle until the section ends. Defaults to 1.
+        sections (int, optional): Runs of each named section to profile. Defaults to 1.
+        record_shapes (bool, optional): Record operator input shapes. Defaults to True.
+        profile_memory (bool, optional): Record tensor allocations. Defaults to True.
+        with_stack (bool, optional): Record Python stacks, which is expensive. Defaults to False.
+        row_limit (int, optional): Operators listed in the summaries. Defaults to 30.
+    """
+
+    def __init__(
+        self,
+        output_dir: PathLike,
+        wait: int = 1,
+        warmup: int = 1,
+        active: int = 3,
+        repeat: int = 1,
+        sections: int = 1,
+        record_shapes: bool = True,
+        profile_memory: bool = True,
+        with_stack: bool = False,
+        row_limit: int = 30,
+    ):
+        """Initialize the Profiler.
+
+        Args:
+            output_dir (PathLike): Directory to write traces and summaries to.
+            wait (int, optional): Steps to skip at the start of each cycle. Defaults to 1.
+            warmup (int, optional): Steps traced but discarded, to skip one-off start up costs. Defaults to 1.
+            active (int, optional): Steps recorded per cycle. Defaults to 3.
+            repeat (int, optional): Cycles per section, 0 to cycle until the section ends. Defaults to 1.
+            sections (int, optional): Runs of each named section to profile. Defaults to 1.
+            record_shapes (bool, optional): Record operator input shapes. Defaults to True.
+            profile_memory (bool, optional): Record tensor allocations. Defaults to True.
+            with_stack (bool, optional): Record Python stacks, which is expensive. Defaults to False.
+            row_limit (int, optional): Operators listed in the summaries. Defaults to 30.
+        """
+        self.output_dir = Path(output_dir)
+        self.schedule = torch.profiler.schedule(
+            wait=wait, warmup=warmup, active=active, repeat=repeat
+        )
+        self.sections = sections
+        self.record_shapes = record_shapes
+        self.profile_memory = profile_memory
+        self.with_stack = with_stack
+        self.row_limit = row_limit
+        self._runs = {}
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator:
+        """Profile a section, yielding an object whose step() marks the end of each batch.
+
+        Args:
+            name (str): Section name, used in the output file names.
+
+        Yields:
+            torch.profiler.profile: The profiler, or a no-op stand-in once the section has been profiled enough times.
+        """
+        run = self._runs.get(name, 0)
+        self._runs[name] = run + 1
+        if run >= self.sections:
+            yield _NoProfile()
+            return
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+            torch.cuda.reset_peak_memory_stats()
+        if get_world_size() > 1:
+            name = f"{name}-rank{get_rank()}"
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with torch.profiler.profile(
+            activities=activities,
+            schedule=self.schedule,
+            on_trace_ready=partial(self._export, f"{name}-{run}"),
+            record_shapes=self.record_shapes,
+            profile_memory=self.profile_memory,
+            with_stack=self.with_stack,
+        ) as profile:
+            yield profile
+
+    def _export(self, prefix: str, profile: torch.profiler.profile) -> None:
+        """Write the trace, operator table and summary of a completed window."""
+        stem = self.output_dir / f"{prefix}-step{profile.step_num}"
+        profile.export_chrome_trace(f"{stem}.trace.json")
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        averages = profile.key_averages()
+        table = averages.table(
+            sort_by=f"self_{device}_time_total", row_limit=self.row_limit
+        )
+        # ru_maxrss is in kilobytes on Linux
+        peak_memory = {
+            "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        }
+        if torch.cuda.is_available():
+            peak_memory["cuda_max_allocated_bytes"] = torch.cuda.max_memory_allocated()
+        operators = sorted(
+            averages, key=lambda event: event.self_cpu_time_total, reverse=True
+        )[: self.row_limit]
+        summary = {
+            "peak_memory": peak_memory,
+            "operators": [
+                {
+                    "name": event.key,
+                    "calls": event.count,
+                    "self_cpu_time_us": event.self_cpu_time_total,
+                    "cpu_time_us": event.cpu_time_total,
+                    "self_cpu_memory_bytes": event.self_cpu_memory_usage,
+                }
+                for event in operators
+            ],
+        }
+        Path(f"{stem}.ops.txt").write_text(table)
+        Path(f"{stem}.summary.json").write_text(json.dumps(summary, indent=2))
+        logger.info(
+            f"Profiled {prefix} up to step {profile.step_num}, wrote {stem}.trace.json\n"
+            + table
+            + "\n"
+            + " ".join(f"{k}={v}" for k, v in peak_memory.items())
+        )
+
+
+def maybe_profile(profiler: Optional[Profiler], name: str):
+    """Profile a section with profiler, or do nothing if it is None.
+
+    Args:
+        profiler (Optional[Profiler]): Profiler, or None when profiling is off.
+        name (str): Section name.
+
+    Returns:
+        ContextManager: Context yielding an object with a step() method.
+    """
+    if profiler is None:
+        return nullcontext(_NoProfile())
+    return profiler.profile(name)
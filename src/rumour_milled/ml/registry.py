@@ -0,0 +1,181 @@
+import os
+import threading
+import torch
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from transformers import AutoTokenizer, AutoModel
+
+
+MODEL_CACHE_BYTES_ENV = "RUMOUR_MILLED_MODEL_CACHE_BYTES"
+
+
+def _size_of(obj: Any) -> int:
+    """Estimate the memory held by a loaded object from its parameters and buffers."""
+    if isinstance(obj, torch.nn.Module):
+        tensors = list(obj.parameters()) + list(obj.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    return 0
+
+
+class ModelRegistry:
+    """Process-wide, thread-safe LRU registry of loaded models and tokenisers.
+
+    Each model or tokeniser is loaded once per process and reused by later calls. When the estimated size of the loaded models exceeds max_bytes, the least recently used entries are evicted. Concurrent callers asking for the same entry wait for a single load rather than loading it twice.
+
+    Args:
+        max_bytes (Optional[int], optional): Memory bound for loaded models. If None, loads from environment variable "RUMOUR_MILLED_MODEL_CACHE_BYTES" or defaults to 4 GiB.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """Initialize an empty ModelRegistry.
+
+        Args:
+            max_bytes (Optional[int], optional): Memory bound for loaded models. If None, loads from environment variable "RUMOUR_MILLED_MODEL_CACHE_BYTES" or defaults to 4 GiB.
+        """
+        if max_bytes is None:
+            max_bytes = int(os.environ.get(MODEL_CACHE_BYTES_ENV, 4 * 1024**3))
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    @property
+    def total_bytes(self) -> int:
+        """Estimated memory held by the loaded entries."""
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        """Get the lock that serialises loading of one key."""
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Get a loaded entry, loading it with loader on first use.
+
+        Args:
+            key (Hashable): Registry key, e.g. ("model", name, device).
+            loader (Callable[[], Any]): Function that loads the entry.
+
+        Returns:
+            Any: The loaded entry.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        with self._key_lock(key):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key]
+            entry = loader()
+            size = _size_of(entry)
+            with self._lock:
+                self._entries[key] = entry
+                self._sizes[key] = size
+                self._evict(keep=key)
+            return entry
+
+    def _evict(self, keep: Hashable) -> None:
+        """Evict least recently used entries until within max_bytes. Must hold the registry lock."""
+        total = sum(self._sizes.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._sizes.pop(key)
+            del self._entries[key]
+
+    def get_tokeniser(self, name: str):
+        """Get the tokeniser for a model, loading it on first use.
+
+        Args:
+            name (str): Hugging Face model name or path.
+
+        Returns:
+            PreTrainedTokenizerBase: The tokeniser.
+        """
+        return self.get(
+            ("tokeniser", name), lambda: AutoTokenizer.from_pretrained(name)
+        )
+
+    def get_model(self, name: str, device: Optional[torch.device] = None):
+        """Get a model in eval mode on a device, loading it on first use.
+
+        Args:
+            name (str): Hugging Face model name or path.
+            device (Optional[torch.device]): Device to load the model on. Defaults to CUDA if available, otherwise CPU.
+
+        Returns:
+            PreTrainedModel: The model.
+        """
+        if device is None:
+            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        device = torch.device(device)
+        return self.get(
+            ("model", name, str(device)),
+            lambda: AutoModel.from_pretrained(name).to(device).eval(),
+        )
+
+    def get_sentence_transformer(self, name: str, device: Optional[str] = None):
+        """Get a SentenceTransformer model, loading it on first use.
+
+        Args:
+            name (str): SentenceTransformer model name or path.
+            device (Optional[str]): Device to load the model on. Defaults to None, letting SentenceTransformer choose.
+
+        Returns:
+            SentenceTransformer: The model.
+        """
+
+        def load():
+            from sentence_transformers import SentenceTransformer
+
+            return SentenceTransformer(name, device=device)
+
+        return self.get(("sentence-transformer", name, device), load)
+
+    def tokenise(self, name: str, headlines: list[str], **kwargs):
+        """Tokenise headlines, serialising concurrent calls on the same tokeniser.
+
+        Fast tokenisers are not safe to call from several threads at once, so calls are made under a per-tokeniser lock.
+
+        Args:
+            name (str): Hugging Face model name or path.
+            headlines (list[str]): Headlines to tokenise.
+            **kwargs: Keyword arguments for the tokeniser call.
+
+        Returns:
+            BatchEncoding: The tokenised headlines.
+        """
+        tokeniser = self.get_tokeniser(name)
+        with self._key_lock(("tokenise", name)):
+            return tokeniser(headlines, **kwargs)
+
+    def warm_up(self, name: str, device: Optional[torch.device] = None) -> None:
+        """Load a model and its tokeniser and run one inference so later calls only pay for inference.
+
+        Args:
+            name (str): Hugging Face model name or path.
+            device (Optional[torch.device]): Device to load the model on. Defaults to CUDA if available, otherwise CPU.
+        """
+        model = self.get_model(name, device)
+        tokens = self.tokenise(name, ["warm up"], return_tensors="pt")
+        with torch.no_grad():
+            model(**{k: v.to(model.device) for k, v in tokens.items()})
+
+    def clear(self) -> None:
+        """Unload every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+
+
+registry = ModelRegistry()
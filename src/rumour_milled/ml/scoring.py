@@ -0,0 +1,129 @@
+import joblib
+import numpy as np
+import torch
+from os import PathLike
+from pathlib import Path
+from typing import Optional, Union
+from rumour_milled.ml.backends import Backend
+from rumour_milled.ml.models.simple import SimpleHeadlineClassifier
+from rumour_milled.ml.preprocess import tokenise_headlines, vectorise_tokens
+
+
+class ClassifierScorer:
+    """Score headlines with a trained SimpleHeadlineClassifier over transformer embeddings.
+
+    The classifier weights are read from a state dict as saved by the trainer job, with its dimensions taken from the weights. The embedding model is loaded once through the model registry, and each call tokenises without padding so that every batch is only padded to its own longest headline.
+
+    Args:
+        path (PathLike): State dict of the classifier, e.g. model.pt from the trainer job.
+        model (str, optional): Embedding model the classifier was trained on. Defaults to "bert-base-uncased".
+        batch_size (int, optional): Headlines per embedding batch. Defaults to 64.
+        backend (Backend, optional): Inference backend, one of "eager", "int8" or "onnx". Defaults to "eager".
+        threads (Optional[int], optional): Number of intra-op threads for inference. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        path: PathLike,
+        model: str = "bert-base-uncased",
+        batch_size: int = 64,
+        backend: Backend = "eager",
+        threads: Optional[int] = None,
+    ):
+        """Initialize the ClassifierScorer.
+
+        Args:
+            path (PathLike): State dict of the classifier, e.g. model.pt from the trainer job.
+            model (str, optional): Embedding model the classifier was trained on. Defaults to "bert-base-uncased".
+            batch_size (int, optional): Headlines per embedding batch. Defaults to 64.
+            backend (Backend, optional): Inference backend, one of "eager", "int8" or "onnx". Defaults to "eager".
+            threads (Optional[int], optional): Number of intra-op threads for inference. Defaults to None.
+        """
+        state = torch.load(path, map_location="cpu", weights_only=True)
+        hidden_dim, input_dim = state["fc1.weight"].shape
+        self.classifier = SimpleHeadlineClassifier(
+            input_dim, hidden_dim, state["fc3.weight"].shape[0]
+        )
+        self.classifier.load_state_dict(state)
+        self.classifier.eval()
+        self.model = model
+        self.batch_size = batch_size
+        self.backend = backend
+        self.threads = threads
+
+    def __call__(self, headlines: list[str]) -> np.ndarray:
+        """Probability that each headline is fake.
+
+        Args:
+            headlines (list[str]): Raw headlines.
+
+        Returns:
+            np.ndarray: Fake probabilities, in input order.
+        """
+        if not headlines:
+            return np.empty(0, dtype=np.float32)
+        tokens = tokenise_headlines(headlines, self.model, padding=False)
+        X = vectorise_tokens(
+            tokens,
+            self.model,
+            self.batch_size,
+            self.backend,
+            self.threads,
+            verbose=False,
+        )
+        with torch.inference_mode():
+            # SimpleHeadlineClassifier ends in a sigmoid
+            return self.classifier(X)[:, 0].numpy()
+
+
+class PipelineScorer:
+    """Score headlines with a fitted scikit-learn pipeline saved with save_model, e.g. TF-IDF and logistic regression.
+
+    Args:
+        path (PathLike): Pickled pipeline taking raw headlines.
+    """
+
+    def __init__(self, path: PathLike):
+        """Initialize the PipelineScorer.
+
+        Args:
+            path (PathLike): Pickled pipeline taking raw headlines.
+        """
+        self.pipeline = joblib.load(path)
+
+    def __call__(self, headlines: list[str]) -> np.ndarray:
+        """Probability that each headline is fake.
+
+        Args:
+            headlines (list[str]): Raw headlines.
+
+        Returns:
+            np.ndarray: Fake probabilities, in input order.
+        """
+        if not headlines:
+            return np.empty(0, dtype=np.float32)
+        return self.pipeline.predict_proba(headlines)[:, 1].astype(np.float32)
+
+
+def load_scorer(
+    path: PathLike,
+    model: str = "bert-base-uncased",
+    batch_size: int = 64,
+    backend: Backend = "eager",
+    threads: Optional[int] = None,
+) -> Union[ClassifierScorer, PipelineScorer]:
+    """Load a scorer, a pipeline for .pkl and .joblib files and a classifier state dict otherwise.
+
+    Args:
+        path (PathLike): Saved pipeline or classifier state dict.
+        model (str, optional): Embedding model of a classifier. Defaults to "bert-base-uncased".
+        batch_size (int, optional): Headlines per embedding batch of a classifier. Defaults to 64.
+        backend (Backend, optional): Inference backend of a classifier. Defaults to "eager".
+        threads (Optional[int], optional): Number of intra-op threads for inference. Defaults to None.
+
+    Returns:
+        Union[ClassifierScorer, PipelineScorer]: Callable from a list of headlines to fake probabilities.
+    """
+    if Path(path).suffix in (".pkl", ".joblib"):
+        return PipelineScorer(path)
+    return ClassifierScorer(path, model, batch_size, backend, threads)
@@ -0,0 +1,373 @@
+import time
+import asyncio
+import logging
+import numpy as np
+from aiohttp import web
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Sequence
+
+
+logger = logging.getLogger(__name__)
+
+Scorer = Callable[[list[str]], Sequence[float]]
+
+
+class LRUCache:
+    """Least recently used mapping of headlines to fake probabilities.
+
+    Args:
+        maxsize (int): Maximum number of entries, 0 to disable caching.
+    """
+
+    def __init__(self, maxsize: int):
+        """Initialize the LRUCache.
+
+        Args:
+            maxsize (int): Maximum number of entries, 0 to disable caching.
+        """
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[float]:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: float) -> None:
+        if not self.maxsize:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+
+class ServingMetrics:
+    """Request latency, batch and throughput statistics over a rolling window.
+
+    Args:
+        window (int, optional): Number of recent requests and batches kept for percentiles. Defaults to 10000.
+    """
+
+    def __init__(self, window: int = 10000):
+        """Initialize the ServingMetrics.
+
+        Args:
+            window (int, optional): Number of recent requests and batches kept for percentiles. Defaults to 10000.
+        """
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.headlines = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.scored = 0
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.batch_seconds = deque(maxlen=window)
+        self._recent = deque()
+
+    def record_request(self, headlines: int, cache_hits: int, seconds: float) -> None:
+        now = time.monotonic()
+        self.requests += 1
+        self.headlines += headlines
+        self.cache_hits += cache_hits
+        self.latencies.append(seconds)
+        self._recent.append((now, headlines))
+        while self._recent and self._recent[0][0] < now - 60:
+            self._recent.popleft()
+
+    def record_batch(self, size: int, seconds: float) -> None:
+        self.batches += 1
+        self.scored += size
+        self.batch_sizes.append(size)
+        self.batch_seconds.append(seconds)
+
+    def snapshot(self) -> dict:
+        """All metrics as a JSON-serialisable dict."""
+        uptime = time.monotonic() - self.started
+        latency = (
+            np.percentile(self.latencies, [50, 90, 99]) * 1000
+            if self.latencies
+            else (0.0, 0.0, 0.0)
+        )
+        recent_window = min(uptime, 60) or 1
+        return {
+            "uptime_seconds": uptime,
+            "requests": self.requests,
+            "errors": self.errors,
+            "headlines": self.headlines,
+            "cache_hits": self.cache_hits,
+            "cache_hit_rate": (
+                self.cache_hits / self.headlines if self.headlines else 0.0
+            ),
+            "batches": self.batches,
+            "scored_headlines": self.scored,
+            "mean_batch_size": (
+                float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0
+            ),
+            "mean_batch_ms": (
+                float(np.mean(self.batch_seconds)) * 1000 if self.batch_seconds else 0.0
+            ),
+            "latency_p50_ms": float(latency[0]),
+            "latency_p90_ms": float(latency[1]),
+            "latency_p99_ms": float(latency[2]),
+            "headlines_per_second": self.headlines / uptime if uptime else 0.0,
+            "headlines_per_second_1m": sum(n for _, n in self._recent) / recent_window,
+        }
+
+
+class MicroBatcher:
+    """Group concurrent classification requests into batches for the scorer.
+
+    Headlines missing from the LRU cache are queued. A background task takes the first queued headline, then keeps collecting until max_batch_size headlines are waiting or max_wait_ms has passed, and scores the batch on a dedicated thread so the event loop keeps accepting requests. While a batch is being scored new requests queue up, so under load batches fill without waiting. Identical headlines that are already queued or being scored share one result.
+
+    Args:
+        scorer (Scorer): Callable from a list of headlines to fake probabilities, e.g. from load_scorer.
+        max_batch_size (int, optional): Maximum headlines per batch. Defaults to 64.
+        max_wait_ms (float, optional): Longest time the first headline of a batch waits for others. Defaults to 5.0.
+        cache_size (int, optional): Entries in the LRU cache of results, 0 to disable it. Defaults to 100000.
+        metrics (Optional[ServingMetrics], optional): Metrics to record into. Defaults to None, creating new metrics.
+    """
+
+    def __init__(
+        self,
+        scorer: Scorer,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        cache_size: int = 100_000,
+        metrics: Optional[ServingMetrics] = None,
+    ):
+        """Initialize the MicroBatcher.
+
+        Args:
+            scorer (Scorer): Callable from a list of headlines to fake probabilities, e.g. from load_scorer.
+            max_batch_size (int, optional): Maximum headlines per batch. Defaults to 64.
+            max_wait_ms (float, optional): Longest time the first headline of a batch waits for others. Defaults to 5.0.
+            cache_size (int, optional): Entries in the LRU cache of results, 0 to disable it. Defaults to 100000.
+            metrics (Optional[ServingMetrics], optional): Metrics to record into. Defaults to None, creating new metrics.
+        """
+        self.scorer = scorer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache = LRUCache(cache_size)
+        self.metrics = metrics or ServingMetrics()
+        self._queue = None
+        self._inflight = {}
+        self._task = None
+        # One thread, the scorer itself uses intra-op threads
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    def _submit(self, headline: str) -> asyncio.Future:
+        future = self._inflight.get(headline)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[headline] = future
+            self._queue.put_nowait((headline, future))
+        return future
+
+    async def classify(self, headlines: list[str]) -> list[float]:
+        """Fake probabilities of headlines, from the cache or the next batches.
+
+        Args:
+            headlines (list[str]): Raw headlines.
+
+        Returns:
+            list[float]: Fake probabilities, in input order.
+        """
+        start_time = time.perf_counter()
+        results = [None] * len(headlines)
+        missing = {}
+        for i, headline in enumerate(headlines):
+            probability = self.cache.get(headline)
+            if probability is None:
+                missing.setdefault(headline, []).append(i)
+            else:
+                results[i] = probability
+        cache_hits = len(headlines) - sum(len(rows) for rows in missing.values())
+        futures = {headline: self._submit(headline) for headline in missing}
+        try:
+            for headline, future in futures.items():
+                # Shielded, futures are shared with other requests
+                probability = await asyncio.shield(future)
+                for i in missing[headline]:
+                    results[i] = probability
+        except Exception:
+            self.metrics.errors += 1
+            raise
+        self.metrics.record_request(
+            len(headlines), cache_hits, time.perf_counter() - start_time
+        )
+        return results
+
+    async def _next_batch(self) -> list[tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _score(self, headlines: list[str]) -> Sequence[float]:
+        """Score headlines on the scorer thread, checking one probability comes back per headline."""
+        loop = asyncio.get_running_loop()
+        probabilities = await loop.run_in_executor(
+            self._executor, self.scorer, headlines
+        )
+        if len(probabilities) != len(headlines):
+            raise ValueError(
+                f"Scorer returned {len(probabilities)} probabilities for {len(headlines)} headlines"
+            )
+        return probabilities
+
+    def _resolve(self, headline: str, future: asyncio.Future, probability) -> None:
+        probability = float(probability)
+        self.cache.put(headline, probability)
+        self._inflight.pop(headline, None)
+        if not future.done():
+            future.set_result(probability)
+
+    def _fail(self, headline: str, future: asyncio.Future, error: Exception) -> None:
+        self._inflight.pop(headline, None)
+        if not future.done():
+            future.set_exception(error)
+            # Mark it retrieved, a request that already failed on another headline never awaits it
+            future.exception()
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            start_time = time.perf_counter()
+            try:
+                probabilities = await self._score([headline for headline, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    logger.exception("Scoring a headline failed")
+                    self._fail(*batch[0], e)
+                    continue
+                # Score one at a time, so one bad headline does not fail every request in the batch
+                logger.warning(
+                    f"Scoring a batch of {len(batch)} failed, retrying its headlines one at a time",
+                    exc_info=True,
+                )
+                for headline, future in batch:
+                    start_time = time.perf_counter()
+                    try:
+                        (probability,) = await self._score([headline])
+                    except Exception as e:
+                        logger.exception("Scoring a headline failed")
+                        self._fail(headline, future, e)
+                        continue
+                    self.metrics.record_batch(1, time.perf_counter() - start_time)
+                    self._resolve(headline, future, probability)
+                continue
+            self.metrics.record_batch(len(batch), time.perf_counter() - start_time)
+            for (headline, future), probability in zip(batch, probabilities):
+                self._resolve(headline, future, probability)
+
+
+def create_app(
+    batcher: MicroBatcher, threshold: float = 0.5, max_request_headlines: int = 1024
+) -> web.Application:
+    """HTTP application serving a MicroBatcher.
+
+    Routes:
+        POST /classify: {"headline": str} or {"headlines": [str, ...]}, answered with {"predictions": [{"headline", "fake_probability", "label"}, ...]} where label 1 is fake.
+        GET /metrics: Latency, batching, cache and throughput metrics.
+        GET /health: Liveness check.
+
+    Args:
+        batcher (MicroBatcher): Batcher to classify with, started and stopped with the app.
+        threshold (float, optional): Fake probability from which a headline is labelled fake. Defaults to 0.5.
+        max_request_headlines (int, optional): Maximum headlines in one request. Defaults to 1024.
+
+    Returns:
+        web.Application: The application.
+    """
+
+    async def classify(request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Body must be JSON")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="Body must be a JSON object")
+        headlines = body.get(
+            "headlines", [body["headline"]] if "headline" in body else None
+        )
+        if not isinstance(headlines, list) or not all(
+            isinstance(headline, str) for headline in headlines
+        ):
+            raise web.HTTPBadRequest(
+                text='Expected {"headline": str} or {"headlines": [str, ...]}'
+            )
+        if len(headlines) > max_request_headlines:
+            raise web.HTTPRequestEntityTooLarge(
+                max_size=max_request_headlines, actual_size=len(headlines)
+            )
+        probabilities = await batcher.classify(headlines)
+        return web.json_response(
+            {
+                "predictions": [
+                    {
+                        "headline": headline,
+                        "fake_probability": probability,
+                        "label": int(probability >= threshold),
+                    }
+                    for headline, probability in zip(headlines, probabilities)
+                ]
+            }
+        )
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.json_response(
+            {**batcher.metrics.snapshot(), "cache_entries": len(batcher.cache)}
+        )
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    async def on_startup(app: web.Application) -> None:
+        await batcher.start()
+
+    async def on_cleanup(app: web.Application) -> None:
+        await batcher.stop()
+
+    app = web.Application()
+    app.add_routes(
+        [
+            web.post("/classify", classify),
+            web.get("/metrics", metrics),
+            web.get("/health", health),
+        ]
+    )
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
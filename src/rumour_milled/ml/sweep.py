@@ -0,0 +1,145 @@
+import os
+import time
+import logging
+import pandas as pd
+import torch
+import torch.nn as nn
+import torch.optim as optim
+import torch.multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+from sklearn.model_selection import ParameterGrid
+from rumour_milled.ml.models.simple import SimpleHeadlineClassifier
+from rumour_milled.ml.batching import TensorBatchLoader
+from rumour_milled.ml.train import Trainer, EarlyStopping, HistoryCallback
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRID = {
+    "lr": [1e-4, 3e-4, 1e-3, 3e-3],
+    "hidden_dim": [64, 128, 256, 512],
+    "batch_size": [32, 128],
+}
+
+# Set in each worker by _init_worker, shared with the parent rather than copied
+_data = None
+
+
+def _init_worker(X_train, y_train, X_val, y_val, threads):
+    global _data
+    _data = (X_train, y_train, X_val, y_val)
+    torch.set_num_threads(threads)
+
+
+def _train_config(
+    config: dict, epochs: int, patience: Optional[int], random_state: int
+) -> dict:
+    """Train one SimpleHeadlineClassifier configuration on the worker's data."""
+    X_train, y_train, X_val, y_val = _data
+    torch.manual_seed(random_state)
+    generator = torch.Generator().manual_seed(random_state)
+    train_loader = TensorBatchLoader(
+        X_train,
+        y_train,
+        batch_size=config["batch_size"],
+        shuffle=True,
+        generator=generator,
+    )
+    val_loader = TensorBatchLoader(X_val, y_val, batch_size=1024)
+
+    model = SimpleHeadlineClassifier(X_train.shape[1], config["hidden_dim"], 1)
+    history = HistoryCallback()
+    callbacks = [history]
+    if patience:
+        callbacks.append(EarlyStopping(monitor="val_loss", patience=patience))
+    trainer = Trainer(
+        model=model,
+        loss_fn=nn.BCEWithLogitsLoss(),
+        optimiser=optim.Adam(model.parameters(), lr=config["lr"]),
+        callbacks=callbacks,
+    )
+    start_time = time.perf_counter()
+    trainer.train(
+        train_loader=train_loader, validation_loader=val_loader, epochs=epochs
+    )
+    seconds = time.perf_counter() - start_time
+
+    trainer.model.eval()
+    with torch.no_grad():
+        predictions = trainer.model(X_val) > 0.5
+    val_losses = [metrics["val_loss"] for metrics in history.history]
+    return {
+        **config,
+        "val_loss": min(val_losses),
+        "val_accuracy": (predictions == y_val.bool()).float().mean().item(),
+        "best_epoch": val_losses.index(min(val_losses)) + 1,
+        "epochs": len(history.history),
+        "seconds": seconds,
+    }
+
+
+def run_sweep(
+    X_train: torch.Tensor,
+    y_train: torch.Tensor,
+    X_val: torch.Tensor,
+    y_val: torch.Tensor,
+    grid: Optional[dict] = None,
+    epochs: int = 100,
+    patience: Optional[int] = 10,
+    n_jobs: Optional[int] = None,
+    threads_per_job: int = 1,
+    random_state: int = 42,
+) -> pd.DataFrame:
+    """Train a grid of SimpleHeadlineClassifier configurations in parallel on one machine.
+
+    The embeddings are moved into shared memory once and every worker process trains on the same tensors, so the data is neither re-embedded nor copied per configuration. Each configuration is trained with the same seed, so results are reproducible and comparable.
+
+    Args:
+        X_train (torch.Tensor): Training embeddings.
+        y_train (torch.Tensor): Training labels, rows x 1.
+        X_val (torch.Tensor): Validation embeddings.
+        y_val (torch.Tensor): Validation labels, rows x 1.
+        grid (Optional[dict], optional): Lists of values of lr, hidden_dim and batch_size to search. Defaults to None, using DEFAULT_GRID.
+        epochs (int, optional): Maximum epochs per configuration. Defaults to 100.
+        patience (Optional[int], optional): Early stopping patience in epochs, or None to train every epoch. Defaults to 10.
+        n_jobs (Optional[int], optional): Number of worker processes. Defaults to None, using every CPU divided by threads_per_job.
+        threads_per_job (int, optional): Torch threads in each worker. Defaults to 1.
+        random_state (int, optional): Seed for initialisation and shuffling. Defaults to 42.
+
+    Returns:
+        pd.DataFrame: One row per configuration, ranked by best validation loss.
+    """
+    configs = list(ParameterGrid(grid or DEFAULT_GRID))
+    if n_jobs is None:
+        n_jobs = max(1, (os.cpu_count() or 1) // threads_per_job)
+    tensors = tuple(
+        t.detach().float().contiguous().share_memory_()
+        for t in (X_train, y_train, X_val, y_val)
+    )
+
+    results = []
+    # spawn, as forked workers would inherit the parent's torch thread pools
+    with ProcessPoolExecutor(
+        max_workers=min(n_jobs, len(configs)),
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(*tensors, threads_per_job),
+    ) as executor:
+        futures = [
+            executor.submit(_train_config, config, epochs, patience, random_state)
+            for config in configs
+        ]
+        for i, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            logger.info(
+                f"Finished {i}/{len(configs)}: "
+                + " ".join(f"{key}={value}" for key, value in result.items())
+            )
+            results.append(result)
+
+    table = pd.DataFrame(results).sort_values(
+        ["val_loss", "val_accuracy"], ascending=[True, False]
+    )
+    table.insert(0, "rank", range(1, len(table) + 1))
+    return table.reset_index(drop=True)
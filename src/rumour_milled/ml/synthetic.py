@@ -0,0 +1,402 @@
+import time
+import logging
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from os import PathLike
+from typing import Optional
+from rumour_milled.ml.models.gan import HeadlinesGenerator, HeadlinesDiscriminator
+from rumour_milled.ml.train import (
+    TrainerCallback,
+    LoggingCallback,
+    get_rng_state,
+    set_rng_state,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def _generator_config(generator: HeadlinesGenerator) -> dict:
+    first, last = generator.net[0], generator.net[2]
+    return {
+        "noise_dim": first.in_features,
+        "hidden_dim": first.out_features,
+        "sentence_dim": last.out_features,
+    }
+
+
+class EmbeddingNormaliser(nn.Module):
+    """Map embeddings into [-1, 1] per dimension, the range of the generator's Tanh output.
+
+    Args:
+        dim (int): Embedding dimension.
+    """
+
+    def __init__(self, dim: int):
+        """Initialize the EmbeddingNormaliser.
+
+        Args:
+            dim (int): Embedding dimension.
+        """
+        super(EmbeddingNormaliser, self).__init__()
+        self.register_buffer("center", torch.zeros(dim))
+        self.register_buffer("scale", torch.ones(dim))
+
+    def fit(self, X: torch.Tensor) -> "EmbeddingNormaliser":
+        """Centre on the mean and scale by the largest deviation of each dimension.
+
+        Args:
+            X (torch.Tensor): rows x dim embeddings.
+
+        Returns:
+            EmbeddingNormaliser: self.
+        """
+        X = X.float()
+        self.center.copy_(X.mean(dim=0))
+        self.scale.copy_((X - self.center).abs().amax(dim=0).clamp_min(1e-6))
+        return self
+
+    def forward(self, X: torch.Tensor) -> torch.Tensor:
+        return (X - self.center) / self.scale
+
+    def inverse(self, X: torch.Tensor, out: Optional[torch.Tensor] = None):
+        """Map normalised embeddings back, in one fused multiply-add.
+
+        Args:
+            X (torch.Tensor): Normalised embeddings.
+            out (Optional[torch.Tensor], optional): Tensor to write into. Defaults to None.
+
+        Returns:
+            torch.Tensor: Embeddings in the original space.
+        """
+        return torch.addcmul(self.center, X, self.scale, out=out)
+
+
+class GANTrainer:
+    """Train a HeadlinesGenerator against a HeadlinesDiscriminator on sentence embeddings.
+
+    Real embeddings are normalised into the generator's output range. Each step trains the discriminator d_steps times on real and generated batches, then the generator once with the non-saturating loss. Losses are accumulated on the device and reported to callbacks once per epoch as d_loss, g_loss and the mean discriminator outputs d_real and d_fake. The trainer has the same state_dict interface as Trainer, so the Checkpoint callback saves and resumes it.
+
+    Args:
+        generator (HeadlinesGenerator): Generator.
+        discriminator (HeadlinesDiscriminator): Discriminator.
+        normaliser (EmbeddingNormaliser): Normaliser fitted to the real embeddings.
+        g_optimiser (Optional[torch.optim.Optimizer], optional): Generator optimiser. Defaults to None, Adam with lr 2e-4 and betas (0.5, 0.999).
+        d_optimiser (Optional[torch.optim.Optimizer], optional): Discriminator optimiser. Defaults to None, Adam with lr 2e-4 and betas (0.5, 0.999).
+        d_steps (int, optional): Discriminator steps per generator step. Defaults to 1.
+        label_smoothing (float, optional): Amount subtracted from the real label for the discriminator. Defaults to 0.1.
+        device (Optional[torch.device], optional): Device to train on. Defaults to CUDA if available, otherwise CPU.
+        callbacks (Optional[list[TrainerCallback]], optional): Hooks receiving metrics. Defaults to None, which logs one line per epoch.
+    """
+
+    def __init__(
+        self,
+        generator: HeadlinesGenerator,
+        discriminator: HeadlinesDiscriminator,
+        normaliser: EmbeddingNormaliser,
+        g_optimiser: Optional[optim.Optimizer] = None,
+        d_optimiser: Optional[optim.Optimizer] = None,
+        d_steps: int = 1,
+        label_smoothing: float = 0.1,
+        device: Optional[torch.device] = None,
+        callbacks: Optional[list[TrainerCallback]] = None,
+    ):
+        self.device = device or torch.device(
+            "cuda" if torch.cuda.is_available() else "cpu"
+        )
+        self.generator = generator.to(self.device)
+        self.discriminator = discriminator.to(self.device)
+        self.normaliser = normaliser.to(self.device)
+        self.g_optimiser = g_optimiser or optim.Adam(
+            generator.parameters(), lr=2e-4, betas=(0.5, 0.999)
+        )
+        self.d_optimiser = d_optimiser or optim.Adam(
+            discriminator.parameters(), lr=2e-4, betas=(0.5, 0.999)
+        )
+        self.d_steps = d_steps
+        self.label_smoothing = label_smoothing
+        self.loss_fn = nn.BCELoss()
+        self.noise_dim = _generator_config(generator)["noise_dim"]
+        self.callbacks = [LoggingCallback()] if callbacks is None else callbacks
+        self.global_step = 0
+        self.epoch = 0
+        self.stop_training = False
+
+    @property
+    def model(self) -> HeadlinesGenerator:
+        return self.generator
+
+    def state_dict(self) -> dict:
+        """Both models and optimisers, the normaliser, progress and RNG state."""
+        return {
+            "config": _generator_config(self.generator),
+            "generator": self.generator.state_dict(),
+            "discriminator": self.discriminator.state_dict(),
+            "normaliser": self.normaliser.state_dict(),
+            "g_optimiser": self.g_optimiser.state_dict(),
+            "d_optimiser": self.d_optimiser.state_dict(),
+            "epoch": self.epoch,
+            "global_step": self.global_step,
+            "stop_training": self.stop_training,
+            "rng": get_rng_state(),
+        }
+
+    def load_state_dict(self, state: dict) -> None:
+        """Restore a state produced by state_dict."""
+        self.generator.load_state_dict(state["generator"])
+        self.discriminator.load_state_dict(state["discriminator"])
+        self.normaliser.load_state_dict(state["normaliser"])
+        self.g_optimiser.load_state_dict(state["g_optimiser"])
+        self.d_optimiser.load_state_dict(state["d_optimiser"])
+        self.epoch = state["epoch"]
+        self.global_step = state["global_step"]
+        self.stop_training = state["stop_training"]
+        set_rng_state(state["rng"])
+
+    def _callback(self, hook: str, *args) -> None:
+        for callback in self.callbacks:
+            getattr(callback, hook)(self, *args)
+
+    def _noise(self, n: int) -> torch.Tensor:
+        return torch.randn((n, self.noise_dim), device=self.device)
+
+    def train_batch(self, real: torch.Tensor) -> torch.Tensor:
+        """Run the discriminator steps and one generator step on a batch of real embeddings.
+
+        Args:
+            real (torch.Tensor): Real embeddings.
+
+        Returns:
+            torch.Tensor: d_loss, g_loss, d_real and d_fake, still on the device.
+        """
+        real = self.normaliser(real.to(self.device, non_blocking=True).float())
+        n = len(real)
+        real_labels = torch.full((n, 1), 1.0 - self.label_smoothing, device=self.device)
+        fake_labels = torch.zeros((n, 1), device=self.device)
+
+        for _ in range(self.d_steps):
+            with torch.no_grad():
+                fake = self.generator(self._noise(n))
+            self.d_optimiser.zero_grad()
+            d_real = self.discriminator(real)
+            d_fake = self.discriminator(fake)
+            d_loss = self.loss_fn(d_real, real_labels) + self.loss_fn(
+                d_fake, fake_labels
+            )
+            d_loss.backward()
+            self.d_optimiser.step()
+
+        self.g_optimiser.zero_grad()
+        # Non-saturating loss, the generator tries to have fakes labelled real
+        g_loss = self.loss_fn(
+            self.discriminator(self.generator(self._noise(n))),
+            torch.ones((n, 1), device=self.device),
+        )
+        g_loss.backward()
+        self.g_optimiser.step()
+        return torch.stack([d_loss, g_loss, d_real.mean(), d_fake.mean()]).detach()
+
+    def train_epoch(self, loader) -> dict:
+        """Train for one epoch.
+
+        Args:
+            loader (Iterable): Batches of real embeddings, or tuples whose first element is the embeddings.
+
+        Returns:
+            dict: Mean losses and discriminator outputs, and throughput.
+        """
+        self.generator.train()
+        self.discriminator.train()
+        totals = torch.zeros(4, device=self.device)
+        steps = 0
+        samples = 0
+        start_time = time.perf_counter()
+        for batch in loader:
+            real = batch[0] if isinstance(batch, (tuple, list)) else batch
+            totals += self.train_batch(real)
+            steps += 1
+            samples += len(real)
+            self.global_step += 1
+        seconds = time.perf_counter() - start_time
+        d_loss, g_loss, d_real, d_fake = (totals / max(steps, 1)).tolist()
+        return {
+            "d_loss": d_loss,
+            "g_loss": g_loss,
+            "d_real": d_real,
+            "d_fake": d_fake,
+            "samples": samples,
+            "seconds": seconds,
+            "samples_per_second": samples / seconds if seconds else 0.0,
+        }
+
+    def train(self, loader, epochs: int) -> list[dict]:
+        """Train for a number of epochs, counted from self.epoch when train is called, as Trainer.train.
+
+        Args:
+            loader (Iterable): Batches of real embeddings.
+            epochs (int): Number of epochs.
+
+        Returns:
+            list[dict]: Metrics of every epoch run by this call.
+        """
+        history = []
+        self.stop_training = False
+        last_epoch = self.epoch + epochs
+        self._callback("on_train_begin", epochs)
+        if self.epoch >= last_epoch:
+            logger.warning(
+                f"Already trained {self.epoch} of {last_epoch} epochs, nothing to train"
+            )
+        for epoch in range(self.epoch + 1, last_epoch + 1):
+            if self.stop_training:
+                break
+            self.epoch = epoch
+            sampler = getattr(loader, "sampler", loader)
+            if hasattr(sampler, "set_epoch"):
+                sampler.set_epoch(epoch)
+            metrics = {"epoch": epoch, **self.train_epoch(loader)}
+            history.append(metrics)
+            self._callback("on_epoch_end", epoch, metrics)
+        self._callback("on_train_end", history)
+        return history
+
+    def save_generator(self, path: PathLike, model: Optional[str] = None) -> None:
+        """Save what EmbeddingSampler needs: the generator, its config and the normaliser.
+
+        Args:
+            path (PathLike): File to write.
+            model (Optional[str], optional): Name of the embedding model of the real embeddings, checked when augmenting. Defaults to None.
+        """
+        torch.save(
+            {
+                "config": _generator_config(self.generator),
+                "generator": self.generator.state_dict(),
+                "normaliser": self.normaliser.state_dict(),
+                "model": model,
+            },
+            path,
+        )
+
+
+class EmbeddingSampler:
+    """Draw synthetic embeddings from a trained generator in large CPU batches.
+
+    Noise is drawn into a reused buffer, run through the generator under inference mode and mapped back to the embedding space with a fused multiply-add straight into the output, so the cost per sample is two small matrix multiplies.
+
+    Args:
+        generator (HeadlinesGenerator): Trained generator.
+        normaliser (EmbeddingNormaliser): Normaliser the generator was trained with.
+        model (Optional[str], optional): Name of the embedding model of the real embeddings. Defaults to None.
+        device (Optional[torch.device], optional): Device to sample on. Defaults to CPU.
+    """
+
+    def __init__(
+        self,
+        generator: HeadlinesGenerator,
+        normaliser: EmbeddingNormaliser,
+        model: Optional[str] = None,
+        device: Optional[torch.device] = None,
+    ):
+        """Initialize the EmbeddingSampler.
+
+        Args:
+            generator (HeadlinesGenerator): Trained generator.
+            normaliser (EmbeddingNormaliser): Normaliser the generator was trained with.
+            model (Optional[str], optional): Name of the embedding model of the real embeddings. Defaults to None.
+            device (Optional[torch.device], optional): Device to sample on. Defaults to CPU.
+        """
+        self.device = device or torch.device("cpu")
+        self.generator = generator.to(self.device).eval()
+        self.normaliser = normaliser.to(self.device)
+        self.model = model
+        config = _generator_config(generator)
+        self.noise_dim = config["noise_dim"]
+        self.dim = config["sentence_dim"]
+
+    @classmethod
+    def load(
+        cls, path: PathLike, device: Optional[torch.device] = None
+    ) -> "EmbeddingSampler":
+        """Load a generator saved by GANTrainer.save_generator, or a full GANTrainer checkpoint.
+
+        Args:
+            path (PathLike): Saved generator or checkpoint.
+            device (Optional[torch.device], optional): Device to sample on. Defaults to CPU.
+
+        Returns:
+            EmbeddingSampler: The sampler.
+        """
+        state = torch.load(path, map_location="cpu", weights_only=False)
+        # Checkpoints written by the Checkpoint callback nest the trainer state
+        state = state.get("trainer", state)
+        config = state["config"]
+        generator = HeadlinesGenerator(
+            config["noise_dim"], config["hidden_dim"], config["sentence_dim"]
+        )
+        generator.load_state_dict(state["generator"])
+        normaliser = EmbeddingNormaliser(config["sentence_dim"])
+        normaliser.load_state_dict(state["normaliser"])
+        return cls(generator, normaliser, state.get("model"), device)
+
+    def sample(
+        self,
+        n: int,
+        batch_size: int = 65536,
+        out: Optional[torch.Tensor] = None,
+        generator: Optional[torch.Generator] = None,
+    ) -> torch.Tensor:
+        """Draw n synthetic embeddings into one tensor.
+
+        Args:
+            n (int): Number of embeddings.
+            batch_size (int, optional): Embeddings generated at once. Defaults to 65536.
+            out (Optional[torch.Tensor], optional): Preallocated n x dim float32 tensor to fill. Defaults to None.
+            generator (Optional[torch.Generator], optional): Random generator for the noise. Defaults to None.
+
+        Returns:
+            torch.Tensor: n x dim embeddings.
+        """
+        if out is None:
+            out = torch.empty((n, self.dim), device=self.device)
+        if out.shape != (n, self.dim):
+            raise ValueError(f"Output must have shape {(n, self.dim)}")
+        noise = torch.empty((min(batch_size, n), self.noise_dim), device=self.device)
+        with torch.inference_mode():
+            for start in range(0, n, batch_size):
+                size = min(batch_size, n - start)
+                batch_noise = noise[:size].normal_(generator=generator)
+                self.normaliser.inverse(
+                    self.generator(batch_noise), out=out[start : start + size]
+                )
+        return out
+
+    def augment(
+        self,
+        X: torch.Tensor,
+        y: torch.Tensor,
+        n: int,
+        label: float = 1.0,
+        generator: Optional[torch.Generator] = None,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """Append n synthetic embeddings with a label to a training set.
+
+        The synthetic rows are written straight into the combined tensor, so augmenting needs no copy beyond the output.
+
+        Args:
+            X (torch.Tensor): rows x dim embeddings.
+            y (torch.Tensor): rows x 1 labels.
+            n (int): Number of synthetic rows.
+            label (float, optional): Label of the synthetic rows. Defaults to 1.0, the fake class.
+            generator (Optional[torch.Generator], optional): Random generator for the noise. Defaults to None.
+
+        Returns:
+            tuple[torch.Tensor, torch.Tensor]: Augmented embeddings and labels.
+        """
+        if X.shape[1] != self.dim:
+            raise ValueError(f"Embeddings have dimension {X.shape[1]}, not {self.dim}")
+        X_out = torch.empty((len(X) + n, self.dim), dtype=torch.float32)
+        X_out[: len(X)] = X
+        self.sample(n, out=X_out[len(X) :], generator=generator)
+        y_out = torch.cat([y.float(), torch.full((n, 1), label)])
+        return X_out, y_out
@@ -1,11 +1,262 @@
+import os
+import copy
+import time
+import random
+import logging
+import numpy as np
 import torch
+from pathlib import Path
+from typing import Literal, Optional
+from torch.nn.parallel import DistributedDataParallel
+from rumour_milled.ml.distributed import (
+    all_reduce_sum,
+    is_distributed,
+    is_main_process,
+)
+from rumour_milled.ml.profiling import Profiler, maybe_profile
+
+
+logger = logging.getLogger(__name__)
 
 
 # TODO:
 # - Model saving with S3
 
 
+class TrainerCallback:
+    """Base class for hooks called by Trainer. Override the methods you need."""
+
+    def on_train_begin(self, trainer: "Trainer", epochs: int) -> None:
+        pass
+
+    def on_step_end(self, trainer: "Trainer", step: int, metrics: dict) -> None:
+        """Called every sync_every steps with the mean train loss since the last call."""
+        pass
+
+    def on_epoch_end(self, trainer: "Trainer", epoch: int, metrics: dict) -> None:
+        """Called after every epoch with its losses and throughput metrics."""
+        pass
+
+    def on_train_end(self, trainer: "Trainer", history: list[dict]) -> None:
+        pass
+
+
+class PrintCallback(TrainerCallback):
+    """Print one line of losses per epoch, from rank 0 only when distributed."""
+
+    def on_train_begin(self, trainer: "Trainer", epochs: int) -> None:
+        self.epochs = epochs
+
+    def on_epoch_end(self, trainer: "Trainer", epoch: int, metrics: dict) -> None:
+        if not is_main_process():
+            return
+        output_str = (
+            f"Epoch {epoch}/{self.epochs} | train_loss: {metrics['train_loss']}"
+        )
+        if "val_loss" in metrics:
+            output_str += f" | val_loss: {metrics['val_loss']}"
+        if "lr" in metrics:
+            output_str += f" | lr: {metrics['lr']}"
+        print(output_str)
+
+
+class LoggingCallback(TrainerCallback):
+    """Log metrics as key=value pairs, e.g. for SageMaker metric definitions. Only rank 0 logs when distributed."""
+
+    def on_step_end(self, trainer: "Trainer", step: int, metrics: dict) -> None:
+        if is_main_process():
+            logger.info(" ".join(f"{k}={v:.6g}" for k, v in metrics.items()))
+
+    def on_epoch_end(self, trainer: "Trainer", epoch: int, metrics: dict) -> None:
+        if is_main_process():
+            logger.info(" ".join(f"{k}={v:.6g}" for k, v in metrics.items()))
+
+
+class HistoryCallback(TrainerCallback):
+    """Keep every epoch's metrics in history."""
+
+    def __init__(self):
+        self.history = []
+
+    def on_epoch_end(self, trainer: "Trainer", epoch: int, metrics: dict) -> None:
+        self.history.append(metrics)
+
+
+class EarlyStopping(TrainerCallback):
+    """Stop training once a monitored metric stops improving.
+
+    Args:
+        monitor (str, optional): Epoch metric to monitor. Defaults to "val_loss".
+        mode (Literal["min", "max"], optional): Whether lower or higher is better. Defaults to "min".
+        patience (int, optional): Epochs without improvement before stopping. Defaults to 10.
+        min_delta (float, optional): Smallest change counted as an improvement. Defaults to 0.0.
+        restore_best (bool, optional): Load the best weights back into the model when training ends. Defaults to True.
+    """
+
+    def __init__(
+        self,
+        monitor: str = "val_loss",
+        mode: Literal["min", "max"] = "min",
+        patience: int = 10,
+        min_delta: float = 0.0,
+        restore_best: bool = True,
+    ):
+        self.monitor = monitor
+        self.mode = mode
+        self.patience = patience
+        self.min_delta = min_delta
+        self.restore_best = restore_best
+        self.best = None
+        self.best_epoch = None
+        self.best_state = None
+        self.wait = 0
+
+    def _improved(self, value: float) -> bool:
+        if self.best is None:
+            return True
+        if self.mode == "min":
+            return value < self.best - self.min_delta
+        return value > self.best + self.min_delta
+
+    def on_epoch_end(self, trainer: "Trainer", epoch: int, metrics: dict) -> None:
+        if self.monitor not in metrics:
+            raise KeyError(
+                f"EarlyStopping monitors {self.monitor}, not in {list(metrics)}"
+            )
+        value = metrics[self.monitor]
+        if self._improved(value):
+            self.best, self.best_epoch, self.wait = value, epoch, 0
+            if self.restore_best:
+                self.best_state = copy.deepcopy(trainer.model.state_dict())
+            return
+        self.wait += 1
+        if self.wait >= self.patience:
+            logger.info(
+                f"Early stopping at epoch {epoch}, best {self.monitor}={self.best:.6g} at epoch {self.best_epoch}"
+            )
+            trainer.stop_training = True
+
+    def on_train_end(self, trainer: "Trainer", history: list[dict]) -> None:
+        if self.restore_best and self.best_state is not None:
+            trainer.model.load_state_dict(self.best_state)
+
+    def state_dict(self) -> dict:
+        return {
+            "best": self.best,
+            "best_epoch": self.best_epoch,
+            "best_state": self.best_state,
+            "wait": self.wait,
+        }
+
+    def load_state_dict(self, state: dict) -> None:
+        self.__dict__.update(state)
+
+
+class Checkpoint(TrainerCallback):
+    """Save the full training state periodically and resume from it automatically.
+
+    The checkpoint holds the model, optimiser and scheduler state, the epoch and step counters, the Python, NumPy and torch RNG states and the state of any callback with a state_dict method, e.g. EarlyStopping. It is written atomically, so an interruption mid-save leaves the previous checkpoint intact. When distributed, every rank resumes from the checkpoint but only rank 0 writes it. Place it after the other callbacks so that their state for the epoch is saved.
+
+    Args:
+        directory (Optional[str], optional): Checkpoint directory. Defaults to the SM_CHECKPOINT_DIR environment variable, or "checkpoints".
+        every (int, optional): Save every this many epochs. Defaults to 1.
+        resume (Optional[bool], optional): Resume from an existing checkpoint when training begins. Defaults to None, resuming only when directory is given or SM_CHECKPOINT_DIR is set, so that a local run never picks up what an unrelated run left in "checkpoints".
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        every: int = 1,
+        resume: Optional[bool] = None,
+    ):
+        directory = directory or os.environ.get("SM_CHECKPOINT_DIR")
+        if resume is None:
+            resume = directory is not None
+        self.path = Path(directory or "checkpoints") / "checkpoint.pt"
+        self.every = every
+        self.resume = resume
+
+    def on_train_begin(self, trainer: "Trainer", epochs: int) -> None:
+        if not self.resume or not self.path.exists():
+            return
+        # Checkpoints hold RNG states as numpy arrays and python objects
+        state = torch.load(self.path, map_location=trainer.device, weights_only=False)
+        trainer.load_state_dict(state["trainer"])
+        for callback, callback_state in zip(trainer.callbacks, state["callbacks"]):
+            if callback_state is not None:
+                callback.load_state_dict(callback_state)
+        logger.info(f"Resumed from {self.path} at epoch {trainer.epoch}")
+
+    def on_epoch_end(self, trainer: "Trainer", epoch: int, metrics: dict) -> None:
+        if epoch % self.every == 0 or trainer.stop_training:
+            self.save(trainer)
+
+    def save(self, trainer: "Trainer") -> None:
+        """Atomically write the training state to the checkpoint file."""
+        if not is_main_process():
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "trainer": trainer.state_dict(),
+            "callbacks": [
+                c.state_dict() if hasattr(c, "state_dict") else None
+                for c in trainer.callbacks
+            ],
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, self.path)
+
+
+def get_rng_state() -> dict:
+    """Python, NumPy, torch and CUDA RNG states, for checkpoints."""
+    return {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+        "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+    }
+
+
+def set_rng_state(rng: dict) -> None:
+    """Restore RNG states produced by get_rng_state."""
+    random.setstate(rng["python"])
+    np.random.set_state(rng["numpy"])
+    torch.set_rng_state(rng["torch"].cpu())
+    if rng["cuda"] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all([r.cpu() for r in rng["cuda"]])
+
+
+def _bf16_supported(device: torch.device) -> bool:
+    """Check that bfloat16 autocast works on a device."""
+    try:
+        with torch.autocast(device.type, dtype=torch.bfloat16):
+            ones = torch.ones((2, 2), device=device)
+            (ones @ ones).sum().item()
+        return True
+    except (RuntimeError, ValueError):
+        return False
+
+
 class Trainer:
+    """Train and evaluate a model, keeping losses on the device.
+
+    Losses are accumulated as device tensors and only synchronised to the host once per epoch, or every sync_every steps when step-level reporting is wanted. Per-epoch losses, samples/sec, step-time percentiles and time spent waiting for data are passed to callbacks.
+
+    Args:
+        model (nn.Module): Model to train.
+        loss_fn (nn.Module): Loss function.
+        optimiser (torch.optim.Optimizer): Optimiser.
+        scheduler (Optional[torch.optim.lr_scheduler.LRScheduler], optional): Learning rate scheduler stepped once per epoch. Defaults to None.
+        device (Optional[torch.device], optional): Device to train on. Defaults to CUDA if available, otherwise CPU.
+        callbacks (Optional[list[TrainerCallback]], optional): Hooks receiving metrics. Defaults to None, which prints one line per epoch.
+        sync_every (Optional[int], optional): Report the running train loss every this many steps. Defaults to None, syncing once per epoch.
+        compile (bool, optional): Run the model through torch.compile, falling back to eager mode if compilation fails. Defaults to False.
+        precision (Literal["fp32", "bf16"], optional): Run forward passes under bfloat16 autocast, falling back to fp32 where unsupported. Losses are always computed in fp32. Defaults to "fp32".
+        profiler (Optional[Profiler], optional): Profile the batches of train_epoch and evaluate. Defaults to None.
+        distributed (bool, optional): Train with DistributedDataParallel in the process group set up by init_distributed. Each rank should be given its own shard of the data; gradients are all-reduced every step and epoch losses and sample counts are reduced over all ranks. Defaults to False.
+    """
+
     def __init__(
         self,
         model,
@@ -13,6 +264,12 @@ class Trainer:
         optimiser,
         scheduler=None,
         device=None,
+        callbacks: Optional[list[TrainerCallback]] = None,
+        sync_every: Optional[int] = None,
+        compile: bool = False,
+        precision: Literal["fp32", "bf16"] = "fp32",
+        distributed: bool = False,
+        profiler: Optional[Profiler] = None,
     ):
         self.device = device or torch.device(
             "cuda" if torch.cuda.is_available() else "cpu"
@@ -21,49 +278,224 @@ class Trainer:
         self.loss_fn = loss_fn
         self.optimiser = optimiser
         self.scheduler = scheduler
+        self.callbacks = [PrintCallback()] if callbacks is None else callbacks
+        self.sync_every = sync_every
+        self.global_step = 0
+        self.epoch = 0
+        self.stop_training = False
+
+        self.precision = precision
+        if precision == "bf16" and not _bf16_supported(self.device):
+            logger.warning(f"bf16 autocast unsupported on {self.device}, using fp32")
+            self.precision = "fp32"
+        if distributed and not is_distributed():
+            raise RuntimeError("distributed=True needs init_distributed() first")
+        self.distributed = distributed
+        self.profiler = profiler
+        # Keep self._model unwrapped so state dicts have no DDP or compile prefixes
+        self._eager = (
+            DistributedDataParallel(self._model) if distributed else self._model
+        )
+        self._forward = torch.compile(self._eager) if compile else self._eager
 
     @property
     def model(self):
         return self._model
 
+    def state_dict(self) -> dict:
+        """Model, optimiser, scheduler, progress and RNG state for checkpointing."""
+        return {
+            "model": self._model.state_dict(),
+            "optimiser": self.optimiser.state_dict(),
+            "scheduler": self.scheduler.state_dict() if self.scheduler else None,
+            "epoch": self.epoch,
+            "global_step": self.global_step,
+            "stop_training": self.stop_training,
+            "rng": get_rng_state(),
+        }
+
+    def load_state_dict(self, state: dict) -> None:
+        """Restore a state produced by state_dict."""
+        self._model.load_state_dict(state["model"])
+        self.optimiser.load_state_dict(state["optimiser"])
+        if self.scheduler and state["scheduler"] is not None:
+            self.scheduler.load_state_dict(state["scheduler"])
+        self.epoch = state["epoch"]
+        self.global_step = state["global_step"]
+        self.stop_training = state["stop_training"]
+        set_rng_state(state["rng"])
+
+    def _callback(self, hook: str, *args) -> None:
+        for callback in self.callbacks:
+            getattr(callback, hook)(self, *args)
+
+    def _autocast(self):
+        return torch.autocast(
+            self.device.type,
+            dtype=torch.bfloat16,
+            enabled=self.precision == "bf16",
+        )
+
+    def forward(self, X):
+        """Run the model, compiled and under autocast if configured.
+
+        Args:
+            X (torch.Tensor): Batch of inputs on the device.
+
+        Returns:
+            torch.Tensor: Model outputs in fp32.
+        """
+        with self._autocast():
+            try:
+                out = self._forward(X)
+            except Exception as e:
+                if self._forward is self._eager:
+                    raise
+                # Compilation errors surface on the first call
+                logger.warning(f"torch.compile failed, using eager mode: {e}")
+                self._forward = self._eager
+                out = self._eager(X)
+        return out.float()
+
     def train_batch(self, X, y):
-        X, y = X.to(self.device), y.to(self.device)
+        X = X.to(self.device, non_blocking=True)
+        y = y.to(self.device, non_blocking=True)
         self.optimiser.zero_grad()
-        out = self._model(X)
+        out = self.forward(X)
         loss = self.loss_fn(out, y)
         loss.backward()
         self.optimiser.step()
-        return loss.item()
+        return loss.detach()
 
     def train_epoch(self, train_loader):
+        """Train for one epoch.
+
+        Args:
+            train_loader (Iterable): Batches of (X, y).
+
+        Returns:
+            dict: Mean "train_loss" and throughput metrics for the epoch.
+        """
         self._model.train()
-        epoch_loss = 0
-        for X, y in train_loader:
-            loss = self.train_batch(X, y)
-            epoch_loss += loss
-        return epoch_loss / len(train_loader)
+        epoch_loss = torch.zeros((), device=self.device)
+        window_loss = torch.zeros((), device=self.device)
+        window_steps = 0
+        samples = 0
+        step_times = []
+        data_wait = 0.0
+
+        start_time = time.perf_counter()
+        batch_end = start_time
+        with maybe_profile(self.profiler, "train_epoch") as profile:
+            for X, y in train_loader:
+                step_start = time.perf_counter()
+                data_wait += step_start - batch_end
+                loss = self.train_batch(X, y)
+                epoch_loss += loss
+                window_loss += loss
+                window_steps += 1
+                samples += len(X)
+                self.global_step += 1
+                if self.sync_every and self.global_step % self.sync_every == 0:
+                    metrics = {
+                        "step": self.global_step,
+                        "train_loss": (window_loss / window_steps).item(),
+                    }
+                    self._callback("on_step_end", self.global_step, metrics)
+                    window_loss.zero_()
+                    window_steps = 0
+                profile.step()
+                batch_end = time.perf_counter()
+                step_times.append(batch_end - step_start)
+
+        steps = len(step_times)
+        if self.distributed:
+            totals = torch.stack(
+                [
+                    epoch_loss,
+                    torch.tensor(float(steps), device=self.device),
+                    torch.tensor(float(samples), device=self.device),
+                ]
+            )
+            epoch_loss, steps, samples = all_reduce_sum(totals).tolist()
+            samples = int(samples)
+        else:
+            # The only forced sync of the epoch
+            epoch_loss = epoch_loss.item()
+        train_loss = epoch_loss / max(steps, 1)
+        seconds = time.perf_counter() - start_time
+        p50, p90, p99 = (
+            np.percentile(step_times, [50, 90, 99]) * 1000 if step_times else (0, 0, 0)
+        )
+        return {
+            "train_loss": train_loss,
+            "samples": samples,
+            "seconds": seconds,
+            "samples_per_second": samples / seconds if seconds else 0.0,
+            "step_time_p50_ms": float(p50),
+            "step_time_p90_ms": float(p90),
+            "step_time_p99_ms": float(p99),
+            "data_wait_seconds": data_wait,
+            "data_wait_fraction": data_wait / seconds if seconds else 0.0,
+        }
 
     def train(self, train_loader, validation_loader, epochs):
-        for epoch in range(1, epochs + 1):
-            train_loss = self.train_epoch(train_loader)
-            output_str = f"Epoch {epoch}/{epochs} | train_loss: {train_loss}"
+        """Train for a number of epochs, evaluating after each.
+
+        Epochs are counted from self.epoch when train is called, so calling train again on the same trainer runs that many more epochs. A Checkpoint callback restoring a run in on_train_begin moves self.epoch forward, and training then continues towards the same total as the interrupted run. Training stops early if a callback sets stop_training.
 
+        Args:
+            train_loader (Iterable): Batches of (X, y) to train on.
+            validation_loader (Optional[Iterable]): Batches of (X, y) to evaluate on, or None.
+            epochs (int): Number of epochs.
+
+        Returns:
+            list[dict]: Metrics of every epoch run by this call.
+        """
+        history = []
+        self.stop_training = False
+        last_epoch = self.epoch + epochs
+        self._callback("on_train_begin", epochs)
+        if self.epoch >= last_epoch:
+            logger.warning(
+                f"Already trained {self.epoch} of {last_epoch} epochs, nothing to train"
+            )
+        for epoch in range(self.epoch + 1, last_epoch + 1):
+            if self.stop_training:
+                break
+            self.epoch = epoch
+            for loader in (train_loader, validation_loader):
+                # DataLoaders shard with a DistributedSampler
+                sampler = getattr(loader, "sampler", loader)
+                if hasattr(sampler, "set_epoch"):
+                    sampler.set_epoch(epoch)
+            metrics = {"epoch": epoch, **self.train_epoch(train_loader)}
             if validation_loader:
-                val_loss = self.evaluate(validation_loader)
-                output_str += f" | val_loss: {val_loss}"
+                metrics["val_loss"] = self.evaluate(validation_loader)
             if self.scheduler:
                 self.scheduler.step()
-                output_str += f" | lr: {self.scheduler.get_last_lr()[0]}"
-
-            print(output_str)
+                metrics["lr"] = self.scheduler.get_last_lr()[0]
+            history.append(metrics)
+            self._callback("on_epoch_end", epoch, metrics)
+        self._callback("on_train_end", history)
+        return history
 
     def evaluate(self, validation_loader):
         self._model.eval()
-        total_loss = 0
-        with torch.no_grad():
+        total_loss = torch.zeros((), device=self.device)
+        samples = 0
+        with torch.no_grad(), maybe_profile(self.profiler, "evaluate") as profile:
             for X, y in validation_loader:
                 X, y = X.to(self.device), y.to(self.device)
-                out = self._model(X)
-                loss = self.loss_fn(out, y)
-                total_loss += loss.item()
-        return total_loss / len(validation_loader)
+                out = self.forward(X)
+                # Weighted by batch size, so the loss is the same however the rows are batched or sharded
+                total_loss += self.loss_fn(out, y) * len(y)
+                samples += len(y)
+                profile.step()
+        if self.distributed:
+            totals = torch.stack(
+                [total_loss, torch.tensor(float(samples), device=self.device)]
+            )
+            total_loss, samples = all_reduce_sum(totals).tolist()
+            return total_loss / max(samples, 1)
+        return (total_loss / max(samples, 1)).item()
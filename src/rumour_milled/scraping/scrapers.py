@@ -1,29 +1,79 @@
 from rumour_milled.scraping.base import BaseScraper
-from rumour_milled.utils.utils import clean_headlines
-from rumour_milled.storage.dynamodb import HeadlineStorage
+from rumour_milled.utils.utils import HeadlineNormaliser
+from rumour_milled.storage.base import get_headline_storage
+from rumour_milled.storage.writer import HeadlineWriter
 from playwright.sync_api import TimeoutError
+import asyncio
 import logging
+from pathlib import Path
+from typing import Optional
 
 
 class HeadlineScraper(BaseScraper):
-    def __init__(self, **kwargs) -> None:
+    def __init__(
+        self,
+        storage_backend: Optional[str] = None,
+        dedup: Optional[bool] = None,
+        near_duplicate_index_path: Optional[str] = None,
+        near_duplicate_threshold: Optional[float] = None,
+        **kwargs,
+    ) -> None:
         super().__init__(**kwargs)
         logging.getLogger("botocore").setLevel(logging.WARNING)
-        self.headline_storage = HeadlineStorage()
+        self.storage_backend = self.get_setting(
+            param=storage_backend, key="storage_backend"
+        )
+        self.dedup = self.get_setting(param=dedup, key="dedup", default=False)
+        self.headline_storage = get_headline_storage(
+            self.storage_backend, dedup=self.dedup, tag=self.__class__.__name__
+        )
+        self.headline_writer = HeadlineWriter(self.headline_storage)
+        self.normaliser = HeadlineNormaliser()
+        self.near_duplicate_index_path = self.get_setting(
+            param=near_duplicate_index_path, key="near_duplicate_index_path"
+        )
+        self.near_duplicate_threshold = self.get_setting(
+            param=near_duplicate_threshold, key="near_duplicate_threshold", default=0.8
+        )
+        self.near_duplicate_index = None
+
+    async def start(self) -> None:
+        """Run the scraper, then wait for queued headlines to reach storage.
+
+        If a near-duplicate index path is configured, the index is loaded before scraping and saved afterwards, so that headlines already seen on other sites or in earlier runs are dropped.
+        """
+        if self.near_duplicate_index_path:
+            self.near_duplicate_index = self.load_near_duplicate_index()
+        await super().start()
+        await asyncio.to_thread(self.headline_writer.flush)
+        if self.near_duplicate_index is not None:
+            self.near_duplicate_index.save(self.near_duplicate_index_path)
+
+    def load_near_duplicate_index(self):
+        """Load the near-duplicate index from near_duplicate_index_path, or create an empty one.
+
+        Returns:
+            NearDuplicateIndex: The near-duplicate index.
+        """
+        from rumour_milled.utils.minhash import NearDuplicateIndex
+
+        if Path(self.near_duplicate_index_path).exists():
+            return NearDuplicateIndex.load(self.near_duplicate_index_path)
+        return NearDuplicateIndex(threshold=self.near_duplicate_threshold)
 
     async def save(self) -> None:
-        """Saves the headline to DynamoDB storage.
-        The function is async in line with the parent version.
-        This is only to hold the write lock so that no other coroutines can write to the items list between putting and clearing.
+        """Queues the current headlines for the background headline writer.
+        The write lock is only held while taking the items, so that no other coroutines can write to the items list between taking and clearing.
+        Storage writes happen on the writer thread and do not block scraping workers.
         """
         self.logger.info("Saving current items")
         async with self.write_lock:
-            items = [
-                {"headline": headline, "label": 0}
-                for headline in clean_headlines(self.items)
-            ]
-            self.headline_storage.put_items(items)
+            headlines = list(self.normaliser(self.items))
             self.items.clear()
+        if self.near_duplicate_index is not None:
+            headlines = self.near_duplicate_index.filter(headlines)
+        items = [{"headline": headline, "label": 0} for headline in headlines]
+        await self.headline_writer.submit_async(items)
 
 
 class YahooScraper(HeadlineScraper):
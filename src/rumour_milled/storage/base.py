@@ -0,0 +1,69 @@
+import os
+from typing import Optional, Protocol, runtime_checkable
+
+
+STORAGE_BACKEND_ENV = "RUMOUR_MILLED_STORAGE"
+SQLITE_PATH_ENV = "RUMOUR_MILLED_SQLITE_PATH"
+
+
+@runtime_checkable
+class HeadlineStorageBackend(Protocol):
+    """Interface shared by all headline storage backends.
+
+    Items are dictionaries with a "headline" (str) and a "label" (int) key. The pair (headline, label) is the primary key, so putting an item that already exists overwrites it rather than creating a duplicate.
+    """
+
+    def put_item(self, item: dict) -> None:
+        """Insert a single item, overwriting any item with the same key."""
+        ...
+
+    def put_items(self, items: list[dict]) -> dict:
+        """Insert multiple items, overwriting any items with the same keys unless dedup is enabled.
+
+        Returns a dict with the number of "new" items written and "skipped" items already stored.
+        """
+        ...
+
+    def get_all_items(self) -> list[tuple[str, int]]:
+        """Retrieve all stored (headline, label) pairs."""
+        ...
+
+    def get_filtered_items(
+        self, filter_expression, max_items, page_limit=512
+    ) -> list[tuple[str, int]]:
+        """Retrieve up to max_items (headline, label) pairs matching a boto3 condition expression."""
+        ...
+
+    def sample_items(
+        self, n: int, label: Optional[int] = None
+    ) -> list[tuple[str, int]]:
+        """Retrieve up to n randomly chosen (headline, label) pairs, optionally restricted to one label."""
+        ...
+
+
+def get_headline_storage(
+    backend: Optional[str] = None, **kwargs
+) -> HeadlineStorageBackend:
+    """Create a headline storage backend by name.
+
+    The backend is chosen from the argument, then the RUMOUR_MILLED_STORAGE environment variable, then defaults to "dynamodb". Backends are imported lazily so that the SQLite backend can be used without boto3 installed.
+
+    Args:
+        backend (Optional[str]): Either "dynamodb" or "sqlite". Defaults to None.
+        **kwargs: Additional keyword arguments for the backend constructor.
+
+    Returns:
+        HeadlineStorageBackend: The configured storage backend.
+    """
+    if backend is None:
+        backend = os.environ.get(STORAGE_BACKEND_ENV, "dynamodb")
+    backend = backend.lower()
+    if backend == "dynamodb":
+        from rumour_milled.storage.dynamodb import HeadlineStorage
+
+        return HeadlineStorage(**kwargs)
+    if backend == "sqlite":
+        from rumour_milled.storage.sqlite import SQLiteHeadlineStorage
+
+        return SQLiteHeadlineStorage(**kwargs)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,135 @@
+import math
+import struct
+import hashlib
+from os import PathLike
+from pathlib import Path
+from time import time
+from typing import Iterable, Optional
+
+
+class BloomFilter:
+    """Compact probabilistic set of headline keys.
+
+    Membership checks never give false negatives, so a key that is not in the filter has definitely not been stored. A positive answer is only probable and should be confirmed against the table.
+
+    Args:
+        capacity (int): Expected number of keys. Defaults to 100_000.
+        error_rate (float): Target false positive rate at capacity. Defaults to 0.01.
+    """
+
+    _header = struct.Struct("<4sQIQQd")
+    _magic = b"RMBF"
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.01):
+        """Initialize an empty BloomFilter sized for the given capacity and error rate.
+
+        Args:
+            capacity (int): Expected number of keys. Defaults to 100_000.
+            error_rate (float): Target false positive rate at capacity. Defaults to 0.01.
+        """
+        capacity = max(capacity, 1)
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self.built_at = time()
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        """Yield the bit positions for a key using double hashing."""
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        """Add a key to the filter.
+
+        Args:
+            key (str): Key to add.
+        """
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    @property
+    def saturated(self) -> bool:
+        """Whether more keys have been added than the filter was sized for."""
+        return self.count > self.capacity
+
+    def save(self, path: PathLike) -> None:
+        """Persist the filter to disk, replacing the file atomically.
+
+        Args:
+            path (PathLike): Path to write the filter to.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(
+                self._header.pack(
+                    self._magic,
+                    self.num_bits,
+                    self.num_hashes,
+                    self.capacity,
+                    self.count,
+                    self.built_at,
+                )
+            )
+            f.write(self.bits)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: PathLike) -> Optional["BloomFilter"]:
+        """Load a filter previously written with save.
+
+        Args:
+            path (PathLike): Path to read the filter from.
+
+        Returns:
+            Optional[BloomFilter]: The loaded filter, or None if the file is missing or invalid.
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        with open(path, "rb") as f:
+            header = f.read(cls._header.size)
+            if len(header) != cls._header.size:
+                return None
+            magic, num_bits, num_hashes, capacity, count, built_at = cls._header.unpack(
+                header
+            )
+            if magic != cls._magic:
+                return None
+            bits = bytearray(f.read())
+        if len(bits) != (num_bits + 7) // 8:
+            return None
+        bloom = cls.__new__(cls)
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.capacity = capacity
+        bloom.count = count
+        bloom.built_at = built_at
+        bloom.bits = bits
+        return bloom
+
+
+def headline_key(headline: str, label) -> str:
+    """Build the dedup key for a (headline, label) pair.
+
+    Args:
+        headline (str): Headline text.
+        label: Headline label, as an int or DynamoDB Decimal.
+
+    Returns:
+        str: Key used for dedup lookups.
+    """
+    return f"{int(label)}\x1f{headline}"
@@ -1,31 +1,113 @@
 import boto3
+import random
+import threading
+from boto3.dynamodb.conditions import Attr
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from dotenv import load_dotenv
-from time import sleep
+from functools import cached_property
+from os import PathLike
+from time import perf_counter, sleep, time
 from typing import Optional
+from rumour_milled.storage.dedup import BloomFilter, headline_key
+from rumour_milled.storage.metrics import storage_metrics
+
+
+_resources = {}
+_existing_tables = set()
+_resources_lock = threading.Lock()
+
+
+def get_dynamodb_resource(
+    region_name: str = "eu-west-2", max_pool_connections: int = 32, **kwargs
+):
+    """Get the process-wide DynamoDB resource for a region, creating it on first use.
+
+    Every HeadlineStorage in the process shares one session, client and connection pool per set of arguments. Calls on the underlying client are thread-safe.
+
+    Args:
+        region_name (str): AWS region name. Defaults to "eu-west-2".
+        max_pool_connections (int): Maximum pooled HTTP connections. Defaults to 32.
+        **kwargs: Additional keyword arguments for boto3.resource.
+
+    Returns:
+        DynamoDB.ServiceResource: The shared DynamoDB resource.
+    """
+    key = (region_name, max_pool_connections, tuple(sorted(kwargs.items())))
+    with _resources_lock:
+        if key not in _resources:
+            if not _resources:
+                load_dotenv()
+            config = Config(
+                max_pool_connections=max_pool_connections,
+                retries={"max_attempts": 10, "mode": "adaptive"},
+                tcp_keepalive=True,
+            )
+            _resources[key] = boto3.session.Session().resource(
+                "dynamodb", region_name=region_name, config=config, **kwargs
+            )
+        return _resources[key]
 
 
 class HeadlineStorage:
     """HeadlineStorage provides an interface to a DynamoDB table for storing and retrieving news headlines and their labels.
 
-    This class manages the connection to DynamoDB, table creation, and basic CRUD operations for headline data.
+    This class manages the connection to DynamoDB, table creation, and basic CRUD operations for headline data. Construction is cheap: the connection is shared process-wide and only opened on first use, and the table must already exist (see create_table or scripts/setup_storage.py).
     """
 
-    def __init__(self, region_name: str = "eu-west-2", **kwargs):
+    def __init__(
+        self,
+        region_name: str = "eu-west-2",
+        dedup: bool = False,
+        dedup_path: PathLike = "data/headlines.bloom",
+        dedup_refresh_seconds: float = 24 * 60 * 60,
+        tag: str = "default",
+        max_pool_connections: int = 32,
+        **kwargs,
+    ):
         """Initialize the HeadlineStorage and connect to DynamoDB.
 
         Args:
             region_name (str): AWS region name. Defaults to "eu-west-2".
+            dedup (bool): Skip writing items that are already stored. Defaults to False.
+            dedup_path (PathLike): Path of the persisted Bloom filter of stored keys. Defaults to "data/headlines.bloom".
+            dedup_refresh_seconds (float): Rebuild the Bloom filter from a table scan once it is older than this. Defaults to one day.
+            tag (str): Caller tag that capacity and latency metrics are aggregated under, e.g. the scraper site. Defaults to "default".
+            max_pool_connections (int): Maximum pooled HTTP connections of the shared client. Defaults to 32.
             **kwargs: Additional keyword arguments for boto3.resource.
         """
-        load_dotenv()
-        self.db = boto3.resource("dynamodb", region_name=region_name, **kwargs)
+        self.region_name = region_name
+        self.max_pool_connections = max_pool_connections
+        self.resource_kwargs = kwargs
+        self.dedup = dedup
+        self.dedup_path = dedup_path
+        self.dedup_refresh_seconds = dedup_refresh_seconds
+        self.ingest_stats = {"new": 0, "skipped": 0}
+        self._bloom = None
+        self.tag = tag
+
+    @cached_property
+    def db(self):
+        """The shared DynamoDB resource, connected on first access."""
+        return get_dynamodb_resource(
+            self.region_name, self.max_pool_connections, **self.resource_kwargs
+        )
+
+    @cached_property
+    def table(self):
+        """The 'Headlines' Table resource, checked to exist on first access.
+
+        Raises:
+            RuntimeError: If the table does not exist.
+        """
         if not self._table_exists("Headlines"):
-            self.table = self.create_table()
-        else:
-            self.table = self.db.Table("Headlines")
+            raise RuntimeError(
+                "DynamoDB table 'Headlines' does not exist. Run scripts/setup_storage.py to create it."
+            )
+        return self.db.Table("Headlines")
 
     def _table_exists(self, table_name):
-        """Check if a DynamoDB table exists.
+        """Check if a DynamoDB table exists using DescribeTable, caching positive results per process.
 
         Args:
             table_name (str): Name of the table to check.
@@ -33,14 +115,26 @@ class HeadlineStorage:
         Returns:
             bool: True if the table exists, False otherwise.
         """
-        return table_name in [table.name for table in self.db.tables.all()]
+        key = (self.region_name, table_name)
+        if key in _existing_tables:
+            return True
+        try:
+            self.db.meta.client.describe_table(TableName=table_name)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ResourceNotFoundException":
+                return False
+            raise
+        _existing_tables.add(key)
+        return True
 
     def create_table(self):
         """Create the 'Headlines' DynamoDB table if it does not exist.
 
         Returns:
-            Table: The created DynamoDB Table resource.
+            Table: The created or existing DynamoDB Table resource.
         """
+        if self._table_exists("Headlines"):
+            return self.table
         table = self.db.create_table(
             TableName="Headlines",
             KeySchema=[
@@ -54,6 +148,8 @@ class HeadlineStorage:
             ProvisionedThroughput={"ReadCapacityUnits": 5, "WriteCapacityUnits": 5},
         )
         table.wait_until_exists()
+        _existing_tables.add((self.region_name, "Headlines"))
+        self.table = table
         return table
 
     def put_item(self, item):
@@ -62,18 +158,165 @@ class HeadlineStorage:
         Args:
             item (dict): The item to insert.
         """
-        self.table.put_item(Item=item)
+        self._call("put_item", self.table.put_item, items=1, Item=item)
 
-    def put_items(self, items):
-        """Insert multiple items into the Headlines table using batch writer.
+    def _call(self, operation: str, method, items: Optional[int] = None, **kwargs):
+        """Call a DynamoDB operation and record its capacity, latency and throttling metrics.
+
+        Args:
+            operation (str): Operation name to record metrics under.
+            method: Bound boto3 method to call.
+            items (Optional[int]): Number of items written. If None, counts the items returned.
+            **kwargs: Keyword arguments for the boto3 method.
+
+        Returns:
+            dict: The boto3 response.
+        """
+        start = perf_counter()
+        try:
+            response = method(ReturnConsumedCapacity="TOTAL", **kwargs)
+        except ClientError as e:
+            throttled = e.response["Error"]["Code"] in (
+                "ProvisionedThroughputExceededException",
+                "ThrottlingException",
+            )
+            storage_metrics.record(
+                self.tag,
+                operation,
+                perf_counter() - start,
+                retries=e.response.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+                throttles=int(throttled),
+            )
+            raise
+        seconds = perf_counter() - start
+        consumed = response.get("ConsumedCapacity", [])
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        throttles = len(response.get("UnprocessedItems", {}).get("Headlines", []))
+        throttles += len(
+            response.get("UnprocessedKeys", {}).get("Headlines", {}).get("Keys", [])
+        )
+        if items is None:
+            items = len(response.get("Items", []))
+            items += len(response.get("Responses", {}).get("Headlines", []))
+        else:
+            items -= throttles
+        storage_metrics.record(
+            self.tag,
+            operation,
+            seconds,
+            items=items,
+            consumed_capacity=sum(c.get("CapacityUnits", 0) for c in consumed),
+            retries=response["ResponseMetadata"].get("RetryAttempts", 0),
+            throttles=throttles,
+        )
+        return response
+
+    def _scan(self, **kwargs) -> dict:
+        """Scan the Headlines table with metrics recorded."""
+        return self._call("scan", self.table.scan, **kwargs)
+
+    def put_items(self, items) -> dict:
+        """Insert multiple items into the Headlines table using BatchWriteItem, resubmitting unprocessed items.
+
+        If dedup is enabled, items already in the table are skipped rather than overwritten.
 
         Args:
             items (list[dict]): List of items to insert.
+
+        Returns:
+            dict: Number of "new" items written and "skipped" items already stored.
+        """
+        new_items = self._filter_stored(items) if self.dedup else items
+        for i in range(0, len(new_items), 25):
+            requests = [
+                {"PutRequest": {"Item": item}} for item in new_items[i : i + 25]
+            ]
+            while requests:
+                response = self._call(
+                    "batch_write_item",
+                    self.db.batch_write_item,
+                    items=len(requests),
+                    RequestItems={"Headlines": requests},
+                )
+                sleep(0.075 * len(requests))
+                requests = response.get("UnprocessedItems", {}).get("Headlines", [])
+        stats = {"new": len(new_items), "skipped": len(items) - len(new_items)}
+        if self.dedup:
+            for item in new_items:
+                self._bloom.add(headline_key(item["headline"], item["label"]))
+            self._bloom.save(self.dedup_path)
+        self.ingest_stats["new"] += stats["new"]
+        self.ingest_stats["skipped"] += stats["skipped"]
+        return stats
+
+    def _filter_stored(self, items) -> list[dict]:
+        """Drop items whose keys are already stored or repeated within the batch.
+
+        Keys missing from the Bloom filter are definitely new. Probable hits are confirmed with BatchGetItem so that false positives are still written.
+
+        Args:
+            items (list[dict]): List of items to check.
+
+        Returns:
+            list[dict]: Items that are not yet stored.
+        """
+        self._refresh_dedup_filter()
+        unique = {}
+        for item in items:
+            unique.setdefault(headline_key(item["headline"], item["label"]), item)
+        probable = [key for key in unique if key in self._bloom]
+        for key in self._get_stored_keys([unique[key] for key in probable]):
+            del unique[key]
+        return list(unique.values())
+
+    def _get_stored_keys(self, items) -> set[str]:
+        """Look up which items exist in the Headlines table using BatchGetItem.
+
+        Args:
+            items (list[dict]): Items to look up.
+
+        Returns:
+            set[str]: Dedup keys of the items that are stored.
         """
-        with self.table.batch_writer() as batch:
-            for item in items:
-                batch.put_item(Item=item)
-                sleep(0.075)
+        stored = set()
+        for i in range(0, len(items), 100):
+            request = {
+                "Headlines": {
+                    "Keys": [
+                        {"headline": item["headline"], "label": item["label"]}
+                        for item in items[i : i + 100]
+                    ],
+                    "ProjectionExpression": "#h, #l",
+                    "ExpressionAttributeNames": {"#h": "headline", "#l": "label"},
+                }
+            }
+            while request:
+                response = self._call(
+                    "batch_get_item", self.db.batch_get_item, RequestItems=request
+                )
+                for item in response["Responses"].get("Headlines", []):
+                    stored.add(headline_key(item["headline"], item["label"]))
+                request = response.get("UnprocessedKeys")
+                if request:
+                    sleep(0.1)
+        return stored
+
+    def _refresh_dedup_filter(self) -> None:
+        """Load the persisted Bloom filter, rebuilding it from a table scan if missing, stale or saturated."""
+        if self._bloom is None:
+            self._bloom = BloomFilter.load(self.dedup_path)
+        if (
+            self._bloom is not None
+            and not self._bloom.saturated
+            and time() - self._bloom.built_at < self.dedup_refresh_seconds
+        ):
+            return
+        items = self.get_all_items()
+        self._bloom = BloomFilter(capacity=max(2 * len(items), 100_000))
+        for headline, label in items:
+            self._bloom.add(headline_key(headline, label))
+        self._bloom.save(self.dedup_path)
 
     def __parse_and_append(self, lst, items) -> list:
         """Parse DynamoDB items and append to a list."""
@@ -87,10 +330,10 @@ class HeadlineStorage:
             list[tuple[str, int]]: List of tuples containing headlines and their labels.
         """
         headlines = []
-        scan = self.table.scan()
+        scan = self._scan()
         self.__parse_and_append(headlines, scan["Items"])
         while "LastEvaluatedKey" in scan:
-            scan = self.table.scan(ExclusiveStartKey=scan["LastEvaluatedKey"])
+            scan = self._scan(ExclusiveStartKey=scan["LastEvaluatedKey"])
             self.__parse_and_append(headlines, scan["Items"])
             sleep(0.1)
         return headlines
@@ -109,13 +352,44 @@ class HeadlineStorage:
             list[tuple[str, int]]: List of tuples containing headlines and their labels.
         """
         headlines = []
-        scan = self.table.scan(FilterExpression=filter_expression, Limit=page_limit)
+        scan = self._scan(FilterExpression=filter_expression, Limit=page_limit)
         self.__parse_and_append(headlines, scan["Items"])
         while len(headlines) < max_items and "LastEvaluatedKey" in scan:
-            scan = self.table.scan(
+            scan = self._scan(
                 ExclusiveStartKey=scan["LastEvaluatedKey"],
                 FilterExpression=filter_expression,
                 Limit=page_limit,
             )
             self.__parse_and_append(headlines, scan["Items"])
         return headlines[:max_items]
+
+    def sample_items(
+        self, n: int, label: Optional[int] = None, page_limit=512
+    ) -> list[tuple[str, int]]:
+        """Retrieve up to n randomly chosen items from the Headlines table.
+
+        Scans a random parallel-scan segment sized so that it should hold roughly 2n items, rather than scanning the whole table.
+
+        Args:
+            n (int): Number of items to sample.
+            label (Optional[int]): Only sample items with this label. Defaults to None.
+            page_limit (int, optional): Max items returned for each DynamoDB page. Defaults to 512.
+
+        Returns:
+            list[tuple[str, int]]: List of tuples containing headlines and their labels.
+        """
+        total_segments = max(1, min(self.table.item_count // max(2 * n, 1), 1_000_000))
+        scan_kwargs = {
+            "Segment": random.randrange(total_segments),
+            "TotalSegments": total_segments,
+            "Limit": page_limit,
+        }
+        if label is not None:
+            scan_kwargs["FilterExpression"] = Attr("label").eq(label)
+        headlines = []
+        scan = self._scan(**scan_kwargs)
+        self.__parse_and_append(headlines, scan["Items"])
+        while "LastEvaluatedKey" in scan:
+            scan = self._scan(ExclusiveStartKey=scan["LastEvaluatedKey"], **scan_kwargs)
+            self.__parse_and_append(headlines, scan["Items"])
+        return random.sample(headlines, min(n, len(headlines)))
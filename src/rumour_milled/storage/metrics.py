@@ -0,0 +1,120 @@
+import json
+import atexit
+import logging
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+
+class StorageMetrics:
+    """Process-wide storage capacity and latency metrics, aggregated per caller tag and operation.
+
+    Each storage call records its latency, item count, consumed capacity units and retry/throttle counts. A structured JSON summary is logged at process exit.
+    """
+
+    latency_buckets_ms = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        """Initialize empty metrics."""
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._metrics = defaultdict(dict)
+
+    def _new_entry(self) -> dict:
+        """Create an empty metrics entry for one operation."""
+        return {
+            "calls": 0,
+            "items": 0,
+            "consumed_capacity": 0.0,
+            "retries": 0,
+            "throttles": 0,
+            "seconds": 0.0,
+            "max_latency_ms": 0.0,
+            "histogram": [0] * (len(self.latency_buckets_ms) + 1),
+        }
+
+    def record(
+        self,
+        tag: str,
+        operation: str,
+        seconds: float,
+        items: int = 0,
+        consumed_capacity: float = 0.0,
+        retries: int = 0,
+        throttles: int = 0,
+    ) -> None:
+        """Record one storage call.
+
+        Args:
+            tag (str): Caller tag, e.g. the scraper site or a training run.
+            operation (str): Storage operation, e.g. "scan" or "batch_write_item".
+            seconds (float): Latency of the call in seconds.
+            items (int, optional): Number of items read or written. Defaults to 0.
+            consumed_capacity (float, optional): Capacity units consumed. Defaults to 0.0.
+            retries (int, optional): Number of retries made by the client. Defaults to 0.
+            throttles (int, optional): Number of items or requests that were throttled. Defaults to 0.
+        """
+        latency_ms = seconds * 1000
+        with self._lock:
+            entry = self._metrics[tag].setdefault(operation, self._new_entry())
+            entry["calls"] += 1
+            entry["items"] += items
+            entry["consumed_capacity"] += consumed_capacity
+            entry["retries"] += retries
+            entry["throttles"] += throttles
+            entry["seconds"] += seconds
+            entry["max_latency_ms"] = max(entry["max_latency_ms"], latency_ms)
+            entry["histogram"][bisect_left(self.latency_buckets_ms, latency_ms)] += 1
+
+    def summary(self) -> dict:
+        """Summarise the recorded metrics.
+
+        Returns:
+            dict: Metrics keyed by caller tag and then operation.
+        """
+        bucket_labels = [f"<={bound}ms" for bound in self.latency_buckets_ms]
+        bucket_labels.append(f">{self.latency_buckets_ms[-1]}ms")
+        summary = {}
+        with self._lock:
+            for tag, operations in self._metrics.items():
+                summary[tag] = {}
+                for operation, entry in operations.items():
+                    seconds = entry["seconds"]
+                    summary[tag][operation] = {
+                        "calls": entry["calls"],
+                        "items": entry["items"],
+                        "consumed_capacity": round(entry["consumed_capacity"], 2),
+                        "retries": entry["retries"],
+                        "throttles": entry["throttles"],
+                        "seconds": round(seconds, 3),
+                        "items_per_second": (
+                            round(entry["items"] / seconds, 2) if seconds else None
+                        ),
+                        "latency_ms": {
+                            "mean": round(seconds * 1000 / entry["calls"], 2),
+                            "max": round(entry["max_latency_ms"], 2),
+                            "histogram": {
+                                label: count
+                                for label, count in zip(
+                                    bucket_labels, entry["histogram"]
+                                )
+                                if count
+                            },
+                        },
+                    }
+        return summary
+
+    def reset(self) -> None:
+        """Clear all recorded metrics."""
+        with self._lock:
+            self._metrics.clear()
+
+    def log_summary(self) -> None:
+        """Log the summary as JSON if anything has been recorded."""
+        summary = self.summary()
+        if summary:
+            self.logger.info(f"Storage metrics: {json.dumps(summary)}")
+
+
+storage_metrics = StorageMetrics()
+atexit.register(storage_metrics.log_summary)
@@ -0,0 +1,216 @@
+import os
+import sqlite3
+import threading
+from os import PathLike
+from pathlib import Path
+from time import perf_counter
+from typing import Optional
+from rumour_milled.storage.base import SQLITE_PATH_ENV
+from rumour_milled.storage.metrics import storage_metrics
+
+
+class SQLiteHeadlineStorage:
+    """SQLiteHeadlineStorage stores news headlines and their labels in a local SQLite database.
+
+    This is a drop-in alternative to the DynamoDB HeadlineStorage for offline pipelines, benchmarks and single-node deployments. The (headline, label) pair is the primary key, so re-putting an existing item overwrites it in the same way as DynamoDB.
+    """
+
+    _operators = {
+        "=": "=",
+        "<>": "<>",
+        "<": "<",
+        "<=": "<=",
+        ">": ">",
+        ">=": ">=",
+    }
+    _columns = ("headline", "label")
+
+    def __init__(
+        self,
+        path: Optional[PathLike] = None,
+        batch_size: int = 1000,
+        dedup: bool = False,
+        tag: str = "default",
+    ):
+        """Initialize the SQLiteHeadlineStorage and connect to the database.
+
+        Args:
+            path (Optional[PathLike]): Path to the database file. If None, loads from environment variable "RUMOUR_MILLED_SQLITE_PATH" or defaults to "data/headlines.db".
+            batch_size (int): Number of rows written per executemany call. Defaults to 1000.
+            dedup (bool): Skip writing items that are already stored instead of overwriting them. Defaults to False.
+            tag (str): Caller tag that latency metrics are aggregated under. Defaults to "default".
+        """
+        if path is None:
+            path = os.environ.get(SQLITE_PATH_ENV, "data/headlines.db")
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.dedup = dedup
+        self.tag = tag
+        self.ingest_stats = {"new": 0, "skipped": 0}
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.create_table()
+
+    def create_table(self) -> None:
+        """Create the 'Headlines' table if it does not exist."""
+        with self._lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS Headlines ("
+                "headline TEXT NOT NULL, "
+                "label INTEGER NOT NULL, "
+                "PRIMARY KEY (headline, label))"
+            )
+
+    def put_item(self, item: dict) -> None:
+        """Insert a single item into the Headlines table.
+
+        Args:
+            item (dict): The item to insert.
+        """
+        self.put_items([item])
+
+    def put_items(self, items: list[dict]) -> dict:
+        """Insert multiple items into the Headlines table in batched transactions.
+
+        Args:
+            items (list[dict]): List of items to insert.
+
+        Returns:
+            dict: Number of "new" items written and "skipped" items already stored. Without dedup, overwritten items count as new.
+        """
+        rows = [(item["headline"], int(item["label"])) for item in items]
+        conflict = "IGNORE" if self.dedup else "REPLACE"
+        start = perf_counter()
+        with self._lock:
+            changes = self.db.total_changes
+            for i in range(0, len(rows), self.batch_size):
+                with self.db:
+                    self.db.executemany(
+                        f"INSERT OR {conflict} INTO Headlines (headline, label) VALUES (?, ?)",
+                        rows[i : i + self.batch_size],
+                    )
+            written = self.db.total_changes - changes
+        storage_metrics.record(
+            self.tag, "put_items", perf_counter() - start, items=len(rows)
+        )
+        stats = {"new": written, "skipped": len(rows) - written}
+        self.ingest_stats["new"] += stats["new"]
+        self.ingest_stats["skipped"] += stats["skipped"]
+        return stats
+
+    def get_all_items(self) -> list[tuple[str, int]]:
+        """Retrieve all items from the Headlines table.
+
+        Returns:
+            list[tuple[str, int]]: List of tuples containing headlines and their labels.
+        """
+        return self._select("scan", "SELECT headline, label FROM Headlines")
+
+    def get_filtered_items(
+        self, filter_expression, max_items, page_limit=512
+    ) -> list[tuple[str, int]]:
+        """Retrieve items from the Headlines table based on a filter expression.
+
+        Args:
+            filter_expression (ConditionBase): boto3 condition expression to apply, e.g. Attr("label").eq(0).
+            max_items (int): Maximum number of items to retrieve.
+            page_limit (int, optional): Unused, kept for compatibility with HeadlineStorage. Defaults to 512.
+
+        Returns:
+            list[tuple[str, int]]: List of tuples containing headlines and their labels.
+        """
+        params = []
+        where = self._to_sql(filter_expression, params)
+        return self._select(
+            "scan",
+            f"SELECT headline, label FROM Headlines WHERE {where} LIMIT ?",
+            params + [max_items],
+        )
+
+    def sample_items(
+        self, n: int, label: Optional[int] = None
+    ) -> list[tuple[str, int]]:
+        """Retrieve up to n randomly chosen items from the Headlines table.
+
+        Args:
+            n (int): Number of items to sample.
+            label (Optional[int]): Only sample items with this label. Defaults to None.
+
+        Returns:
+            list[tuple[str, int]]: List of tuples containing headlines and their labels.
+        """
+        query = "SELECT headline, label FROM Headlines"
+        params = []
+        if label is not None:
+            query += " WHERE label = ?"
+            params.append(int(label))
+        return self._select(
+            "sample", query + " ORDER BY RANDOM() LIMIT ?", params + [n]
+        )
+
+    def _select(self, operation: str, query: str, params=()) -> list:
+        """Run a SELECT query and record its latency metrics."""
+        start = perf_counter()
+        with self._lock:
+            rows = self.db.execute(query, params).fetchall()
+        storage_metrics.record(
+            self.tag, operation, perf_counter() - start, items=len(rows)
+        )
+        return rows
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self.db.close()
+
+    def _to_sql(self, condition, params: list) -> str:
+        """Translate a boto3 condition expression into a SQL WHERE clause.
+
+        Args:
+            condition (ConditionBase): boto3 condition expression.
+            params (list): List that query parameters are appended to.
+
+        Returns:
+            str: SQL expression using ? placeholders.
+        """
+        expression = condition.get_expression()
+        operator = expression["operator"]
+        values = expression["values"]
+        if operator in ("AND", "OR"):
+            left = self._to_sql(values[0], params)
+            right = self._to_sql(values[1], params)
+            return f"({left} {operator} {right})"
+        if operator == "NOT":
+            return f"(NOT {self._to_sql(values[0], params)})"
+
+        column = self._column(values[0])
+        if operator in self._operators:
+            params.append(values[1])
+            return f"{column} {self._operators[operator]} ?"
+        if operator == "BETWEEN":
+            params.extend(values[1:3])
+            return f"{column} BETWEEN ? AND ?"
+        if operator == "IN":
+            params.extend(values[1])
+            return f"{column} IN ({', '.join('?' * len(values[1]))})"
+        if operator == "begins_with":
+            params.extend([values[1], values[1]])
+            return f"substr({column}, 1, length(?)) = ?"
+        if operator == "contains":
+            params.append(values[1])
+            return f"instr({column}, ?) > 0"
+        if operator == "attribute_exists":
+            return f"{column} IS NOT NULL"
+        if operator == "attribute_not_exists":
+            return f"{column} IS NULL"
+        raise ValueError(f"Unsupported filter expression operator: {operator}")
+
+    def _column(self, attribute) -> str:
+        """Validate and return the column name for a boto3 attribute."""
+        if attribute.name not in self._columns:
+            raise ValueError(f"Unknown attribute: {attribute.name}")
+        return attribute.name
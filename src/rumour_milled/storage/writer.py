@@ -0,0 +1,204 @@
+import queue
+import atexit
+import asyncio
+import logging
+import threading
+from time import perf_counter, sleep
+from rumour_milled.storage.base import HeadlineStorageBackend
+
+
+class HeadlineWriteError(RuntimeError):
+    """Raised by HeadlineWriter.flush and close when items could not be written.
+
+    Args:
+        items (list[dict]): Items that were not written, to resubmit or save elsewhere.
+    """
+
+    def __init__(self, items: list[dict]):
+        """Initialize the HeadlineWriteError.
+
+        Args:
+            items (list[dict]): Items that were not written, to resubmit or save elsewhere.
+        """
+        super().__init__(f"Failed to write {len(items)} headlines")
+        self.items = items
+
+
+class HeadlineWriter:
+    """Writes headline items to storage from a background thread.
+
+    Callers submit lists of items to a bounded queue and carry on working. A single writer thread drains the queue, merges submissions into batches of up to batch_size items and puts them into the storage backend. Submitting blocks once max_pending submissions are waiting, which applies back-pressure to producers that outrun storage. Pending items are flushed when the process exits.
+
+    A failed put_items call is retried with exponential backoff. Items that still cannot be written are kept and raised with a HeadlineWriteError from the next flush or close, since callers have usually let go of them by then.
+
+    The writer should be the only thread writing to its storage backend.
+
+    Args:
+        storage (HeadlineStorageBackend): Storage backend to write to.
+        batch_size (int, optional): Maximum items per put_items call. Defaults to 500.
+        max_pending (int, optional): Maximum queued submissions before submit blocks. Defaults to 64.
+        max_wait (float, optional): Seconds to wait for more submissions before writing a partial batch. Defaults to 1.0.
+        max_retries (int, optional): Retries of a failed put_items call. Defaults to 3.
+        backoff (float, optional): Seconds before the first retry, doubling with each retry. Defaults to 1.0.
+    """
+
+    _stop = object()
+
+    def __init__(
+        self,
+        storage: HeadlineStorageBackend,
+        batch_size: int = 500,
+        max_pending: int = 64,
+        max_wait: float = 1.0,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+    ):
+        """Initialize the HeadlineWriter and start its writer thread.
+
+        Args:
+            storage (HeadlineStorageBackend): Storage backend to write to.
+            batch_size (int, optional): Maximum items per put_items call. Defaults to 500.
+            max_pending (int, optional): Maximum queued submissions before submit blocks. Defaults to 64.
+            max_wait (float, optional): Seconds to wait for more submissions before writing a partial batch. Defaults to 1.0.
+            max_retries (int, optional): Retries of a failed put_items call. Defaults to 3.
+            backoff (float, optional): Seconds before the first retry, doubling with each retry. Defaults to 1.0.
+        """
+        self.storage = storage
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = {"new": 0, "skipped": 0, "failed": 0}
+        self._failed = []
+        self._failed_lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="HeadlineWriter", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, items: list[dict]) -> None:
+        """Queue items for writing, blocking while the queue is full.
+
+        Args:
+            items (list[dict]): Items to write.
+        """
+        if self._closed:
+            raise RuntimeError("HeadlineWriter is closed")
+        if items:
+            self._queue.put(list(items))
+
+    async def submit_async(self, items: list[dict]) -> None:
+        """Queue items for writing without blocking the event loop.
+
+        Args:
+            items (list[dict]): Items to write.
+        """
+        try:
+            if self._closed:
+                raise RuntimeError("HeadlineWriter is closed")
+            if items:
+                self._queue.put_nowait(list(items))
+        except queue.Full:
+            await asyncio.to_thread(self.submit, items)
+
+    def flush(self) -> None:
+        """Block until every submitted item has been written.
+
+        Raises:
+            HeadlineWriteError: If items failed to write since the last flush, with those items.
+        """
+        self._queue.join()
+        self._raise_failed()
+
+    def close(self) -> None:
+        """Flush pending items and stop the writer thread.
+
+        Raises:
+            HeadlineWriteError: If items failed to write since the last flush, with those items.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._stop)
+        self._thread.join()
+        atexit.unregister(self.close)
+        self._raise_failed()
+
+    def _raise_failed(self) -> None:
+        with self._failed_lock:
+            failed, self._failed = self._failed, []
+        if failed:
+            raise HeadlineWriteError(failed)
+
+    def _run(self) -> None:
+        """Drain the queue in batches until stopped."""
+        while True:
+            submission = self._queue.get()
+            if submission is self._stop:
+                self._queue.task_done()
+                return
+            batch = submission
+            taken = 1
+            stop = False
+            deadline = perf_counter() + self.max_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - perf_counter()
+                try:
+                    submission = self._queue.get(timeout=max(timeout, 0))
+                except queue.Empty:
+                    break
+                taken += 1
+                if submission is self._stop:
+                    stop = True
+                    break
+                batch.extend(submission)
+            self._write(batch)
+            for _ in range(taken):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _put_items(self, items: list[dict]) -> dict:
+        """Put items into storage, retrying failures with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.storage.put_items(items)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2**attempt
+                self.logger.warning(
+                    f"Failed to write {len(items)} headlines, retrying in {delay:.1f}s: {e}"
+                )
+                sleep(delay)
+
+    def _write(self, batch: list[dict]) -> None:
+        """Write a batch to storage, dropping repeated keys and keeping items that fail.
+
+        Args:
+            batch (list[dict]): Items to write.
+        """
+        unique = {}
+        for item in batch:
+            unique.setdefault((item["headline"], int(item["label"])), item)
+        unique_items = list(unique.values())
+        for i in range(0, len(unique_items), self.batch_size):
+            items = unique_items[i : i + self.batch_size]
+            try:
+                stats = self._put_items(items)
+            except Exception as e:
+                self.logger.error(f"Failed to write {len(items)} headlines: {e}")
+                self.stats["failed"] += len(items)
+                with self._failed_lock:
+                    self._failed.extend(items)
+                continue
+            self.stats["new"] += stats["new"]
+            self.stats["skipped"] += stats["skipped"]
+            self.logger.info(
+                f"Saved {stats['new']} new headlines, skipped {stats['skipped']} already stored"
+            )
+        self.stats["skipped"] += len(batch) - len(unique_items)
@@ -0,0 +1,287 @@
+import re
+import json
+import unicodedata
+import numpy as np
+from os import PathLike
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """Choose LSH bands and rows minimising false positive and negative probability for a Jaccard threshold.
+
+    Args:
+        threshold (float): Jaccard similarity threshold.
+        num_perm (int): Number of MinHash permutations.
+
+    Returns:
+        tuple[int, int]: Number of bands and rows per band.
+    """
+    grid = np.linspace(0, 1, 201)
+    below = grid < threshold
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        candidate = 1 - (1 - grid**rows) ** bands
+        error = candidate[below].sum() + (1 - candidate[~below]).sum()
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateIndex:
+    """Incremental MinHash/LSH index for finding near-duplicate headlines.
+
+    Headlines are normalised (unicode, case, punctuation and whitespace), split into overlapping byte shingles and summarised as MinHash signatures. Signatures are banded into LSH buckets so that candidates are found without comparing against every stored headline, and candidates are then confirmed by their estimated Jaccard similarity. The index can be saved and loaded to check new batches against everything seen in earlier runs.
+
+    Args:
+        threshold (float, optional): Estimated Jaccard similarity at or above which headlines are near duplicates. Defaults to 0.8.
+        num_perm (int, optional): Number of MinHash permutations. Defaults to 64.
+        shingle_size (int, optional): Shingle length in bytes. Defaults to 5.
+        seed (int, optional): Seed for the MinHash permutations. Defaults to 42.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        shingle_size: int = 5,
+        seed: int = 42,
+    ):
+        """Initialize an empty NearDuplicateIndex.
+
+        Args:
+            threshold (float, optional): Estimated Jaccard similarity at or above which headlines are near duplicates. Defaults to 0.8.
+            num_perm (int, optional): Number of MinHash permutations. Defaults to 64.
+            shingle_size (int, optional): Shingle length in bytes. Defaults to 5.
+            seed (int, optional): Seed for the MinHash permutations. Defaults to 42.
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: (a * x + b) mod 2**64, keeping the top 32 bits
+        self._a = rng.integers(1, 1 << 63, size=(num_perm, 1), dtype=np.uint64) << 1
+        self._a |= np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+        self._band_mix = rng.integers(
+            1, 1 << 63, size=(self.rows,), dtype=np.uint64
+        ) | np.uint64(1)
+        self._shingle_powers = np.uint64(1099511628211) ** np.arange(
+            shingle_size, dtype=np.uint64
+        )
+
+        self.keys = []
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._size = 0
+        self._buckets = [{} for _ in range(self.bands)]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def normalise(self, text: str) -> str:
+        """Normalise a headline before shingling.
+
+        Args:
+            text (str): Raw headline.
+
+        Returns:
+            str: Lowercased headline with unicode compatibility normalisation, punctuation removed and whitespace collapsed.
+        """
+        text = unicodedata.normalize("NFKC", text).lower()
+        text = _NON_WORD.sub(" ", text)
+        return _WHITESPACE.sub(" ", text).strip()
+
+    def signature(self, text: str) -> np.ndarray:
+        """Compute the MinHash signature of a headline.
+
+        Args:
+            text (str): Raw headline.
+
+        Returns:
+            np.ndarray: Signature of num_perm uint32 values.
+        """
+        return self.signatures([text])[0]
+
+    def signatures(self, texts: list[str]) -> np.ndarray:
+        """Compute MinHash signatures for a batch of headlines in one vectorised pass.
+
+        Args:
+            texts (list[str]): Raw headlines.
+
+        Returns:
+            np.ndarray: len(texts) x num_perm array of uint32 signatures.
+        """
+        k = self.shingle_size
+        encoded = [
+            self.normalise(text).encode("utf-8").ljust(k, b"\0") for text in texts
+        ]
+        lengths = np.fromiter((len(e) for e in encoded), np.int64, len(encoded))
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        windows = np.lib.stride_tricks.sliding_window_view(data, k)
+        # Keep only windows that start and end within the same headline
+        counts = lengths - k + 1
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        segment_starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        starts = np.arange(counts.sum()) - np.repeat(segment_starts - offsets, counts)
+        shingles = windows[starts].astype(np.uint64) @ self._shingle_powers
+        shingles = (shingles ^ (shingles >> np.uint64(32))) & _MAX_HASH
+        permuted = (self._a * shingles + self._b) >> np.uint64(32)
+        signatures = np.minimum.reduceat(permuted, segment_starts, axis=1)
+        return signatures.T.astype(np.uint32)
+
+    def _band_hashes(self, signature: np.ndarray) -> list[int]:
+        """Hash each LSH band of a signature to an int bucket key."""
+        bands = signature[: self.bands * self.rows].reshape(self.bands, self.rows)
+        return (bands.astype(np.uint64) * self._band_mix).sum(axis=1).tolist()
+
+    def _candidates(self, band_hashes: list[int]) -> set[int]:
+        """Collect ids that share at least one LSH bucket with the given band hashes."""
+        candidates = set()
+        for bucket, band_hash in zip(self._buckets, band_hashes):
+            ids = bucket.get(band_hash)
+            if ids is None:
+                continue
+            if isinstance(ids, int):
+                candidates.add(ids)
+            else:
+                candidates.update(ids)
+        return candidates
+
+    def _matches(self, signature: np.ndarray, band_hashes: list[int]) -> list[int]:
+        """Return ids of stored headlines whose estimated Jaccard similarity meets the threshold."""
+        candidates = list(self._candidates(band_hashes))
+        if not candidates:
+            return []
+        similarity = (self._signatures[candidates] == signature).mean(axis=1)
+        return [i for i, s in zip(candidates, similarity) if s >= self.threshold]
+
+    def _insert(self, key: str, signature: np.ndarray, band_hashes: list[int]) -> None:
+        """Store a signature and register it in the LSH buckets."""
+        if self._size == len(self._signatures):
+            grown = np.empty((max(1024, 2 * self._size), self.num_perm), np.uint32)
+            grown[: self._size] = self._signatures[: self._size]
+            self._signatures = grown
+        idx = self._size
+        self._signatures[idx] = signature
+        self._size += 1
+        self.keys.append(key)
+        for bucket, band_hash in zip(self._buckets, band_hashes):
+            ids = bucket.get(band_hash)
+            if ids is None:
+                bucket[band_hash] = idx
+            elif isinstance(ids, int):
+                bucket[band_hash] = [ids, idx]
+            else:
+                ids.append(idx)
+
+    def query(self, text: str) -> list[str]:
+        """Find stored headlines that are near duplicates of a headline.
+
+        Args:
+            text (str): Raw headline.
+
+        Returns:
+            list[str]: Keys of the near-duplicate headlines.
+        """
+        signature = self.signature(text)
+        return [
+            self.keys[i] for i in self._matches(signature, self._band_hashes(signature))
+        ]
+
+    def add(self, text: str, key: Optional[str] = None) -> bool:
+        """Add a headline unless it is a near duplicate of one already stored.
+
+        Args:
+            text (str): Raw headline.
+            key (Optional[str]): Key to store for the headline. Defaults to the headline itself.
+
+        Returns:
+            bool: True if the headline was added, False if it was a near duplicate.
+        """
+        signature = self.signature(text)
+        band_hashes = self._band_hashes(signature)
+        if self._matches(signature, band_hashes):
+            return False
+        self._insert(text if key is None else key, signature, band_hashes)
+        return True
+
+    def filter(self, texts: Iterable[str], batch_size: int = 1024) -> list[str]:
+        """Add headlines in order, keeping only those that are not near duplicates of stored or earlier headlines.
+
+        Args:
+            texts (Iterable[str]): Raw headlines.
+            batch_size (int, optional): Number of signatures computed per vectorised pass. Defaults to 1024.
+
+        Returns:
+            list[str]: Headlines that were added, in input order.
+        """
+        kept = []
+        batch = []
+        for text in texts:
+            batch.append(text)
+            if len(batch) == batch_size:
+                kept.extend(self._filter_batch(batch))
+                batch = []
+        if batch:
+            kept.extend(self._filter_batch(batch))
+        return kept
+
+    def _filter_batch(self, texts: list[str]) -> list[str]:
+        """Add a batch of headlines in order, returning those that were added."""
+        kept = []
+        for text, signature in zip(texts, self.signatures(texts)):
+            band_hashes = self._band_hashes(signature)
+            if not self._matches(signature, band_hashes):
+                self._insert(text, signature, band_hashes)
+                kept.append(text)
+        return kept
+
+    def save(self, path: PathLike) -> None:
+        """Persist the index to a .npz file.
+
+        Args:
+            path (PathLike): Path to write the index to.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        params = {
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "shingle_size": self.shingle_size,
+            "seed": self.seed,
+        }
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                signatures=self._signatures[: self._size],
+                keys=np.frombuffer(json.dumps(self.keys).encode("utf-8"), np.uint8),
+                params=np.frombuffer(json.dumps(params).encode("utf-8"), np.uint8),
+            )
+
+    @classmethod
+    def load(cls, path: PathLike) -> "NearDuplicateIndex":
+        """Load an index previously written with save.
+
+        Args:
+            path (PathLike): Path to read the index from.
+
+        Returns:
+            NearDuplicateIndex: The loaded index.
+        """
+        with np.load(path) as data:
+            params = json.loads(data["params"].tobytes().decode("utf-8"))
+            keys = json.loads(data["keys"].tobytes().decode("utf-8"))
+            signatures = data["signatures"]
+        index = cls(**params)
+        for key, signature in zip(keys, signatures):
+            index._insert(key, signature, index._band_hashes(signature))
+        return index
@@ -1,7 +1,98 @@
+import re
+import unicodedata
+from typing import Iterable, Iterator, Optional
+
+
+_LETTER = re.compile(r"[^\W\d_]")
+_LATIN_LETTER = re.compile(r"[A-Za-z\u00c0-\u024f]")
+
+
+class HeadlineNormaliser:
+    """Streaming, single-pass headline normaliser and filter.
+
+    Each headline is unicode (NFKC) normalised, has all whitespace runs collapsed to single spaces and is stripped, then filtered by the configured rules. Output keeps first-seen order and, with dedup enabled, headlines already returned by earlier calls are dropped.
+
+    Args:
+        min_words (int, optional): Minimum number of words. Defaults to 4.
+        max_length (Optional[int], optional): Maximum number of characters. Defaults to None.
+        min_latin_ratio (Optional[float], optional): Minimum fraction of letters that are Latin script, to filter out other languages. Defaults to None.
+        dedup (bool, optional): Drop headlines already seen by this normaliser. Defaults to True.
+    """
+
+    def __init__(
+        self,
+        min_words: int = 4,
+        max_length: Optional[int] = None,
+        min_latin_ratio: Optional[float] = None,
+        dedup: bool = True,
+    ):
+        """Initialize the HeadlineNormaliser.
+
+        Args:
+            min_words (int, optional): Minimum number of words. Defaults to 4.
+            max_length (Optional[int], optional): Maximum number of characters. Defaults to None.
+            min_latin_ratio (Optional[float], optional): Minimum fraction of letters that are Latin script, to filter out other languages. Defaults to None.
+            dedup (bool, optional): Drop headlines already seen by this normaliser. Defaults to True.
+        """
+        self.min_words = min_words
+        self.max_length = max_length
+        self.min_latin_ratio = min_latin_ratio
+        self.dedup = dedup
+        self.seen = set()
+
+    def normalise(self, headline: str) -> Optional[str]:
+        """Normalise a single headline and apply the filter rules, ignoring dedup.
+
+        Args:
+            headline (str): Raw headline.
+
+        Returns:
+            Optional[str]: The normalised headline, or None if it was filtered out.
+        """
+        is_ascii = headline.isascii()
+        if not is_ascii:
+            headline = unicodedata.normalize("NFKC", headline)
+        words = headline.split()
+        if not words or len(words) < self.min_words:
+            return None
+        headline = " ".join(words)
+        if self.max_length is not None and len(headline) > self.max_length:
+            return None
+        if self.min_latin_ratio is not None and not is_ascii:
+            letters = len(_LETTER.findall(headline))
+            latin = len(_LATIN_LETTER.findall(headline))
+            if letters and latin / letters < self.min_latin_ratio:
+                return None
+        return headline
+
+    def __call__(self, headlines: Iterable[str]) -> Iterator[str]:
+        """Lazily normalise, filter and dedup headlines.
+
+        Args:
+            headlines (Iterable[str]): Raw headlines, e.g. a list or generator.
+
+        Yields:
+            str: Normalised headlines in first-seen order.
+        """
+        for headline in headlines:
+            headline = self.normalise(headline)
+            if headline is None:
+                continue
+            if self.dedup:
+                if headline in self.seen:
+                    continue
+                self.seen.add(headline)
+            yield headline
+
+    def reset(self) -> None:
+        """Forget the headlines seen so far."""
+        self.seen.clear()
+
+
 def clean_headlines(headlines: list[str]) -> list[str]:
     """Clean and filter a list of headlines.
 
-    Removes newlines, extra spaces, headlines with fewer than four words, and empty strings. Returns unique cleaned headlines.
+    Normalises unicode and whitespace, removes headlines with fewer than four words and empty strings. Returns unique cleaned headlines in first-seen order.
 
     Args:
         headlines (list[str]): List of raw headline strings.
@@ -9,9 +100,4 @@ def clean_headlines(headlines: list[str]) -> list[str]:
     Returns:
         list[str]: List of cleaned, unique headlines.
     """
-    cleaned_headlines = [
-        headline.replace("\n", " ").replace("  ", " ").strip()
-        for headline in headlines
-        if len(headline.split(" ")) > 3 and headline not in ["", " "]
-    ]
-    return list(set(cleaned_headlines))
+    return list(HeadlineNormaliser()(headlines))
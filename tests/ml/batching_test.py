@@ -0,0 +1,100 @@
+from rumour_milled.ml.batching import TensorBatchLoader
+from rumour_milled.ml.train import Trainer
+import torch
+import torch.nn as nn
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import socket
+import os
+
+
+def shards(n, num_replicas, **kwargs):
+    X = torch.arange(n)
+    return [
+        TensorBatchLoader(X, num_replicas=num_replicas, rank=rank, **kwargs)
+        for rank in range(num_replicas)
+    ]
+
+
+def rows(loader):
+    # Unpadded shards can be empty when there are fewer rows than replicas
+    return [row for (X,) in loader for row in X.tolist()]
+
+
+def test_padded_shards_cover_every_row_with_equal_lengths():
+    for n in (1, 2, 7, 10, 11):
+        loaders = shards(n, 3, batch_size=2, shuffle=True, seed=5)
+        shard_rows = [rows(loader) for loader in loaders]
+        assert len({len(r) for r in shard_rows}) == 1
+        assert len({len(loader) for loader in loaders}) == 1
+        assert all(len(r) == loader._rows() for r, loader in zip(shard_rows, loaders))
+        assert set(sum(shard_rows, [])) == set(range(n))
+
+
+def test_unpadded_shards_partition_the_rows():
+    for n in (1, 2, 7, 10, 11):
+        loaders = shards(n, 3, batch_size=2, pad=False)
+        shard_rows = [rows(loader) for loader in loaders]
+        assert sorted(sum(shard_rows, [])) == list(range(n))
+        assert max(map(len, shard_rows)) - min(map(len, shard_rows)) <= 1
+        assert all(len(r) == loader._rows() for r, loader in zip(shard_rows, loaders))
+
+
+def test_set_epoch_reshuffles_deterministically():
+    def epoch_rows(epoch):
+        loaders = shards(20, 2, batch_size=4, shuffle=True, seed=3)
+        for loader in loaders:
+            loader.set_epoch(epoch)
+        return [rows(loader) for loader in loaders]
+
+    first = epoch_rows(1)
+    assert first == epoch_rows(1)
+    assert first != epoch_rows(2)
+    # Shards stay disjoint after reshuffling
+    assert sorted(first[0] + first[1]) == list(range(20))
+
+
+def unsharded_val_loss(X, y, model):
+    trainer = Trainer(
+        model, nn.BCEWithLogitsLoss(), torch.optim.SGD(model.parameters(), 0.1)
+    )
+    return trainer.evaluate(TensorBatchLoader(X, y, batch_size=4))
+
+
+def evaluate_sharded(rank, world_size, port, X, y, model, results):
+    os.environ.update(MASTER_ADDR="127.0.0.1", MASTER_PORT=str(port))
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    trainer = Trainer(
+        model,
+        nn.BCEWithLogitsLoss(),
+        torch.optim.SGD(model.parameters(), 0.1),
+        distributed=True,
+    )
+    loader = TensorBatchLoader(
+        X, y, batch_size=4, num_replicas=world_size, rank=rank, pad=False
+    )
+    results[rank] = trainer.evaluate(loader)
+    dist.destroy_process_group()
+
+
+def test_distributed_val_loss_matches_single_process():
+    torch.manual_seed(0)
+    # 11 rows over 2 ranks, so the shards and their last batches are uneven
+    X, y = torch.randn(11, 4), torch.randint(0, 2, (11, 1)).float()
+    model = nn.Linear(4, 1)
+    expected = unsharded_val_loss(X, y, model)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    results = mp.Manager().dict()
+    mp.spawn(evaluate_sharded, args=(2, port, X, y, model, results), nprocs=2)
+    assert abs(results[0] - expected) < 1e-6
+    assert abs(results[1] - expected) < 1e-6
+
+
+if __name__ == "__main__":
+    test_padded_shards_cover_every_row_with_equal_lengths()
+    test_unpadded_shards_partition_the_rows()
+    test_set_epoch_reshuffles_deterministically()
+    test_distributed_val_loss_matches_single_process()
+    print("All batching tests passed")
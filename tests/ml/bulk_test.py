@@ -0,0 +1,104 @@
+from rumour_milled.ml.bulk import score_file
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import FunctionTransformer
+from pathlib import Path
+import pandas as pd
+import tempfile
+import joblib
+
+
+WORDS = "shares markets bank rates inflation oil profits court minister".split()
+# Set to make scoring fail on a headline, standing in for an interrupted run
+FAIL_ON = None
+
+
+def maybe_fail(headlines):
+    if FAIL_ON is not None and FAIL_ON in headlines:
+        raise RuntimeError("Interrupted")
+    return headlines
+
+
+def make_inputs(directory: Path, n: int = 250) -> tuple[Path, pd.DataFrame]:
+    titles = [
+        " ".join([*(WORDS[(i * k) % len(WORDS)] for k in range(1, 6)), f"number {i}"])
+        for i in range(n)
+    ]
+    frame = pd.DataFrame({"id": range(100, 100 + n), "title": titles})
+    pipeline = make_pipeline(
+        FunctionTransformer(maybe_fail), TfidfVectorizer(), LogisticRegression()
+    )
+    pipeline.fit(titles, [i % 2 for i in range(n)])
+    model_path = directory / "pipeline.pkl"
+    joblib.dump(pipeline, model_path)
+    return model_path, frame
+
+
+def read_parts(output_dir: Path, manifest: dict) -> pd.DataFrame:
+    return pd.concat(
+        [pd.read_json(output_dir / part, lines=True) for part in manifest["parts"]],
+        ignore_index=True,
+    )
+
+
+def test_chunked_scoring_keeps_row_indices():
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        model_path, frame = make_inputs(directory)
+        frame.to_csv(directory / "in.csv", index=False)
+        frame.to_json(directory / "in.jsonl", orient="records", lines=True)
+        results = []
+        for name in ("in.csv", "in.jsonl"):
+            output_dir = directory / f"out-{name}"
+            manifest = score_file(
+                directory / name, output_dir, model_path, chunk_size=60
+            )
+            assert manifest["rows"] == len(frame)
+            assert manifest["chunks"] == 5
+            scored = read_parts(output_dir, manifest)
+            assert scored["row"].tolist() == list(range(len(frame)))
+            assert scored["id"].tolist() == frame["id"].tolist()
+            assert ((scored["fake_probability"] >= 0.5) == scored["label"]).all()
+            results.append(scored["fake_probability"])
+        assert (results[0] == results[1]).all()
+
+
+def test_interrupted_scoring_resumes():
+    global FAIL_ON
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        model_path, frame = make_inputs(directory)
+        frame.to_csv(directory / "in.csv", index=False)
+        expected = score_file(
+            directory / "in.csv", directory / "expected", model_path, chunk_size=60
+        )
+        output_dir = directory / "out"
+        # Row 130 is in the third chunk
+        FAIL_ON = frame["title"][130]
+        try:
+            score_file(directory / "in.csv", output_dir, model_path, chunk_size=60)
+            raise AssertionError("Scoring should have been interrupted")
+        except RuntimeError:
+            pass
+        finally:
+            FAIL_ON = None
+        assert not (output_dir / "manifest.json").exists()
+        assert sorted(p.name for p in output_dir.glob("part-*")) == [
+            "part-00000.jsonl",
+            "part-00001.jsonl",
+        ]
+
+        manifest = score_file(
+            directory / "in.csv", output_dir, model_path, chunk_size=60
+        )
+        assert manifest["resumed_chunks"] == 2
+        assert manifest["parts"] == expected["parts"]
+        scored = read_parts(output_dir, manifest)
+        assert scored.equals(read_parts(directory / "expected", expected))
+
+
+if __name__ == "__main__":
+    test_chunked_scoring_keeps_row_indices()
+    test_interrupted_scoring_resumes()
+    print("All bulk scoring tests passed")